@@ -1,113 +1,771 @@
 # Backend Flask API for Parking App
 # Penn State Abington - CMPSC 462 Final Project
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
+import atexit
 import json
+import math
 import os
+import uuid
 from datetime import datetime, time
 import threading
 import time as time_module
 from config import API_KEY, ALLOWED_ORIGINS, HOST, PORT, DEBUG
+from config import (PARKING_DATA_FILE, JOURNAL_FILE, JOURNAL_COMMIT_INTERVAL,
+                    SNAPSHOT_INTERVAL, SNAPSHOT_MAX_EVENTS, MAX_BATCH_SIZE)
+from config import STREAM_KEEPALIVE_SECONDS, STREAM_BACKLOG, STREAM_MAX_THREADED_CLIENTS
+from config import SHARED_STATE_FILE, LOCK_STRIPES, STATE_POLL_INTERVAL, LOT_REGISTRY_FILE
+from config import STORAGE_BACKEND, SQLITE_DB_FILE, SQLITE_HISTORY_DAYS
+from config import (HISTORY_RAW_SIZE, HISTORY_MINUTES, HISTORY_HOURS, HISTORY_DAYS,
+                    HISTORY_SAMPLE_INTERVAL, HISTORY_BACKFILL_LIMIT)
+from config import (FORECAST_FILE, FORECAST_SLOT_MINUTES, FORECAST_MEMORY_SAMPLES,
+                    FORECAST_SAVE_INTERVAL, FORECAST_MAX_MINUTES, TIMEZONE)
+from config import DAILY_RESET_TIME, SCHEDULER_LOCK_FILE
+from config import DEDUP_FILE, DEDUP_DEVICES, DEDUP_EVENTS, DEDUP_WINDOW_SECONDS
+from config import METRICS_DIR, METRICS_PUBLISH_INTERVAL
+from config import STALLS_DIR, MAX_STALLS_PER_LOT
+from config import (INGEST_HOST, INGEST_UDP_PORT, INGEST_MQTT_HOST, INGEST_MQTT_PORT,
+                    INGEST_MQTT_TOPIC, INGEST_FLUSH_INTERVAL)
+from config import DEVICE_KEYS_FILE, DEVICE_RATE_LIMIT, DEVICE_RATE_BURST
+from journal import ParkingJournal
+from sqlite_store import SQLiteLotStore
+from shared_state import SharedLotState
+from lot_registry import LotRegistry
+from occupancy_history import OccupancyHistory
+from forecast import OccupancyForecaster
+from scheduler import Scheduler, LeaderLock
+from dedup import DedupIndex
+from device_auth import DeviceCredentials
+from ingest_gateway import IngestGateway
+from lot_stream import LotChangeBroadcaster, format_sse
+from metrics import Metrics
+from stall_board import StallBoard
 
 app = Flask(__name__)
 
 # Enable CORS for frontend access
-CORS(app, origins=ALLOWED_ORIGINS, supports_credentials=True)
+CORS(app, origins=ALLOWED_ORIGINS, supports_credentials=True, expose_headers=["ETag"])
+
+# Request, persistence and lot metrics served at /metrics (recorded per thread, no locks)
+metrics = Metrics(shared_dir=METRICS_DIR)
+metrics.describe("psupark_http_requests_total", "counter", "HTTP requests by route, method and status.")
+metrics.describe("psupark_http_request_duration_seconds", "histogram",
+                 "Time to produce the response (first byte for streams).")
+metrics.describe("psupark_auth_failures_total", "counter", "Requests rejected for a missing or invalid API key.")
+metrics.describe("psupark_rate_limited_total", "counter", "Requests rejected by a device's rate limit.")
+metrics.describe("psupark_lot_events_total", "counter", "Lot changes by lot and operation.")
+metrics.describe("psupark_clamped_updates_total", "counter",
+                 "Delta updates clamped at zero or at capacity.")
+metrics.describe("psupark_duplicate_events_total", "counter", "Retried sensor events acknowledged but not applied.")
+metrics.describe("psupark_ingest_messages_total", "counter", "Ingest gateway messages by result.")
+metrics.describe("psupark_stream_rejected_total", "counter",
+                 "Stream requests refused because this worker's stream threads were all in use.")
+metrics.describe("psupark_store_write_duration_seconds", "histogram",
+                 "Store commit (write + fsync) and snapshot latency.")
+metrics.describe("psupark_store_events_written_total", "counter", "Lot changes committed to the store.")
+metrics.describe("psupark_state_version", "gauge", "Shared lot state version (bumped by every change).")
+metrics.describe("psupark_lot_available_spaces", "gauge", "Available spaces per lot.")
+
+@app.before_request
+def start_request_timer():
+    request.environ["psupark.started"] = time_module.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = request.environ.get("psupark.started")
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        record_request(route, request.method, response.status_code, time_module.perf_counter() - started)
+    return response
+
+def record_request(route, method, status, seconds):
+    """Count one request and its latency (also used by asgi.py)."""
+    metrics.observe("psupark_http_request_duration_seconds", (("route", route), ("method", method)), seconds)
+    metrics.inc("psupark_http_requests_total", (("route", route), ("method", method), ("status", status)))
 
 # API Key validation function
 def validate_api_key():
     """Validate API key from request headers."""
     provided_key = request.headers.get('X-API-Key') or request.headers.get('Authorization', '').replace('Bearer ', '')
+    # EventSource clients cannot set headers, so /streamLotCount also accepts ?api_key=
+    if not provided_key and request.path == '/streamLotCount':
+        provided_key = request.args.get('api_key')
+    return check_api_key(provided_key)
+
+# Device keys are looked up by SHA-256 digest; each device has its own token bucket
+credentials = DeviceCredentials.from_file(DEVICE_KEYS_FILE, shared_key=API_KEY,
+                                          rate=DEVICE_RATE_LIMIT, burst=DEVICE_RATE_BURST)
+
+def check_api_key(provided_key):
+    """Check a key taken from a request and spend one of its device's tokens.
+
+    Returns (status, error message, retry-after seconds); status is 200 when
+    the request may go ahead, otherwise 401 or 429.
+    """
     if not provided_key:
-        return False, "API key is required. Please provide X-API-Key header."
-    if provided_key != API_KEY:
-        return False, "Invalid API key."
-    return True, None
+        metrics.inc("psupark_auth_failures_total", (("reason", "missing"),))
+        return 401, "API key is required. Please provide X-API-Key header.", None
+    device = credentials.authenticate(provided_key)
+    if device is None:
+        metrics.inc("psupark_auth_failures_total", (("reason", "invalid"),))
+        return 401, "Invalid API key.", None
+    if device.bucket is not None:
+        wait = device.bucket.take()
+        if wait:
+            metrics.inc("psupark_rate_limited_total", (("device", device.device_id),))
+            return 429, "Rate limit exceeded. Slow down and retry later.", math.ceil(wait)
+    return 200, None, None
 
 # API Key decorator
 def require_api_key(f):
-    """Decorator to require API key for endpoints."""
+    """Decorator to require API key for endpoints.
+
+    Runs before the view, so rejected requests never have their body parsed.
+    """
     def decorated_function(*args, **kwargs):
-        is_valid, error_msg = validate_api_key()
-        if not is_valid:
-            return jsonify({"error": error_msg}), 401
+        status, error_msg, retry_after = validate_api_key()
+        if status != 200:
+            response = jsonify({"error": error_msg})
+            if retry_after:
+                response.headers['Retry-After'] = str(retry_after)
+            return response, status
         return f(*args, **kwargs)
     decorated_function.__name__ = f.__name__
     return decorated_function
 
-# File path for parking data persistence
-PARKING_DATA_FILE = "parking_data.json"
+# Lots, capacities and campus/zone metadata come from the registry file (see lots.json)
+lot_registry = LotRegistry.from_file(LOT_REGISTRY_FILE)
 
 # Define parking lot capacities (fixed capacity for each lot)
-lot_capacities = {
-    "G": 169,
-    "H": 238,
-    "J": 153,
-    "M": 167
-}
-
-# Initialize parking lots dictionary (4 lots: G, H, J, M, each starting at full capacity)
-parking_lots = {
-    "G": lot_capacities["G"],
-    "H": lot_capacities["H"],
-    "J": lot_capacities["J"],
-    "M": lot_capacities["M"]
-}
+lot_capacities = lot_registry.capacity_map()
+
+# Identifies this server run. gunicorn.conf.py sets it once in the master process
+# so every worker agrees; a standalone `python app.py` makes up its own.
+RUN_ID = os.environ.setdefault("PARKING_RUN_ID", uuid.uuid4().hex)
+
+# Available spaces per lot, shared by every worker through a memory-mapped file
+# (all lots start at full capacity until load_parking_data() restores them)
+parking_lots = SharedLotState(SHARED_STATE_FILE, lot_capacities, RUN_ID, stripes=LOCK_STRIPES)
+
+def state_gauges():
+    """Current state version and per-lot available spaces, read at scrape time."""
+    version, values = parking_lots.read_all()
+    return ([("psupark_state_version", (), version)] +
+            [("psupark_lot_available_spaces", (("lot", lot),), available)
+             for lot, available in values.items()])
+
+metrics.add_gauges(state_gauges)
+
+# Recently seen device sequence numbers / event ids, so retried POSTs are applied once
+dedup_index = DedupIndex(DEDUP_FILE, devices=DEDUP_DEVICES, events=DEDUP_EVENTS,
+                         window=DEDUP_WINDOW_SECONDS, stripes=LOCK_STRIPES)
+
+# Latest {stall id: occupied} per lot from cameras with a stall map
+stall_board = StallBoard(STALLS_DIR)
 
 # -------------------------------
 # Data Persistence Functions
 # -------------------------------
 
+def record_store_write(kind, seconds, events):
+    """Store callback: time every commit and snapshot."""
+    metrics.observe("psupark_store_write_duration_seconds", (("kind", kind),), seconds)
+    if events:
+        metrics.inc("psupark_store_events_written_total", (), events)
+
+# Persistence engine: an append-only journal compacted into PARKING_DATA_FILE
+# snapshots (default), or a WAL-mode SQLite database with event history
+if STORAGE_BACKEND == "sqlite":
+    store = SQLiteLotStore(
+        SQLITE_DB_FILE,
+        commit_interval=JOURNAL_COMMIT_INTERVAL,
+        maintenance_interval=None,  # run by the scheduler's snapshot job
+        history_days=SQLITE_HISTORY_DAYS,
+        on_write=record_store_write,
+    )
+else:
+    store = ParkingJournal(
+        PARKING_DATA_FILE,
+        JOURNAL_FILE,
+        commit_interval=JOURNAL_COMMIT_INTERVAL,
+        snapshot_interval=None,  # time-based snapshots run as a scheduler job
+        snapshot_max_events=SNAPSHOT_MAX_EVENTS,
+        on_write=record_store_write,
+    )
+
+def read_saved_state():
+    """Read (version, {lot: available}) from the configured store."""
+    # Lots missing from the store or holding invalid values start at full capacity
+    def is_valid(lot, value):
+        return isinstance(value, int) and 0 <= value <= lot_capacities[lot]
+
+    if STORAGE_BACKEND == "sqlite" and store.is_empty() and os.path.exists(PARKING_DATA_FILE):
+        # First start on SQLite: carry over the counts from the JSON files
+        seq, state = ParkingJournal(PARKING_DATA_FILE, JOURNAL_FILE).load(lot_capacities, is_valid)
+        store.record_many(seq, [(lot, available, "import", available) for lot, available in state.items()])
+        store.commit()
+        return seq, state
+
+    return store.load(lot_capacities, is_valid)
+
 def load_parking_data():
-    """Load parking lot data from JSON file on startup."""
-    global parking_lots
-    if os.path.exists(PARKING_DATA_FILE):
-        try:
-            with open(PARKING_DATA_FILE, 'r') as f:
-                data = json.load(f)
-                # Validate that all lots G, H, J, M exist and have valid values
-                for lot in ["G", "H", "J", "M"]:
-                    capacity = lot_capacities[lot]
-                    if lot in data and 0 <= data[lot] <= capacity:
-                        parking_lots[lot] = data[lot]
-                    else:
-                        parking_lots[lot] = capacity  # Default to full capacity if invalid data
-            print(f"Loaded parking data: {parking_lots}")
-        except (json.JSONDecodeError, FileNotFoundError):
-            print("Invalid or missing parking data file. Using default values.")
-    else:
-        print("No parking data file found. Using default values (all lots at full capacity).")
+    """Restore parking lot data from the configured store (snapshot plus journal replay for JSON).
+
+    Only the first worker of a server run loads from disk; later workers
+    attach to the shared state it filled in.
+    """
+    loaded = parking_lots.initialize(read_saved_state)
+    source = "Loaded" if loaded else "Attached to shared"
+    print(f"{source} parking data: {dict(parking_lots)}")
+
+def save_parking_data(version, lot, available, op, value):
+    """Journal a change to one lot; the commit thread persists it shortly after."""
+    store.record(version, lot, available, op, value)
+    metrics.inc("psupark_lot_events_total", (("lot", lot), ("op", op)))
 
-def save_parking_data():
-    """Save current parking lot data to JSON file."""
+def save_parking_changes(version, changes):
+    """Journal several (lot, available, op, value) changes committed at one version."""
+    store.record_many(version, changes)
+    for lot, _, op, _ in changes:
+        metrics.inc("psupark_lot_events_total", (("lot", lot), ("op", op)))
+
+def record_clamp(lot, requested, available):
+    """Count a delta update that hit zero or capacity instead of its requested value."""
+    if requested != available:
+        bound = "zero" if available == 0 else "capacity"
+        metrics.inc("psupark_clamped_updates_total", (("lot", lot), ("bound", bound)))
+
+def start_services():
+    """Load saved data and start the store's commit thread, the change watcher and the scheduler."""
+    load_parking_data()
+    store.start(parking_lots.read_all)
+    atexit.register(stop_services)
+    backfill_history()
+    load_forecast_profiles()
+    watcher = threading.Thread(target=watch_lot_changes, name="lot-change-watcher", daemon=True)
+    watcher.start()
+    schedule_jobs()
+    scheduler.start()
+    if INGEST_UDP_PORT or INGEST_MQTT_HOST:
+        start_ingest(INGEST_UDP_PORT, INGEST_MQTT_HOST)
+
+def stop_services():
+    """Flush state on shutdown (forecast profiles only from the scheduler leader)."""
+    scheduler.stop()
+    ingest_gateway.stop()
+    if scheduler.leader_lock.is_leader:
+        save_forecast_profiles()
+    store.close()
+
+# -------------------------------
+# Lot State Functions
+# -------------------------------
+
+def lot_count_cursor(version):
+    """ETag / ?since= token / SSE id for a state version.
+
+    The run id keeps tokens from a previous run (which may have lost its
+    last commit window) from matching the same version number.
+    """
+    return f"{RUN_ID[:12]}-{version}"
+
+def parse_lot_count_cursor(cursor):
+    """State version in a lot_count_cursor() token, or None if it is from another run
+    or does not parse."""
+    run, _, version = (cursor or "").rpartition("-")
+    if run != RUN_ID[:12]:
+        return None
     try:
-        with open(PARKING_DATA_FILE, 'w') as f:
-            json.dump(parking_lots, f, indent=2)
-        print(f"Saved parking data: {parking_lots}")
-    except Exception as e:
-        print(f"Error saving parking data: {e}")
-
-def reset_daily_data():
-    """Reset all parking lots to full capacity (daily reset at 6 AM)."""
-    global parking_lots
-    for lot in parking_lots:
-        parking_lots[lot] = lot_capacities[lot]
-    save_parking_data()
-    print("Daily reset completed: All lots reset to full capacity")
-
-def daily_reset_scheduler():
-    """Background thread to check for 6 AM daily reset."""
+        return int(version)
+    except ValueError:
+        return None
+
+# Pushes changed lots to /streamLotCount clients
+broadcaster = LotChangeBroadcaster(backlog=STREAM_BACKLOG, event_id=lot_count_cursor)
+
+# Each Flask stream holds a server thread for its whole connection; capping them
+# keeps threads free for sensor updates
+stream_slots = threading.BoundedSemaphore(STREAM_MAX_THREADED_CLIENTS)
+
+# Per-lot occupancy samples with minute/hour/day rollups, served by /history
+occupancy_history = OccupancyHistory(
+    raw_size=HISTORY_RAW_SIZE,
+    minutes=HISTORY_MINUTES,
+    hours=HISTORY_HOURS,
+    days=HISTORY_DAYS,
+    tz=TIMEZONE,
+)
+
+# Day-of-week x time-of-day occupancy profiles for every lot, served by /forecast
+forecaster = OccupancyForecaster(
+    lot_registry.names,
+    lot_registry.capacities,
+    slot_minutes=FORECAST_SLOT_MINUTES,
+    memory_samples=FORECAST_MEMORY_SAMPLES,
+    tz=TIMEZONE,
+)
+
+# Set after this worker changes a lot so the watcher publishes without waiting
+lot_changed = threading.Event()
+
+# Serialized /getLotCount body as (version, body, etag); rebuilt when the state version moves
+_lot_count_cache = (-1, None, None)
+_lot_count_lock = threading.Lock()
+
+def get_lot_count_body():
+    """Return (body, etag) for /getLotCount, rebuilding only after a state change."""
+    global _lot_count_cache
+    cache = _lot_count_cache
+    if cache[0] == parking_lots.version:
+        return cache[1], cache[2]
+    with _lot_count_lock:
+        # Another thread may have refreshed it while we waited
+        if _lot_count_cache[0] != parking_lots.version:
+            version, values = parking_lots.read_all()
+            body = json.dumps([lot_summary(lot, values[lot]) for lot in values], separators=(',', ':'))
+            _lot_count_cache = (version, body, f'"{lot_count_cursor(version)}"')
+        cache = _lot_count_cache
+    return cache[1], cache[2]
+
+# ?since= bodies for the current version, keyed by the client's version
+_lot_changes_cache = (-1, {})
+LOT_CHANGES_CACHE_SIZE = 64
+
+def get_lot_changes_body(since):
+    """Return (body, etag) with only the lots changed after the `since` cursor.
+
+    The per-lot versions in shared state are the change log: one slot per
+    lot, so it never grows. A cursor from another run (or one that does not
+    parse) gets every lot with "full": true, telling the client to replace
+    what it has rather than merge.
+    """
+    global _lot_changes_cache
+    version = parking_lots.version
+    since_version = parse_lot_count_cursor(since)
+    if since_version is None or since_version > version:
+        since_version = -1
+
+    cached_version, bodies = _lot_changes_cache
+    if cached_version != version:
+        bodies = {}
+        _lot_changes_cache = (version, bodies)
+    body = bodies.get(since_version)
+    if body is None:
+        changed = parking_lots.changed_since(since_version)
+        body = json.dumps({
+            "version": lot_count_cursor(version),
+            "full": since_version < 0 or len(changed) == len(lot_registry.names),
+            "lots": [lot_summary(lot) for lot in changed]
+        }, separators=(',', ':'))
+        if len(bodies) < LOT_CHANGES_CACHE_SIZE:
+            bodies[since_version] = body
+    return body, f'"{lot_count_cursor(version)}"'
+
+def lot_summary(lot, available_spaces=None):
+    """Build the public occupancy record for one lot."""
+    if available_spaces is None:
+        available_spaces = parking_lots[lot]
+    capacity = lot_capacities[lot]
+    occupied_spaces = capacity - available_spaces
+    return {
+        "lot": lot,
+        "available_spaces": available_spaces,
+        "capacity": capacity,
+        "occupied_spaces": occupied_spaces,
+        "occupancy_pct": round((occupied_spaces / capacity) * 100, 1)
+    }
+
+def lot_details(lot):
+    """lot_summary() plus the lot's registry metadata (name, campus, zone)."""
+    return {**lot_registry.metadata(lot), **lot_summary(lot)}
+
+def invalid_lot_message():
+    """Error text for an unknown lot; only lists the lots when there are a handful."""
+    if len(lot_registry) <= 20:
+        return f"Invalid lot. Must be one of: {lot_registry.names}"
+    return "Invalid lot. See GET /getLotCount for the list of lots."
+
+def stream_snapshot_event():
+    """Full-state SSE message for new or lagging stream clients; returns (version, message)."""
+    # Lots may already be newer than `version`; clients just see them again later
+    version = broadcaster.version
+    lots_data = [lot_summary(lot) for lot in parking_lots]
+    return version, format_sse(lot_count_cursor(version), "snapshot", {"version": version, "lots": lots_data})
+
+def parse_event_identity(data):
+    """Pull (device_id, seq, event_id, boot_id) out of an update, or raise ValueError."""
+    device_id = data.get("device_id")
+    seq = data.get("seq")
+    event_id = data.get("event_id")
+    boot_id = data.get("boot_id")
+
+    if device_id is not None and (not isinstance(device_id, str) or not 0 < len(device_id) <= 128):
+        raise ValueError("Invalid device_id. Must be a string of up to 128 characters")
+    if seq is not None:
+        if device_id is None:
+            raise ValueError("seq requires a device_id")
+        if not isinstance(seq, int) or isinstance(seq, bool) or not 0 <= seq < 2 ** 63:
+            raise ValueError("Invalid seq. Must be a non-negative integer")
+    if boot_id is not None:
+        if seq is None:
+            raise ValueError("boot_id requires a seq")
+        if not isinstance(boot_id, str) or not 0 < len(boot_id) <= 64:
+            raise ValueError("Invalid boot_id. Must be a string of up to 64 characters")
+    if event_id is not None and (not isinstance(event_id, str) or not 0 < len(event_id) <= 128):
+        raise ValueError("Invalid event_id. Must be a string of up to 128 characters")
+
+    # Older clients send only device_id + timestamp; a retried payload repeats the timestamp
+    timestamp = data.get("timestamp")
+    if seq is None and event_id is None and device_id is not None and isinstance(timestamp, str):
+        event_id = f"ts:{data.get('lot')}:{timestamp[:64]}"
+    return device_id, seq, event_id, boot_id
+
+def is_duplicate(data):
+    """Record the update's event identity; True if it was already applied (a retry)."""
+    device_id, seq, event_id, boot_id = parse_event_identity(data)
+    if dedup_index.accept(device_id, seq, event_id, boot_id=boot_id):
+        return False
+    metrics.inc("psupark_duplicate_events_total")
+    return True
+
+def backfill_history():
+    """Seed the in-memory history from the SQLite event table, when that store is used."""
+    if STORAGE_BACKEND != "sqlite":
+        return
+    now = time_module.time()
+    start = now - HISTORY_DAYS * 86400
+    for lot in lot_registry.names:
+        capacity = lot_capacities[lot]
+        for ts, available in store.lot_history(lot, start, now, limit=HISTORY_BACKFILL_LIMIT):
+            occupancy_history.record(ts, lot, capacity - available)
+
+def load_forecast_profiles():
+    """Restore saved forecast profiles, or learn them from the in-memory history."""
+    if forecaster.load(FORECAST_FILE):
+        print(f"Loaded forecast profiles from {FORECAST_FILE}")
+        return
+    now = time_module.time()
+    for lot in lot_registry.names:
+        for point in occupancy_history.query(lot, now - HISTORY_HOURS * 3600, now, "hour"):
+            forecaster.observe(point["ts"], lot, point["mean"])
+
+def save_forecast_profiles():
+    """Write forecast profiles to disk so a restart doesn't start from scratch."""
+    try:
+        forecaster.save(FORECAST_FILE)
+    except OSError as e:
+        print(f"Error saving forecast profiles: {e}")
+
+def watch_lot_changes():
+    """Background thread publishing lot changes made by any worker to this worker's
+    stream clients and occupancy history."""
+    last_version = parking_lots.version
+    broadcaster.reset(last_version)
     while True:
-        now = datetime.now()
-        # Check if it's 6 AM
-        if now.hour == 6 and now.minute == 0:
-            reset_daily_data()
-            # Sleep for 1 minute to avoid multiple resets
-            time_module.sleep(60)
+        lot_changed.wait(STATE_POLL_INTERVAL)
+        lot_changed.clear()
+        version = parking_lots.version
+        if version == last_version:
+            continue
+        # Lot versions are written before the global version, so none are missed
+        changed = [lot_summary(lot) for lot in parking_lots.changed_since(last_version)]
+        # Stream clients only ever get lots that changed; never send an empty event
+        if changed:
+            broadcaster.publish(last_version, version, changed)
+            occupancy_history.record_many(time_module.time(),
+                                          [(lot["lot"], lot["occupied_spaces"]) for lot in changed])
+        last_version = version
+
+def sample_all_lots():
+    """Record every lot in the history and forecaster, so quiet stretches still show up."""
+    now = time_module.time()
+    occupied = [lot_capacities[lot] - available for lot, available in parking_lots.items()]
+    occupancy_history.record_many(now, zip(lot_registry.names, occupied))
+    forecaster.observe_all(now, occupied)
+
+def validate_batch_update(item):
+    """Check one batch item; return (lot, op, value) or raise ValueError."""
+    if not isinstance(item, dict):
+        raise ValueError("Each update must be a JSON object")
+
+    lot = item.get("lot")
+    if not lot or lot not in parking_lots:
+        raise ValueError(invalid_lot_message())
+
+    has_delta = "delta" in item
+    has_occupied = "occupied_count" in item
+    if has_delta == has_occupied:
+        raise ValueError("Provide exactly one of delta or occupied_count")
+
+    if has_delta:
+        delta = item["delta"]
+        if not isinstance(delta, int) or isinstance(delta, bool):
+            raise ValueError("Invalid delta. Must be an integer")
+        op, value = "delta", delta
+    else:
+        occupied_count = item["occupied_count"]
+        if not isinstance(occupied_count, int) or isinstance(occupied_count, bool):
+            raise ValueError("Invalid occupied_count. Must be an integer.")
+        if occupied_count < 0:
+            raise ValueError("occupied_count cannot be negative")
+        op, value = "set", occupied_count
+
+    parse_event_identity(item)
+    return lot, op, value
+
+def apply_batch_updates(items):
+    """Validate all items, then apply the valid ones under one lock and one store write.
+
+    Returns one result dict per item, in order. Items already applied by an
+    earlier (retried) request are acknowledged with "duplicate": true.
+    """
+    results = [None] * len(items)
+    valid = []
+    duplicates = []
+    for i, item in enumerate(items):
+        try:
+            lot, op, value = validate_batch_update(item)
+        except ValueError as e:
+            results[i] = {"index": i, "ok": False, "error": str(e)}
+            continue
+        if is_duplicate(item):
+            duplicates.append((i, lot))
         else:
-            # Check every minute
-            time_module.sleep(60)
+            valid.append((i, lot, op, value))
+
+    if valid:
+        changes = []
+        with parking_lots.transaction([lot for _, lot, _, _ in valid]) as txn:
+            for i, lot, op, value in valid:
+                if op == "delta":
+                    requested = txn.get(lot) + value
+                    available = txn.set(lot, requested)
+                    record_clamp(lot, requested, available)
+                else:
+                    available = txn.set(lot, lot_capacities[lot] - value)
+                changes.append((lot, available, op, value))
+                results[i] = {"index": i, "ok": True, **lot_summary(lot, available)}
+        # Items that left their lot as it was (a repeated count, a clamped delta) are not changes
+        changes = [change for change in changes if txn.is_changed(change[0])]
+        if changes:
+            save_parking_changes(txn.version, changes)
+            lot_changed.set()
+
+    for i, lot in duplicates:
+        results[i] = {"index": i, "ok": True, "duplicate": True, **lot_summary(lot)}
+
+    return results
+
+def reset_daily_data(lots=None):
+    """Reset parking lots (all of them by default) to full capacity."""
+    lots = list(parking_lots) if lots is None else list(lots)
+    with parking_lots.transaction(lots) as txn:
+        for lot in lots:
+            txn.set(lot, lot_capacities[lot])
+    changes = [(lot, lot_capacities[lot], "reset", lot_capacities[lot])
+               for lot in lots if txn.is_changed(lot)]
+    if changes:
+        save_parking_changes(txn.version, changes)
+        lot_changed.set()
+    print(f"Daily reset completed: {len(lots)} lot(s) reset to full capacity")
+
+# -------------------------------
+# Request Handlers (shared by the Flask routes and asgi.py)
+# -------------------------------
+
+def apply_lot_delta(data):
+    """Apply one /updateLotCount body; returns (response body, status)."""
+    if not data:
+        return {"error": "No JSON data provided"}, 400
+    
+    lot = data.get("lot")
+    delta = data.get("delta")
+    
+    # Validate input
+    if not lot or lot not in parking_lots:
+        return {"error": invalid_lot_message()}, 400
+    
+    if delta is None or not isinstance(delta, int):
+        return {"error": "Invalid delta. Must be an integer (-1 for car entering, +1 for car exiting)"}, 400
+    
+    if delta not in [-1, 1]:
+        return {"error": "Delta must be -1 (car entering) or +1 (car exiting)"}, 400
+
+    # A retried request is acknowledged with the current count but not applied again
+    try:
+        duplicate = is_duplicate(data)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    if duplicate:
+        return {**lot_summary(lot), "duplicate": True,
+                "action": "car_entered" if delta == -1 else "car_exited"}, 200
+    
+    # Update available spaces and queue the change for the store (committed in the background)
+    # (clamped to 0..capacity atomically across all workers)
+    with parking_lots.transaction([lot]) as txn:
+        requested = txn.get(lot) + delta
+        new_spaces = txn.set(lot, requested)
+    record_clamp(lot, requested, new_spaces)
+    if txn.changed:   # a delta clamped at zero or capacity changes nothing
+        save_parking_data(txn.version, lot, new_spaces, "delta", delta)
+        lot_changed.set()
+    capacity = lot_capacities[lot]
+    
+    # Calculate occupancy percentage
+    occupied_spaces = capacity - new_spaces
+    occupancy_pct = round((occupied_spaces / capacity) * 100, 1)
+    
+    # Return updated lot information
+    return {
+        "lot": lot,
+        "available_spaces": new_spaces,
+        "capacity": capacity,
+        "occupied_spaces": occupied_spaces,
+        "occupancy_pct": occupancy_pct,
+        "action": "car_entered" if delta == -1 else "car_exited"
+    }, 200
+
+def apply_lot_occupancy(data):
+    """Apply one /setLotOccupancy body; returns (response body, status)."""
+    if not data:
+        return {"error": "No JSON data provided"}, 400
+
+    lot = data.get("lot")
+    occupied_count = data.get("occupied_count")
+    stalls = data.get("stalls")
+
+    # Validate input
+    if not lot or lot not in parking_lots:
+        return {"error": invalid_lot_message()}, 400
+
+    # Cameras with a stall map may send {stall id: occupied}; the count then defaults to it
+    if stalls is not None:
+        if (not isinstance(stalls, dict) or len(stalls) > MAX_STALLS_PER_LOT or
+                not all(isinstance(v, bool) for v in stalls.values())):
+            return {"error": f"stalls must map up to {MAX_STALLS_PER_LOT} stall ids to true/false"}, 400
+        if occupied_count is None:
+            occupied_count = sum(stalls.values())
+
+    if occupied_count is None or not isinstance(occupied_count, int):
+        return {"error": "Invalid occupied_count. Must be an integer."}, 400
+
+    if occupied_count < 0:
+        return {"error": "occupied_count cannot be negative"}, 400
+
+    capacity = lot_capacities[lot]
+
+    # Ensure occupied count doesn't exceed capacity
+    if occupied_count > capacity:
+        occupied_count = capacity
+
+    # A retried reading is acknowledged but not applied again
+    try:
+        duplicate = is_duplicate(data)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    if duplicate:
+        return {**lot_summary(lot), "duplicate": True,
+                "message": f"Lot {lot} already updated by this event"}, 200
+
+    # Update parking lot and queue the change for the store (committed in the background)
+    # Cameras re-post the same count every capture; that is not a change (no new version)
+    with parking_lots.transaction([lot]) as txn:
+        new_available_spaces = txn.set(lot, capacity - occupied_count)
+    if txn.changed:
+        save_parking_data(txn.version, lot, new_available_spaces, "set", occupied_count)
+        lot_changed.set()
+    if stalls is not None:
+        stall_board.update(lot, stalls)
+
+    # Calculate occupancy percentage
+    occupancy_pct = round((occupied_count / capacity) * 100, 1)
+
+    # Return updated lot information
+    return {
+        "lot": lot,
+        "available_spaces": new_available_spaces,
+        "capacity": capacity,
+        "occupied_spaces": occupied_count,
+        "occupancy_pct": occupancy_pct,
+        "message": f"Lot {lot} updated with {occupied_count} occupied spots"
+    }, 200
+
+def apply_batch_request(data):
+    """Apply one /batchUpdate body; returns (response body, status)."""
+    # Accept either a bare list or {"updates": [...]}
+    items = data.get("updates") if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return {"error": "Provide a non-empty list of updates"}, 400
+
+    if len(items) > MAX_BATCH_SIZE:
+        return {"error": f"Too many updates. Maximum batch size is {MAX_BATCH_SIZE}"}, 413
+
+    results = apply_batch_updates(items)
+    accepted = sum(1 for r in results if r["ok"])
+    duplicates = sum(1 for r in results if r.get("duplicate"))
+
+    return {
+        "applied": accepted - duplicates,
+        "duplicates": duplicates,
+        "rejected": len(results) - accepted,
+        "results": results
+    }, 200
+
+# -------------------------------
+# Sensor Ingest Gateway
+# -------------------------------
+
+def device_key(device_id):
+    """Signing key for a device; without a key file every device uses API_KEY."""
+    if not len(credentials):
+        return API_KEY
+    return credentials.signing_key(device_id)
+
+# Signed UDP / MQTT updates, coalesced per lot and applied like /batchUpdate
+ingest_gateway = IngestGateway(
+    apply_batch_updates,
+    device_key,
+    lambda device_id, seq: dedup_index.accept(device_id, seq),
+    lambda lot: lot in parking_lots,
+    flush_interval=INGEST_FLUSH_INTERVAL,
+    on_reply=lambda result: metrics.inc("psupark_ingest_messages_total", (("result", result),)),
+)
+
+def start_ingest(udp_port=0, mqtt_host=""):
+    """Start the ingest flusher plus a UDP listener and/or MQTT subscription."""
+    ingest_gateway.start()
+    if udp_port:
+        host, port = ingest_gateway.serve_udp(INGEST_HOST, udp_port)
+        print(f"Ingest gateway listening for UDP on {host}:{port}")
+    if mqtt_host:
+        ingest_gateway.connect_mqtt(mqtt_host, INGEST_MQTT_PORT, INGEST_MQTT_TOPIC)
+        print(f"Ingest gateway subscribed to {INGEST_MQTT_TOPIC} on {mqtt_host}:{INGEST_MQTT_PORT}")
+
+# -------------------------------
+# Scheduled Jobs
+# -------------------------------
+
+# Timer-heap scheduler; jobs marked leader_only run in exactly one worker
+scheduler = Scheduler(LeaderLock(SCHEDULER_LOCK_FILE))
+
+def schedule_jobs():
+    """Register the daily resets and maintenance jobs."""
+    # One reset job per distinct reset time (lots without one use DAILY_RESET_TIME)
+    resets = {}
+    for lot in lot_registry.names:
+        resets.setdefault(lot_registry.reset_time(lot) or DAILY_RESET_TIME, []).append(lot)
+    for reset_time, lots in sorted(resets.items()):
+        scheduler.daily(f"reset@{reset_time}", reset_time,
+                        lambda lots=lots: reset_daily_data(lots), tz=TIMEZONE)
+
+    # Only one worker needs to write snapshots and forecast profiles
+    scheduler.every("snapshot", SNAPSHOT_INTERVAL, store.snapshot, leader_only=True)
+    scheduler.every("save-forecast", FORECAST_SAVE_INTERVAL, save_forecast_profiles, leader_only=True)
+    # Every worker keeps its own in-memory history and profiles, and publishes its metrics
+    scheduler.every("sample-lots", HISTORY_SAMPLE_INTERVAL, sample_all_lots)
+    scheduler.every("publish-metrics", METRICS_PUBLISH_INTERVAL, metrics.publish)
+    sample_all_lots()
 
 # -------------------------------
 # API Endpoints
@@ -118,54 +776,9 @@ def daily_reset_scheduler():
 def update_lot_count():
     """Update parking lot count when a car enters or exits."""
     try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({"error": "No JSON data provided"}), 400
-        
-        lot = data.get("lot")
-        delta = data.get("delta")
-        
-        # Validate input
-        if not lot or lot not in parking_lots:
-            return jsonify({"error": f"Invalid lot. Must be one of: {list(parking_lots.keys())}"}), 400
-        
-        if delta is None or not isinstance(delta, int):
-            return jsonify({"error": "Invalid delta. Must be an integer (-1 for car entering, +1 for car exiting)"}), 400
-        
-        if delta not in [-1, 1]:
-            return jsonify({"error": "Delta must be -1 (car entering) or +1 (car exiting)"}), 400
-        
-        # Update available spaces
-        current_spaces = parking_lots[lot]
-        new_spaces = current_spaces + delta
-        capacity = lot_capacities[lot]
-        
-        # Ensure spaces stay within valid range (0 to capacity)
-        if new_spaces < 0:
-            new_spaces = 0
-        elif new_spaces > capacity:
-            new_spaces = capacity
-        
-        parking_lots[lot] = new_spaces
-        
-        # Save to file
-        save_parking_data()
-        
-        # Calculate occupancy percentage
-        occupied_spaces = capacity - new_spaces
-        occupancy_pct = round((occupied_spaces / capacity) * 100, 1)
-        
-        # Return updated lot information
-        return jsonify({
-            "lot": lot,
-            "available_spaces": new_spaces,
-            "capacity": capacity,
-            "occupied_spaces": occupied_spaces,
-            "occupancy_pct": occupancy_pct,
-            "action": "car_entered" if delta == -1 else "car_exited"
-        })
-        
+        body, status = apply_lot_delta(request.get_json())
+        return jsonify(body), status
+
     except Exception as e:
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
@@ -174,102 +787,258 @@ def update_lot_count():
 def set_lot_occupancy():
     """Set parking lot occupancy based on absolute count (for camera sensors)."""
     try:
-        data = request.get_json()
+        body, status = apply_lot_occupancy(request.get_json())
+        return jsonify(body), status
 
-        if not data:
-            return jsonify({"error": "No JSON data provided"}), 400
+    except Exception as e:
+        return jsonify({"error": f"Server error: {str(e)}"}), 500
 
-        lot = data.get("lot")
-        occupied_count = data.get("occupied_count")
+@app.route("/batchUpdate", methods=["POST"])
+@require_api_key
+def batch_update():
+    """Apply many delta / occupancy updates across lots in one request (for sensor gateways)."""
+    try:
+        body, status = apply_batch_request(request.get_json())
+        return jsonify(body), status
 
-        # Validate input
-        if not lot or lot not in parking_lots:
-            return jsonify({"error": f"Invalid lot. Must be one of: {list(parking_lots.keys())}"}), 400
+    except Exception as e:
+        return jsonify({"error": f"Server error: {str(e)}"}), 500
 
-        if occupied_count is None or not isinstance(occupied_count, int):
-            return jsonify({"error": "Invalid occupied_count. Must be an integer."}), 400
+@app.route("/getLotCount", methods=["GET"])
+@require_api_key
+def get_lot_count():
+    """Get occupancy information for all parking lots, optionally filtered by ?campus= / ?zone=.
 
-        if occupied_count < 0:
-            return jsonify({"error": "occupied_count cannot be negative"}), 400
+    The unfiltered body is cached per state version and tagged with an ETag,
+    so clients polling with If-None-Match get a 304 until something changes.
+    With ?since=<version> only the lots changed after that version are sent.
+    """
+    try:
+        campus = request.args.get("campus")
+        zone = request.args.get("zone")
+        if campus is not None or zone is not None:
+            return jsonify([lot_summary(lot) for lot in lot_registry.filter(campus=campus, zone=zone)])
 
-        capacity = lot_capacities[lot]
+        since = request.args.get("since")
+        if since is not None:
+            body, etag = get_lot_changes_body(since)
+            return Response(body, mimetype="application/json",
+                            headers={"ETag": etag, "Cache-Control": "no-cache"})
 
-        # Ensure occupied count doesn't exceed capacity
-        if occupied_count > capacity:
-            occupied_count = capacity
+        body, etag = get_lot_count_body()
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
 
-        # Calculate available spaces (capacity - occupied)
-        new_available_spaces = capacity - occupied_count
+        if request.if_none_match.contains(etag.strip('"')):
+            return Response(status=304, headers=headers)
 
-        # Update parking lot
-        parking_lots[lot] = new_available_spaces
+        return Response(body, mimetype="application/json", headers=headers)
 
-        # Save to file
-        save_parking_data()
+    except Exception as e:
+        return jsonify({"error": f"Server error: {str(e)}"}), 500
 
-        # Calculate occupancy percentage
-        occupancy_pct = round((occupied_count / capacity) * 100, 1)
+@app.route("/getLotCount/<lot>", methods=["GET"])
+@require_api_key
+def get_single_lot_count(lot):
+    """Get occupancy information for one parking lot."""
+    try:
+        if lot not in lot_registry:
+            return jsonify({"error": invalid_lot_message()}), 404
+
+        return jsonify(lot_details(lot))
+
+    except Exception as e:
+        return jsonify({"error": f"Server error: {str(e)}"}), 500
+
+@app.route("/getLotStalls/<lot>", methods=["GET"])
+@require_api_key
+def get_lot_stalls(lot):
+    """Get the latest per-stall occupancy a camera reported for a lot."""
+    try:
+        if lot not in lot_registry:
+            return jsonify({"error": invalid_lot_message()}), 404
+
+        data = stall_board.get(lot)
+        if data is None:
+            return jsonify({"error": f"No stall data for lot {lot}"}), 404
 
-        # Return updated lot information
+        stalls = data["stalls"]
+        occupied = sum(stalls.values())
         return jsonify({
             "lot": lot,
-            "available_spaces": new_available_spaces,
-            "capacity": capacity,
-            "occupied_spaces": occupied_count,
-            "occupancy_pct": occupancy_pct,
-            "message": f"Lot {lot} updated with {occupied_count} occupied spots"
+            "updated_at": datetime.fromtimestamp(data["updated_at"]).isoformat(),
+            "total": len(stalls),
+            "occupied": occupied,
+            "free": len(stalls) - occupied,
+            "free_stalls": [stall for stall, taken in stalls.items() if not taken],
+            "stalls": stalls
         })
 
     except Exception as e:
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
-@app.route("/getLotCount", methods=["GET"])
+def parse_timestamp(value, default):
+    """Parse a Unix timestamp or ISO 8601 string (campus TIMEZONE if no offset)."""
+    if value is None:
+        return default
+    try:
+        ts = float(value)
+    except ValueError:
+        when = datetime.fromisoformat(value)
+        if when.tzinfo is None and TIMEZONE is not None:
+            when = when.replace(tzinfo=TIMEZONE)
+        return when.timestamp()
+    if not math.isfinite(ts):
+        raise ValueError(f"Timestamp must be finite: {value}")
+    try:
+        datetime.fromtimestamp(ts, TIMEZONE)   # history buckets need it as a calendar time
+    except (OverflowError, OSError):
+        raise ValueError(f"Timestamp out of range: {value}")
+    return ts
+
+@app.route("/history", methods=["GET"])
 @require_api_key
-def get_lot_count():
-    """Get occupancy information for all parking lots."""
+def get_history():
+    """Get a lot's occupancy history between ?start= and ?end= at ?resolution=.
+
+    Resolution is raw, minute, hour (default) or day. Times are Unix
+    timestamps or ISO 8601 strings; the default range is the last 24 hours.
+    """
     try:
-        lots_data = []
+        lot = request.args.get("lot")
+        if not lot or lot not in lot_registry:
+            return jsonify({"error": invalid_lot_message()}), 400
 
-        for lot, available_spaces in parking_lots.items():
-            capacity = lot_capacities[lot]
-            occupied_spaces = capacity - available_spaces
-            occupancy_pct = round((occupied_spaces / capacity) * 100, 1)
+        resolution = request.args.get("resolution", "hour")
+        if resolution not in ("raw", "minute", "hour", "day"):
+            return jsonify({"error": "Invalid resolution. Must be one of: raw, minute, hour, day"}), 400
 
-            lots_data.append({
-                "lot": lot,
-                "available_spaces": available_spaces,
-                "capacity": capacity,
-                "occupied_spaces": occupied_spaces,
-                "occupancy_pct": occupancy_pct
-            })
+        try:
+            end = parse_timestamp(request.args.get("end"), time_module.time())
+            start = parse_timestamp(request.args.get("start"), end - 86400)
+        except ValueError:
+            return jsonify({"error": "Invalid start/end. Use a Unix timestamp or ISO 8601 time."}), 400
 
-        return jsonify(lots_data)
+        return jsonify({
+            "lot": lot,
+            "capacity": lot_capacities[lot],
+            "resolution": resolution,
+            "start": start,
+            "end": end,
+            "points": occupancy_history.query(lot, start, end, resolution)
+        })
 
     except Exception as e:
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
+@app.route("/forecast", methods=["GET"])
+@require_api_key
+def get_forecast():
+    """Predict a lot's occupancy ?minutes= from now (default 30) from its learned weekly profile."""
+    try:
+        lot = request.args.get("lot")
+        if not lot or lot not in lot_registry:
+            return jsonify({"error": invalid_lot_message()}), 400
 
+        try:
+            minutes = int(request.args.get("minutes", 30))
+        except ValueError:
+            return jsonify({"error": "Invalid minutes. Must be an integer."}), 400
+        if not 0 <= minutes <= FORECAST_MAX_MINUTES:
+            return jsonify({"error": f"minutes must be between 0 and {FORECAST_MAX_MINUTES}"}), 400
+
+        now = time_module.time()
+        capacity = lot_capacities[lot]
+        occupied_now = capacity - parking_lots[lot]
+        occupied, samples = forecaster.forecast(lot, occupied_now, minutes, now)
+
+        return jsonify({
+            "lot": lot,
+            "minutes": minutes,
+            "at": datetime.fromtimestamp(now + minutes * 60, TIMEZONE).isoformat(),
+            "capacity": capacity,
+            "current_occupied_spaces": occupied_now,
+            "occupied_spaces": occupied,
+            "available_spaces": capacity - occupied,
+            "occupancy_pct": round((occupied / capacity) * 100, 1),
+            "samples": samples
+        })
+
+    except Exception as e:
+        return jsonify({"error": f"Server error: {str(e)}"}), 500
+
+@app.route("/streamLotCount", methods=["GET"])
+@require_api_key
+def stream_lot_count():
+    """Stream lot changes as Server-Sent Events instead of polling /getLotCount.
+
+    The first event is a full snapshot; after that only changed lots are sent,
+    each tagged with a cursor for the state version. Reconnecting clients resume from the
+    Last-Event-ID header and get a fresh snapshot if they fell too far behind.
+    """
+    if not stream_slots.acquire(blocking=False):
+        metrics.inc("psupark_stream_rejected_total")
+        response = jsonify({"error": "Too many open streams on this server; poll /getLotCount instead"})
+        response.headers["Retry-After"] = str(int(STREAM_KEEPALIVE_SECONDS))
+        return response, 503
+
+    # Ids carry the run id, so an id from before a restart gets a fresh snapshot
+    last_seen = parse_lot_count_cursor(request.headers.get('Last-Event-ID') or request.args.get('since'))
+
+    def generate():
+        version = last_seen
+        if version is None or version > broadcaster.version:
+            version, message = stream_snapshot_event()
+            yield message
+        while True:
+            latest, messages = broadcaster.wait_for_changes(version, STREAM_KEEPALIVE_SECONDS)
+            if messages is None:
+                version, message = stream_snapshot_event()
+                yield message
+            elif messages:
+                version = latest
+                yield "".join(messages)
+            else:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+
+    response = Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # The server closes the response when the client disconnects (or the stream fails)
+    response.call_on_close(stream_slots.release)
+    return response
+
+@app.route("/metrics", methods=["GET"])
+@require_api_key
+def get_metrics():
+    """Server metrics in Prometheus text format (totals across all workers)."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 # -------------------------------
 # Initialize and Run App
 # -------------------------------
 
+# Load existing data and start background jobs on import so gunicorn workers run them too
+start_services()
+
 if __name__ == "__main__":
-    # Load existing data on startup
-    load_parking_data()
-    
-    # Start daily reset scheduler in background thread
-    reset_thread = threading.Thread(target=daily_reset_scheduler, daemon=True)
-    reset_thread.start()
-    
     print("Starting Parking App Backend...")
-    print(f"Available lots: {list(parking_lots.keys())}")
+    print(f"Available lots ({len(lot_registry)}): {lot_registry.names[:20]}{' ...' if len(lot_registry) > 20 else ''}")
     print(f"API Key: {API_KEY[:20]}... (first 20 chars)")
     print(f"CORS enabled for origins: {ALLOWED_ORIGINS}")
     print("Endpoints:")
     print("  POST /updateLotCount - Update lot count (requires API key)")
     print("  POST /setLotOccupancy - Set lot occupancy by count (requires API key)")
-    print("  GET /getLotCount - Get all lot data (requires API key)")
+    print("  POST /batchUpdate - Apply many lot updates at once (requires API key)")
+    print("  GET /getLotCount - Get all lot data, filter with ?campus= / ?zone= (requires API key)")
+    print("  GET /getLotCount/<lot> - Get one lot's data (requires API key)")
+    print("  GET /getLotStalls/<lot> - Per-stall occupancy from lot cameras (requires API key)")
+    print("  GET /history?lot=&start=&end=&resolution= - Occupancy history (requires API key)")
+    print("  GET /forecast?lot=&minutes= - Predicted lot occupancy (requires API key)")
+    print("  GET /streamLotCount - Stream lot changes as Server-Sent Events (requires API key)")
+    print("  GET /metrics - Prometheus metrics (requires API key)")
     print(f"Server running on {HOST}:{PORT}")
     
     app.run(host=HOST, port=PORT, debug=DEBUG)
\ No newline at end of file
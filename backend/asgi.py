@@ -0,0 +1,360 @@
+# Async (ASGI) serving mode for the parking backend
+# Penn State Abington - CMPSC 462 Final Project
+#
+# Serves the same API as app.py on an event loop, for uvicorn:
+#
+#   uvicorn asgi:app --host 0.0.0.0 --port 5002
+#   gunicorn -c gunicorn.conf.py -k uvicorn_worker.UvicornWorker asgi:app
+#
+# The sensor and polling routes (/updateLotCount, /setLotOccupancy,
+# /batchUpdate, /getLotCount) and /streamLotCount run directly on the loop.
+# Their handlers only touch shared memory and queue store writes, so they
+# never block for long. Stream clients are coroutines woken by the change
+# broadcaster rather than threads parked in a wait, so one process can hold
+# thousands of idle or slow connections. Every other route (and CORS
+# preflights) is passed to the Flask app in a worker thread, so behavior
+# there is identical.
+
+import asyncio
+import io
+import json
+import time
+from urllib.parse import parse_qs, unquote
+
+import app as backend
+from config import ALLOWED_ORIGINS, STREAM_KEEPALIVE_SECONDS
+
+MAX_BODY_BYTES = 4 * 1024 * 1024
+JSON_HEADERS = [(b"content-type", b"application/json")]
+
+
+class Request:
+    """The parts of an ASGI HTTP request the handlers need."""
+
+    def __init__(self, scope, body):
+        self.scope = scope
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.headers = {name.decode("latin-1"): value.decode("latin-1")
+                        for name, value in scope["headers"]}
+        self.args = {key: values[0] for key, values in
+                     parse_qs(scope.get("query_string", b"").decode("latin-1")).items()}
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body) if self.body else None
+
+
+# -------------------------------
+# Responses
+# -------------------------------
+
+def cors_headers(request):
+    """The headers flask-cors adds for an allowed origin (see app.py)."""
+    origin = request.headers.get("origin")
+    if origin not in ALLOWED_ORIGINS:
+        return []
+    return [(b"access-control-allow-origin", origin.encode("latin-1")),
+            (b"access-control-allow-credentials", b"true"),
+            (b"access-control-expose-headers", b"ETag"),
+            (b"vary", b"Origin")]
+
+
+async def send_response(send, request, status, body=b"", headers=()):
+    await send({"type": "http.response.start", "status": status,
+                "headers": [*headers, *cors_headers(request)]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_json(send, request, body, status=200):
+    payload = backend.app.json.dumps(body, separators=(",", ":")).encode() + b"\n"
+    await send_response(send, request, status, payload, JSON_HEADERS)
+
+
+# -------------------------------
+# Stream wake-ups
+# -------------------------------
+
+class ChangeSignal:
+    """asyncio counterpart of the broadcaster's condition: one event per publish."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.event = asyncio.Event()
+
+    def notify_threadsafe(self):
+        # Called from the change-watcher thread
+        self.loop.call_soon_threadsafe(self._fire)
+
+    def _fire(self):
+        event, self.event = self.event, asyncio.Event()
+        event.set()
+
+
+_signal = None
+
+
+def change_signal():
+    global _signal
+    if _signal is None:
+        _signal = ChangeSignal(asyncio.get_running_loop())
+        backend.broadcaster.add_listener(_signal.notify_threadsafe)
+    return _signal
+
+
+# -------------------------------
+# Routes
+# -------------------------------
+
+def authorize(request):
+    """Same key sources as app.validate_api_key(); returns (status, error message, retry-after)."""
+    provided_key = (request.headers.get("x-api-key") or
+                    request.headers.get("authorization", "").replace("Bearer ", ""))
+    if not provided_key and request.path == "/streamLotCount":
+        provided_key = request.args.get("api_key")
+    return backend.check_api_key(provided_key)
+
+
+async def post_update(handler, request, send):
+    try:
+        data = request.json()
+    except ValueError:
+        return await send_json(send, request, {"error": "Invalid JSON body"}, 400)
+    try:
+        body, status = handler(data)
+    except Exception as e:
+        body, status = {"error": f"Server error: {str(e)}"}, 500
+    await send_json(send, request, body, status)
+
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+async def get_lot_count(request, send):
+    campus = request.args.get("campus")
+    zone = request.args.get("zone")
+    if campus is not None or zone is not None:
+        lots = backend.lot_registry.filter(campus=campus, zone=zone)
+        return await send_json(send, request, [backend.lot_summary(lot) for lot in lots])
+
+    since = request.args.get("since")
+    if since is not None:
+        body, etag = backend.get_lot_changes_body(since)
+        headers = [(b"etag", etag.encode()), (b"cache-control", b"no-cache")]
+        return await send_response(send, request, 200, body.encode(), [*JSON_HEADERS, *headers])
+
+    body, etag = backend.get_lot_count_body()
+    headers = [(b"etag", etag.encode()), (b"cache-control", b"no-cache")]
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return await send_response(send, request, 304, headers=headers)
+    await send_response(send, request, 200, body.encode(), [*JSON_HEADERS, *headers])
+
+
+async def get_single_lot_count(request, send, lot):
+    if lot not in backend.lot_registry:
+        return await send_json(send, request, {"error": backend.invalid_lot_message()}, 404)
+    await send_json(send, request, backend.lot_details(lot))
+
+
+async def stream_lot_count(request, receive, send):
+    """/streamLotCount as a coroutine: same events, ids and resume rules as app.py."""
+    version = backend.parse_lot_count_cursor(request.headers.get("last-event-id") or
+                                             request.args.get("since"))
+
+    signal = change_signal()
+    broadcaster = backend.broadcaster
+    await send({"type": "http.response.start", "status": 200, "headers": [
+        (b"content-type", b"text/event-stream; charset=utf-8"),
+        (b"cache-control", b"no-cache"),
+        (b"x-accel-buffering", b"no"),
+        *cors_headers(request),
+    ]})
+
+    disconnected = asyncio.Event()
+
+    async def watch_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        disconnected.set()
+
+    watcher = asyncio.ensure_future(watch_disconnect())
+    try:
+        if version is None or version > broadcaster.version:
+            version, message = backend.stream_snapshot_event()
+            await send({"type": "http.response.body", "body": message.encode(), "more_body": True})
+        while not disconnected.is_set():
+            # Take the event before checking, so a publish in between still wakes us
+            changed = signal.event
+            latest, messages = broadcaster.messages_after(version)
+            if messages is None:
+                version, chunk = backend.stream_snapshot_event()
+            elif messages:
+                version, chunk = latest, "".join(messages)
+            else:
+                wake = asyncio.ensure_future(changed.wait())
+                gone = asyncio.ensure_future(disconnected.wait())
+                done, pending = await asyncio.wait({wake, gone}, timeout=STREAM_KEEPALIVE_SECONDS,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in pending:
+                    task.cancel()
+                if done:
+                    continue
+                # Comment line keeps proxies from closing an idle connection
+                chunk = ": keepalive\n\n"
+            await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+    except OSError:
+        pass   # client went away mid-write
+    finally:
+        watcher.cancel()
+
+
+# -------------------------------
+# Fallback to the Flask app
+# -------------------------------
+
+def wsgi_environ(scope, body):
+    """Build a WSGI environ for a request the Flask app handles."""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": unquote(scope["path"]),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": io.StringIO(),
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        key = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if key in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[key] = value
+        else:
+            key = f"HTTP_{key}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def call_flask(scope, body):
+    """Run the Flask app for one request; returns (status, headers, body)."""
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"] = int(status.split(" ", 1)[0])
+        started["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+
+    result = backend.app.wsgi_app(wsgi_environ(scope, body), start_response)
+    try:
+        payload = b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return started["status"], started["headers"], payload
+
+
+async def forward_to_flask(scope, body, send):
+    loop = asyncio.get_running_loop()
+    status, headers, payload = await loop.run_in_executor(None, call_flask, scope, body)
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": payload})
+
+
+# -------------------------------
+# ASGI entry point
+# -------------------------------
+
+POST_ROUTES = {
+    "/updateLotCount": backend.apply_lot_delta,
+    "/setLotOccupancy": backend.apply_lot_occupancy,
+    "/batchUpdate": backend.apply_batch_request,
+}
+
+
+def route_label(method, path):
+    """Same route labels Flask reports (its URL rule)."""
+    return "/getLotCount/<lot>" if path.startswith("/getLotCount/") else path
+
+
+def timed_send(send, route, method):
+    """Wrap `send` to record the request in /metrics when the response starts."""
+    started = time.perf_counter()
+
+    async def wrapped(message):
+        if message["type"] == "http.response.start":
+            backend.record_request(route, method, message["status"], time.perf_counter() - started)
+        await send(message)
+    return wrapped
+
+
+async def read_body(receive):
+    """Read the request body; None if it is larger than MAX_BODY_BYTES."""
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return b"".join(chunks)
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            return None
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                change_signal()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    path, method = scope["path"], scope["method"]
+    native = ((method == "POST" and path in POST_ROUTES) or
+              (method == "GET" and (path == "/streamLotCount" or path == "/getLotCount" or
+                                    path.startswith("/getLotCount/"))))
+
+    if not native:
+        body = b"" if method == "GET" else await read_body(receive)
+        if body is None:
+            return await send_json(send, Request(scope, b""), {"error": "Request body too large"}, 413)
+        return await forward_to_flask(scope, body, send)
+
+    # Check the key (and the device's rate limit) before reading the body
+    request = Request(scope, b"")
+    send = timed_send(send, route_label(method, path), method)
+    status, error_msg, retry_after = authorize(request)
+    if status != 200:
+        headers = [(b"retry-after", str(retry_after).encode())] if retry_after else []
+        payload = backend.app.json.dumps({"error": error_msg}, separators=(",", ":")).encode() + b"\n"
+        return await send_response(send, request, status, payload, [*JSON_HEADERS, *headers])
+    if method == "POST":
+        request.body = await read_body(receive)
+        if request.body is None:
+            return await send_json(send, request, {"error": "Request body too large"}, 413)
+        await post_update(POST_ROUTES[path], request, send)
+    elif path == "/streamLotCount":
+        await stream_lot_count(request, receive, send)
+    elif path == "/getLotCount":
+        await get_lot_count(request, send)
+    else:
+        await get_single_lot_count(request, send, unquote(path[len("/getLotCount/"):]))
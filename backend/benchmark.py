@@ -0,0 +1,335 @@
+# Load test / benchmark harness for the parking backend
+# Penn State Abington - CMPSC 462 Final Project
+#
+# Starts the backend in a scratch directory (its own data files and shared
+# memory names, so it never touches real data), then simulates rush hour:
+# N sensor devices posting /updateLotCount or /setLotOccupancy and M clients
+# polling /getLotCount. Results are printed as JSON: throughput plus
+# p50/p95/p99 latency per endpoint.
+#
+# Load is open-loop: each device has a seeded schedule of Poisson arrivals
+# and latency is measured from the scheduled send time, so a slow server
+# shows up as latency instead of as a quietly lower request rate.
+#
+#   python benchmark.py --devices 50 --pollers 20 --duration 30 --server gunicorn
+#   python benchmark.py --output after.json --baseline before.json   # exit 1 on regression
+
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+API_KEY = os.getenv('API_KEY', '123')
+
+
+# -------------------------------
+# Server under test
+# -------------------------------
+
+def server_command(server, port, workers):
+    if server == "flask":
+        return [sys.executable, os.path.join(BACKEND_DIR, "app.py")]
+    gunicorn = [sys.executable, "-m", "gunicorn", "-c", os.path.join(BACKEND_DIR, "gunicorn.conf.py"),
+                "--bind", f"127.0.0.1:{port}", "--workers", str(workers)]
+    if server == "gunicorn":
+        return gunicorn + ["app:app"]
+    if server == "asgi":
+        return gunicorn + ["--worker-class", "uvicorn_worker.UvicornWorker", "asgi:app"]
+    raise ValueError(f"Unknown server: {server}")
+
+
+def start_server(args, workdir):
+    """Start the backend with scratch data files; returns the Popen handle."""
+    env = dict(os.environ)
+    env.update({
+        "API_KEY": API_KEY,
+        "PORT": str(args.port),
+        "DEBUG": "false",
+        "PYTHONPATH": BACKEND_DIR,
+        "LOT_REGISTRY_FILE": os.path.join(BACKEND_DIR, "lots.json"),
+        "SHARED_STATE_FILE": os.path.join(workdir, "lots.bin"),
+        "DEDUP_FILE": os.path.join(workdir, "dedup.bin"),
+        "METRICS_DIR": os.path.join(workdir, "metrics"),
+        "STORAGE_BACKEND": args.storage,
+    })
+    log = open(os.path.join(workdir, "server.log"), "w")
+    return subprocess.Popen(server_command(args.server, args.port, args.workers),
+                            cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_until_ready(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/getLotCount", headers={"X-API-Key": API_KEY})
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server did not answer on port {port} within {timeout}s")
+
+
+def get_lots(port):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    conn.request("GET", "/getLotCount", headers={"X-API-Key": API_KEY})
+    return [lot["lot"] for lot in json.loads(conn.getresponse().read())]
+
+
+# -------------------------------
+# Simulated clients
+# -------------------------------
+
+class Recorder:
+    """Collects (endpoint, latency, status) samples from every client thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+        self.statuses = {}
+
+    def add(self, endpoint, latency, status):
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append(latency)
+            key = f"{endpoint} {status}"
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+            if status not in (200, 304):
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+
+class Client:
+    """Keep-alive HTTP connection that reconnects after errors."""
+
+    def __init__(self, port):
+        self.port = port
+        self.conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        headers = {"X-API-Key": API_KEY, **(headers or {})}
+        if body is not None:
+            body = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                response.read()
+                return response.status, response.getheader("ETag")
+            except (OSError, http.client.HTTPException):
+                self.conn.close()
+                self.conn = None
+        return 599, None
+
+
+def run_open_loop(rate, rng, stop_at, send):
+    """Call send(scheduled_time) at Poisson arrivals of `rate` per second until stop_at."""
+    next_at = time.monotonic() + rng.expovariate(rate)
+    while next_at < stop_at:
+        delay = next_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        send(next_at)
+        next_at += rng.expovariate(rate)
+
+
+def device(index, phase, args, lots, recorder, stop_at):
+    rng = random.Random(args.seed * 1000003 + index)
+    client = Client(args.port)
+    lot = lots[index % len(lots)]
+    camera = rng.random() < args.camera_fraction
+    seq = 0
+
+    def send(scheduled):
+        nonlocal seq
+        seq += 1
+        if camera:
+            endpoint = "/setLotOccupancy"
+            body = {"lot": lot, "occupied_count": rng.randint(0, 150)}
+        else:
+            endpoint = "/updateLotCount"
+            # Rush hour: most cars are arriving
+            body = {"lot": lot, "delta": -1 if rng.random() < args.enter_fraction else 1}
+        # Each phase is a fresh device, so its seq numbers aren't dropped as retries
+        body.update({"device_id": f"bench-{phase}-{index}", "seq": seq})
+        status, _ = client.request("POST", endpoint, body)
+        recorder.add(endpoint, time.monotonic() - scheduled, status)
+
+    run_open_loop(args.device_rate, rng, stop_at, send)
+
+
+def poller(index, args, recorder, stop_at):
+    rng = random.Random(args.seed * 1000003 + 500000 + index)
+    client = Client(args.port)
+    etag = None
+
+    def send(scheduled):
+        nonlocal etag
+        headers = {"If-None-Match": etag} if etag and args.etag else None
+        status, new_etag = client.request("GET", "/getLotCount", headers=headers)
+        etag = new_etag or etag
+        recorder.add("/getLotCount", time.monotonic() - scheduled, status)
+
+    run_open_loop(args.poll_rate, rng, stop_at, send)
+
+
+# -------------------------------
+# Report
+# -------------------------------
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(recorder, elapsed):
+    report = {}
+    everything = []
+    for endpoint, latencies in sorted(recorder.samples.items()):
+        latencies.sort()
+        everything.extend(latencies)
+        report[endpoint] = endpoint_stats(latencies, recorder.errors.get(endpoint, 0), elapsed)
+    everything.sort()
+    report["total"] = endpoint_stats(everything, sum(recorder.errors.values()), elapsed)
+    return report
+
+
+def endpoint_stats(latencies, errors, elapsed):
+    ms = lambda seconds: None if seconds is None else round(seconds * 1000, 3)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(latencies[-1] if latencies else None),
+            "mean": ms(sum(latencies) / len(latencies) if latencies else None),
+        },
+    }
+
+
+def compare(report, baseline, max_regression):
+    """List p99 latencies / error counts that got worse than the baseline allows."""
+    problems = []
+    for endpoint, stats in report["results"].items():
+        old = baseline.get("results", {}).get(endpoint)
+        if not old:
+            continue
+        new_p99, old_p99 = stats["latency_ms"]["p99"], old["latency_ms"]["p99"]
+        if new_p99 and old_p99 and new_p99 > old_p99 * (1 + max_regression):
+            problems.append(f"{endpoint}: p99 {old_p99} ms -> {new_p99} ms")
+        if stats["errors"] > old["errors"]:
+            problems.append(f"{endpoint}: errors {old['errors']} -> {stats['errors']}")
+    return problems
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rush-hour load test for the parking backend")
+    parser.add_argument("--server", choices=["flask", "gunicorn", "asgi"], default="gunicorn")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--port", type=int, default=5090)
+    parser.add_argument("--devices", type=int, default=50, help="simulated sensor devices")
+    parser.add_argument("--device-rate", type=float, default=2.0, help="events per second per device")
+    parser.add_argument("--camera-fraction", type=float, default=0.1,
+                        help="share of devices that post /setLotOccupancy")
+    parser.add_argument("--enter-fraction", type=float, default=0.8, help="share of events that are arrivals")
+    parser.add_argument("--pollers", type=int, default=20, help="simulated app clients")
+    parser.add_argument("--poll-rate", type=float, default=1.0, help="polls per second per client")
+    parser.add_argument("--no-etag", dest="etag", action="store_false",
+                        help="poll without If-None-Match")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of unmeasured load first")
+    parser.add_argument("--seed", type=int, default=462)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="allowed p99 increase over the baseline (0.2 = 20%%)")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory")
+    args = parser.parse_args()
+    if args.duration <= 0:
+        parser.error("--duration must be positive")
+
+    workdir = tempfile.mkdtemp(prefix="psupark-bench-")
+    server = start_server(args, workdir)
+    try:
+        wait_until_ready(args.port)
+        lots = get_lots(args.port)
+
+        phases = [("warmup", args.warmup), ("measured", args.duration)]
+        for phase, duration in phases:
+            if duration <= 0:
+                continue
+            recorder = Recorder()
+            stop_at = time.monotonic() + duration
+            threads = [threading.Thread(target=device, args=(i, phase, args, lots, recorder, stop_at))
+                       for i in range(args.devices)]
+            threads += [threading.Thread(target=poller, args=(i, args, recorder, stop_at))
+                        for i in range(args.pollers)]
+            started = time.monotonic()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.monotonic() - started
+
+        report = {
+            "config": {key: value for key, value in vars(args).items()
+                       if key not in ("output", "baseline", "keep")},
+            "git_revision": git_revision(),
+            "python": sys.version.split()[0],
+            "elapsed_seconds": round(elapsed, 2),
+            "results": summarize(recorder, elapsed),
+            "statuses": dict(sorted(recorder.statuses.items())),
+        }
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        if args.keep:
+            print(f"Scratch directory kept at {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(report, json.load(f), args.max_regression)
+        for problem in problems:
+            print(f"REGRESSION {problem}", file=sys.stderr)
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@
 
 import os
 import secrets
+import tempfile
 
 # Generate a secure API key if one doesn't exist
 def get_or_create_api_key():
@@ -35,3 +36,111 @@ HOST = os.getenv('HOST', '0.0.0.0')
 PORT = int(os.getenv('PORT', 5002))
 DEBUG = os.getenv('DEBUG', 'True').lower() == 'true'
 
+
+# Persistence Configuration
+# Lot changes are appended to the journal and group-committed every
+# JOURNAL_COMMIT_INTERVAL seconds; the snapshot file is rewritten every
+# SNAPSHOT_INTERVAL seconds or after SNAPSHOT_MAX_EVENTS journal entries.
+PARKING_DATA_FILE = os.getenv('PARKING_DATA_FILE', 'parking_data.json')
+JOURNAL_FILE = os.getenv('JOURNAL_FILE', 'parking_journal.log')
+JOURNAL_COMMIT_INTERVAL = float(os.getenv('JOURNAL_COMMIT_INTERVAL', 0.05))
+SNAPSHOT_INTERVAL = float(os.getenv('SNAPSHOT_INTERVAL', 300))
+SNAPSHOT_MAX_EVENTS = int(os.getenv('SNAPSHOT_MAX_EVENTS', 10000))
+
+# Maximum number of updates accepted by POST /batchUpdate
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 1000))
+
+# Server-Sent Events stream (/streamLotCount)
+# Keep-alive comment interval and how many past changes a reconnecting client can catch up on
+STREAM_KEEPALIVE_SECONDS = float(os.getenv('STREAM_KEEPALIVE_SECONDS', 15))
+STREAM_BACKLOG = int(os.getenv('STREAM_BACKLOG', 1024))
+# Under the threaded Flask app each stream holds a worker thread, so only this many
+# per worker are allowed (keep it well below GUNICORN_THREADS); asgi.py has no cap
+STREAM_MAX_THREADED_CLIENTS = int(os.getenv('STREAM_MAX_THREADED_CLIENTS', 4))
+
+# Shared lot state (memory-mapped so every gunicorn worker sees the same counts)
+# Updates lock one of LOCK_STRIPES stripes; each worker checks for changes from
+# other workers every STATE_POLL_INTERVAL seconds to feed its stream clients.
+_SHM_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+SHARED_STATE_FILE = os.getenv('SHARED_STATE_FILE', os.path.join(_SHM_DIR, f'psupark_lots_{PORT}.bin'))
+LOCK_STRIPES = int(os.getenv('LOCK_STRIPES', 16))
+STATE_POLL_INTERVAL = float(os.getenv('STATE_POLL_INTERVAL', 0.05))
+
+# Lot registry: lots, capacities, campus and zone metadata
+LOT_REGISTRY_FILE = os.getenv('LOT_REGISTRY_FILE', 'lots.json')
+
+# Storage backend: 'json' (journal + snapshot files above) or 'sqlite'
+# (WAL-mode database with a hot lot_state table and a lot_events history table;
+# the commit and snapshot intervals above also apply to it)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'json').lower()
+SQLITE_DB_FILE = os.getenv('SQLITE_DB_FILE', 'parking.db')
+SQLITE_HISTORY_DAYS = int(os.getenv('SQLITE_HISTORY_DAYS', 90))
+
+# Occupancy history kept in memory for /history (fixed-size rings per lot)
+# Raw samples, then minute / hour / day buckets (1 day, 5 weeks, ~13 months by default).
+# Every lot is also sampled every HISTORY_SAMPLE_INTERVAL seconds.
+HISTORY_RAW_SIZE = int(os.getenv('HISTORY_RAW_SIZE', 1024))
+HISTORY_MINUTES = int(os.getenv('HISTORY_MINUTES', 1440))
+HISTORY_HOURS = int(os.getenv('HISTORY_HOURS', 24 * 35))
+HISTORY_DAYS = int(os.getenv('HISTORY_DAYS', 400))
+HISTORY_SAMPLE_INTERVAL = float(os.getenv('HISTORY_SAMPLE_INTERVAL', 60))
+# Max events per lot read back from SQLite on startup to rebuild the history
+HISTORY_BACKFILL_LIMIT = int(os.getenv('HISTORY_BACKFILL_LIMIT', 200000))
+
+# Occupancy forecasting (/forecast)
+# Profiles have one cell per FORECAST_SLOT_MINUTES per weekday and average roughly
+# the last FORECAST_MEMORY_SAMPLES samples of each cell. Times are campus-local.
+try:
+    from zoneinfo import ZoneInfo
+    TIMEZONE = ZoneInfo(os.getenv('TIMEZONE', 'America/New_York'))
+except Exception:  # no tz database available: fall back to server local time
+    TIMEZONE = None
+FORECAST_FILE = os.getenv('FORECAST_FILE', 'forecast_profiles.npz')
+FORECAST_SLOT_MINUTES = int(os.getenv('FORECAST_SLOT_MINUTES', 15))
+FORECAST_MEMORY_SAMPLES = int(os.getenv('FORECAST_MEMORY_SAMPLES', 60))
+FORECAST_SAVE_INTERVAL = float(os.getenv('FORECAST_SAVE_INTERVAL', 600))
+FORECAST_MAX_MINUTES = int(os.getenv('FORECAST_MAX_MINUTES', 7 * 24 * 60))
+
+# Scheduler: default daily reset time (campus-local 'HH:MM'; lots can override it
+# with "reset_time" in the registry) and the lock file that elects one worker
+# to run the reset, snapshot and other single-owner jobs
+DAILY_RESET_TIME = os.getenv('DAILY_RESET_TIME', '06:00')
+SCHEDULER_LOCK_FILE = os.getenv('SCHEDULER_LOCK_FILE', 'scheduler.lock')
+
+# Duplicate detection for retried sensor events (shared by every worker)
+# Per-device sequence windows for up to DEDUP_DEVICES devices, and event ids
+# remembered for DEDUP_WINDOW_SECONDS in a table of DEDUP_EVENTS slots.
+DEDUP_FILE = os.getenv('DEDUP_FILE', os.path.join(_SHM_DIR, f'psupark_dedup_{PORT}.bin'))
+DEDUP_DEVICES = int(os.getenv('DEDUP_DEVICES', 4096))
+DEDUP_EVENTS = int(os.getenv('DEDUP_EVENTS', 65536))
+DEDUP_WINDOW_SECONDS = int(os.getenv('DEDUP_WINDOW_SECONDS', 600))
+
+# Compact sensor ingest (see ingest_gateway.py), disabled unless a port or broker is set
+# Signed datagrams on INGEST_UDP_PORT and/or MQTT publishes on INGEST_MQTT_TOPIC;
+# updates are coalesced per lot and applied every INGEST_FLUSH_INTERVAL seconds.
+# Devices sign with their key from DEVICE_KEYS_FILE; without that file every
+# device signs with API_KEY.
+INGEST_HOST = os.getenv('INGEST_HOST', '0.0.0.0')
+INGEST_UDP_PORT = int(os.getenv('INGEST_UDP_PORT', 0))
+INGEST_MQTT_HOST = os.getenv('INGEST_MQTT_HOST', '')
+INGEST_MQTT_PORT = int(os.getenv('INGEST_MQTT_PORT', 1883))
+INGEST_MQTT_TOPIC = os.getenv('INGEST_MQTT_TOPIC', 'psupark/ingest/#')
+INGEST_FLUSH_INTERVAL = float(os.getenv('INGEST_FLUSH_INTERVAL', 0.05))
+
+# Per-device API keys (see device_auth.py) and their rate limit
+# Each device key may make DEVICE_RATE_LIMIT requests per second with bursts of
+# up to DEVICE_RATE_BURST (per worker; entries in the key file can override
+# both). The shared API_KEY keeps working and is not rate limited.
+DEVICE_KEYS_FILE = os.getenv('DEVICE_KEYS_FILE', os.getenv('INGEST_DEVICE_KEYS_FILE', 'device_keys.json'))
+DEVICE_RATE_LIMIT = float(os.getenv('DEVICE_RATE_LIMIT', 5))
+DEVICE_RATE_BURST = float(os.getenv('DEVICE_RATE_BURST', 20))
+
+# Metrics (/metrics, Prometheus text format)
+# Each worker publishes its totals to METRICS_DIR every METRICS_PUBLISH_INTERVAL
+# seconds so any worker can report for the whole server.
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(_SHM_DIR, f'psupark_metrics_{PORT}'))
+METRICS_PUBLISH_INTERVAL = float(os.getenv('METRICS_PUBLISH_INTERVAL', 5))
+
+# Per-stall occupancy from lot cameras (see stall_board.py), shared by every worker
+STALLS_DIR = os.getenv('STALLS_DIR', os.path.join(_SHM_DIR, f'psupark_stalls_{PORT}'))
+MAX_STALLS_PER_LOT = int(os.getenv('MAX_STALLS_PER_LOT', 5000))
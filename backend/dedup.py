@@ -0,0 +1,182 @@
+# Duplicate detection for retried sensor events
+# Penn State Abington - CMPSC 462 Final Project
+#
+# Sensors retry a POST when the response is lost, so the same event can
+# arrive twice (possibly at two different workers). Two bounded tables in a
+# memory-mapped file, shared by every worker, catch the repeats:
+#
+#   devices: per device_id (and boot_id), the highest sequence number seen
+#            plus a 64-bit bitmap of the sequence numbers just below it (so
+#            events that arrive slightly out of order are still accepted
+#            once). Anything older than that window is a duplicate: a device
+#            whose counter restarts must send a new boot_id, which starts a
+#            new sequence space.
+#   events:  recently seen event ids (or device timestamps), each remembered
+#            for `window` seconds
+#
+# Both tables are set-associative: a key hashes to one small bucket of
+# slots, the bucket is scanned in full and, when it is full, its least
+# recently used slot is overwritten. Every check is O(1) and memory is fixed.
+#
+# File layout (little-endian uint64 words):
+#   [magic][device buckets][event buckets][window]
+#   device slots: [key hash][high-water seq][seen bitmap][last seen]
+#   event slots:  [key hash][last seen]
+
+import hashlib
+import mmap
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: single process only, thread locks are enough
+    fcntl = None
+
+MAGIC = int.from_bytes(b"PSUDEDU1", "little")
+HEADER_WORDS = 4
+DEVICE_WAYS = 4
+DEVICE_SLOT_WORDS = 4
+EVENT_WAYS = 8
+EVENT_SLOT_WORDS = 2
+SEQ_WINDOW = 64
+BITMAP_MASK = (1 << SEQ_WINDOW) - 1
+
+
+def _key_hash(*parts):
+    """Stable non-zero 64-bit hash (Python's hash() differs between workers)."""
+    digest = hashlib.blake2b("\0".join(parts).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class DedupIndex:
+    """Shared, fixed-size index of recently seen device sequence numbers and event ids."""
+
+    def __init__(self, path, devices=4096, events=65536, window=600, stripes=16):
+        self.path = path
+        self.window = int(window)
+        self.stripes = stripes
+        self.device_buckets = max(1, devices // DEVICE_WAYS)
+        self.event_buckets = max(1, events // EVENT_WAYS)
+
+        self._events_base = HEADER_WORDS + self.device_buckets * DEVICE_WAYS * DEVICE_SLOT_WORDS
+        self._size = (self._events_base + self.event_buckets * EVENT_WAYS * EVENT_SLOT_WORDS) * 8
+        # Lock bytes: one stripe range per table plus one for initialization
+        self._init_lock_byte = 2 * stripes
+        self._thread_locks = [threading.Lock() for _ in range(2 * stripes + 1)]
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._lock(self._init_lock_byte)
+        try:
+            if os.fstat(self._fd).st_size != self._size:
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, self._size)
+            self._mm = mmap.mmap(self._fd, self._size)
+            self._words = memoryview(self._mm).cast('Q')
+            # Entries from an earlier run stay valid (retries can span a restart)
+            # as long as the table geometry is unchanged
+            header = (MAGIC, self.device_buckets, self.event_buckets, self.window)
+            if tuple(self._words[:HEADER_WORDS]) != header:
+                self._mm[:] = bytes(self._size)
+                for i, value in enumerate(header):
+                    self._words[i] = value
+        finally:
+            self._unlock(self._init_lock_byte)
+
+    # -------------------------------
+    # Locking
+    # -------------------------------
+
+    def _lock(self, n):
+        self._thread_locks[n].acquire()
+        if fcntl is not None:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, n)
+
+    def _unlock(self, n):
+        if fcntl is not None:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, n)
+        self._thread_locks[n].release()
+
+    # -------------------------------
+    # Checks
+    # -------------------------------
+
+    def accept(self, device_id=None, seq=None, event_id=None, now=None, boot_id=None):
+        """Record an event and return True if it is new, False if it was seen before.
+
+        With a device_id and seq the per-device (and per-boot_id) sequence
+        window decides; otherwise an event_id (scoped to the device) is looked
+        up in the time-windowed table. Events with neither are always accepted.
+        """
+        now = int(time.time() if now is None else now)
+        if device_id is not None and seq is not None:
+            return self._accept_seq(str(device_id), str(boot_id or ""), seq, now)
+        if event_id is not None:
+            return self._accept_event(str(device_id or ""), str(event_id), now)
+        return True
+
+    def _accept_seq(self, device_id, boot_id, seq, now):
+        key = _key_hash("device", device_id, boot_id)
+        bucket = key % self.device_buckets
+        stripe = bucket % self.stripes
+        w = self._words
+        base = HEADER_WORDS + bucket * DEVICE_WAYS * DEVICE_SLOT_WORDS
+        self._lock(stripe)
+        try:
+            slot = victim = None
+            for way in range(DEVICE_WAYS):
+                s = base + way * DEVICE_SLOT_WORDS
+                if w[s] == key:
+                    slot = s
+                    break
+                if victim is None or w[s + 3] < w[victim + 3]:
+                    victim = s   # empty slots have last_seen 0, so they go first
+            if slot is None:
+                w[victim], w[victim + 1], w[victim + 2], w[victim + 3] = key, seq, 1, now
+                return True
+
+            high, seen = w[slot + 1], w[slot + 2]
+            w[slot + 3] = now
+            if seq > high:
+                shift = seq - high
+                w[slot + 1] = seq
+                w[slot + 2] = ((seen << shift) | 1) & BITMAP_MASK if shift < SEQ_WINDOW else 1
+                return True
+            if high - seq >= SEQ_WINDOW:
+                # Below the window: too old to tell apart, so never apply it again
+                return False
+            bit = 1 << (high - seq)
+            if seen & bit:
+                return False
+            w[slot + 2] = seen | bit
+            return True
+        finally:
+            self._unlock(stripe)
+
+    def _accept_event(self, device_id, event_id, now):
+        key = _key_hash("event", device_id, event_id)
+        bucket = key % self.event_buckets
+        stripe = self.stripes + bucket % self.stripes
+        w = self._words
+        base = self._events_base + bucket * EVENT_WAYS * EVENT_SLOT_WORDS
+        expired_before = now - self.window
+        self._lock(stripe)
+        try:
+            victim = None
+            for way in range(EVENT_WAYS):
+                s = base + way * EVENT_SLOT_WORDS
+                if w[s] == key and w[s + 1] > expired_before:
+                    w[s + 1] = now
+                    return False
+                if victim is None or w[s + 1] < w[victim + 1]:
+                    victim = s
+            w[victim], w[victim + 1] = key, now
+            return True
+        finally:
+            self._unlock(stripe)
+
+    def close(self):
+        self._words.release()
+        self._mm.close()
+        os.close(self._fd)
@@ -0,0 +1,112 @@
+# Per-device API keys and request rate limiting
+# Penn State Abington - CMPSC 462 Final Project
+#
+# Every sensor can have its own key (device_keys.json), so a leaked or
+# misbehaving device can be revoked or throttled on its own. Keys are
+# indexed by their SHA-256 digest: a request's key is hashed once and looked
+# up in a dict, so the lookup is O(1). The dict compares digests, not keys,
+# so how long a lookup takes says nothing useful about the key itself.
+#
+# Each device also gets a token bucket (`rate` requests per second, bursts
+# of up to `burst`). It is checked before the request body is even parsed,
+# so a looping sensor is turned away for the cost of one hash and a few
+# float operations. Buckets live in each worker process; with several
+# gunicorn workers a device can get up to workers x rate through.
+#
+# device_keys.json maps device ids to a key, or to an object:
+#   {"gate-g1": "plain-secret",
+#    "cam-h2": {"key": "secret", "rate": 1, "burst": 5},
+#    "cam-j1": {"key_sha256": "<hex digest>"}}
+# Entries with only "key_sha256" can call the HTTP API but cannot sign
+# ingest-gateway messages, which need the key itself.
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+def key_digest(key):
+    return hashlib.sha256(key.encode()).digest()
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated", "_lock")
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, now=None):
+        """Spend one token. Returns 0 if allowed, else seconds until one is available."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if tokens >= 1.0:
+                self.tokens = tokens - 1.0
+                return 0.0
+            self.tokens = tokens
+            return (1.0 - tokens) / self.rate if self.rate > 0 else 60.0
+
+
+class Device:
+    __slots__ = ("device_id", "key", "bucket")
+
+    def __init__(self, device_id, key=None, bucket=None):
+        self.device_id = device_id
+        self.key = key
+        self.bucket = bucket
+
+
+class DeviceCredentials:
+    """Hashed index of device keys plus each device's rate limiter."""
+
+    def __init__(self, devices, shared_key=None, rate=5.0, burst=20):
+        self._index = {}        # sha256(key) -> Device
+        self._by_id = {}
+        for device_id, entry in devices.items():
+            if isinstance(entry, str):
+                entry = {"key": entry}
+            key = entry.get("key")
+            if key:
+                digest = key_digest(key)
+            elif entry.get("key_sha256"):
+                digest = bytes.fromhex(entry["key_sha256"])
+            else:
+                raise ValueError(f"Device {device_id} needs a key or key_sha256")
+            bucket = TokenBucket(entry.get("rate", rate), entry.get("burst", burst))
+            device = Device(device_id, key, bucket)
+            self._index[digest] = device
+            self._by_id[device_id] = device
+        if shared_key:
+            # The original shared key (web and mobile apps) is not rate limited
+            self._index.setdefault(key_digest(shared_key), Device(None, shared_key))
+
+    @classmethod
+    def from_file(cls, path, shared_key=None, rate=5.0, burst=20):
+        """Load device keys from a JSON file; just the shared key if there is none."""
+        devices = {}
+        if path and os.path.exists(path):
+            with open(path, 'r') as f:
+                devices = json.load(f)
+            print(f"Loaded {len(devices)} device key(s) from {path}")
+        return cls(devices, shared_key, rate, burst)
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def authenticate(self, provided_key):
+        """Return the Device for a key (device_id None for the shared key), or None."""
+        return self._index.get(key_digest(provided_key))
+
+    def signing_key(self, device_id):
+        """Plain key a device signs ingest-gateway messages with, if known."""
+        device = self._by_id.get(device_id)
+        return device.key if device else None
@@ -0,0 +1,119 @@
+# Per-lot occupancy forecasting
+# Penn State Abington - CMPSC 462 Final Project
+#
+# Every lot gets a day-of-week x time-of-day occupancy profile, stored for
+# all lots at once in (lots, 7, slots_per_day) NumPy arrays. Each sample of
+# every lot's occupancy updates the current cell in one vectorized step: a
+# running mean for the first `memory_samples` samples, then an exponentially
+# weighted average, so the model keeps learning without ever being retrained.
+# A forecast reads two profile cells and blends the lot's current deviation
+# from its usual level into the target cell, fading out as the horizon grows.
+
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+
+class OccupancyForecaster:
+    """Vectorized time-of-day / day-of-week occupancy profiles for every lot."""
+
+    def __init__(self, lots, capacities, slot_minutes=15, memory_samples=60,
+                 deviation_minutes=60.0, tz=None):
+        self.lots = list(lots)
+        self.index = {lot: i for i, lot in enumerate(self.lots)}
+        self.capacities = np.asarray(capacities, dtype=np.float64)
+        self.slot_minutes = slot_minutes
+        self.slots_per_day = 24 * 60 // slot_minutes
+        self.min_alpha = 1.0 / memory_samples
+        self.deviation_minutes = deviation_minutes
+        self.tz = tz
+
+        shape = (len(self.lots), 7, self.slots_per_day)
+        self.profile = np.zeros(shape)              # occupied fraction per cell
+        self.samples = np.zeros(shape, dtype=np.int32)
+
+    # -------------------------------
+    # Learning
+    # -------------------------------
+
+    def _cell(self, ts):
+        when = datetime.fromtimestamp(ts, self.tz)
+        slot = (when.hour * 60 + when.minute) // self.slot_minutes
+        return when.weekday(), slot
+
+    def observe_all(self, ts, occupied):
+        """Fold one occupancy sample for every lot (registry order) into the profiles."""
+        day, slot = self._cell(ts)
+        fractions = np.clip(np.asarray(occupied, dtype=np.float64) / self.capacities, 0.0, 1.0)
+        counts = self.samples[:, day, slot]
+        # 1/n gives a running mean (the first sample sets the cell); min_alpha caps the memory
+        alpha = np.maximum(1.0 / (counts + 1), self.min_alpha)
+        self.profile[:, day, slot] += alpha * (fractions - self.profile[:, day, slot])
+        self.samples[:, day, slot] += 1
+
+    def observe(self, ts, lot, occupied):
+        """Fold one sample for a single lot into its profile (used for history backfill)."""
+        i = self.index[lot]
+        day, slot = self._cell(ts)
+        fraction = min(max(occupied / self.capacities[i], 0.0), 1.0)
+        alpha = max(1.0 / (self.samples[i, day, slot] + 1), self.min_alpha)
+        self.profile[i, day, slot] += alpha * (fraction - self.profile[i, day, slot])
+        self.samples[i, day, slot] += 1
+
+    # -------------------------------
+    # Forecasting
+    # -------------------------------
+
+    def forecast(self, lot, occupied_now, minutes, now_ts):
+        """Predict (occupied spaces, samples behind the estimate) `minutes` from now."""
+        i = self.index[lot]
+        capacity = self.capacities[i]
+        current = occupied_now / capacity
+
+        day_now, slot_now = self._cell(now_ts)
+        target_ts = (datetime.fromtimestamp(now_ts, self.tz) + timedelta(minutes=minutes)).timestamp()
+        day_t, slot_t = self._cell(target_ts)
+
+        samples = int(self.samples[i, day_t, slot_t])
+        if samples == 0:
+            # Nothing learned for that time yet: best guess is "like now"
+            return occupied_now, 0
+
+        target = self.profile[i, day_t, slot_t]
+        if self.samples[i, day_now, slot_now]:
+            # Carry today's deviation from the usual level forward, fading with the horizon
+            weight = np.exp(-minutes / self.deviation_minutes)
+            target += weight * (current - self.profile[i, day_now, slot_now])
+
+        predicted = int(round(min(max(target, 0.0), 1.0) * capacity))
+        return predicted, samples
+
+    # -------------------------------
+    # Persistence
+    # -------------------------------
+
+    def save(self, path):
+        """Write the profile tables atomically to an .npz file."""
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, lots=np.array(self.lots), profile=self.profile, samples=self.samples,
+                 slot_minutes=self.slot_minutes)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        """Restore profiles saved by save(); lots are matched by name. Returns True on success."""
+        if not os.path.exists(path):
+            return False
+        try:
+            with np.load(path) as data:
+                if int(data["slot_minutes"]) != self.slot_minutes:
+                    return False
+                saved = {str(lot): i for i, lot in enumerate(data["lots"])}
+                mine = [i for i, lot in enumerate(self.lots) if lot in saved]
+                theirs = [saved[self.lots[i]] for i in mine]
+                self.profile[mine] = data["profile"][theirs]
+                self.samples[mine] = data["samples"][theirs]
+            return True
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Could not load forecast profiles: {e}")
+            return False
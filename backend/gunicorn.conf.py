@@ -0,0 +1,20 @@
+# Gunicorn settings for the parking backend
+# Penn State Abington - CMPSC 462 Final Project
+#
+# Gunicorn reads this file automatically when started from backend/.
+# Lot counts live in shared memory (see shared_state.py), so adding workers
+# adds throughput without the workers' counts drifting apart.
+
+import os
+import uuid
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 5002)}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+# Async mode: GUNICORN_WORKER_CLASS=uvicorn_worker.UvicornWorker with asgi:app
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', "gthread")
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+
+
+def on_starting(server):
+    """Give this server run one id so workers share, rather than reload, lot state."""
+    os.environ["PARKING_RUN_ID"] = uuid.uuid4().hex
@@ -0,0 +1,285 @@
+# Compact sensor ingest over UDP (and MQTT, when paho-mqtt is installed)
+# Penn State Abington - CMPSC 462 Final Project
+#
+# Microcontrollers can report lot changes without an HTTP request per car.
+# Each message is one short signed line:
+#
+#   <device_id>|<seq>|<updates>|<sig>      e.g.  gate-g1|1842|G-1,H+2,J=40|9f86d081884c7d65
+#
+# `updates` is a comma-separated list of <lot><op><value>: "-1" / "+2" change
+# a lot's available spaces by that amount and "=40" sets its occupied count.
+# `sig` is the first 16 hex digits of HMAC-SHA256(device key, everything
+# before the last "|"). Messages are checked against the shared dedup index,
+# so a retried or replayed datagram is acknowledged but counted once. A seq
+# 64 or more behind the device's highest is always a duplicate, so devices
+# must keep `seq` across restarts.
+#
+# Accepted updates are coalesced per lot in memory and flushed to the lot
+# state in one batch every `flush_interval` seconds. UDP senders get a
+# one-line reply: "ok <seq>", "dup <seq>" or "err <reason>".
+
+import hashlib
+import hmac
+import socket
+import threading
+
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:  # MQTT ingest is optional; UDP works without it
+    mqtt = None
+
+MAX_DATAGRAM = 1400
+SIG_HEX_DIGITS = 16
+MAX_SEQ = 2 ** 63                   # seqs are stored as uint64 in the dedup index
+
+
+def sign_message(key, body):
+    """Signature for a message body ("device|seq|updates"), as sensors compute it."""
+    return hmac.new(key.encode(), body.encode(), hashlib.sha256).hexdigest()[:SIG_HEX_DIGITS]
+
+
+class IngestError(ValueError):
+    """A message that cannot be accepted; the text is sent back to UDP senders."""
+
+
+def parse_updates(text):
+    """Parse "G-1,H+2,J=40" into [(lot, op, value)] with op "delta" or "set"."""
+    updates = []
+    for part in text.split(","):
+        for i, ch in enumerate(part):
+            if ch in "+-=":
+                break
+        else:
+            raise IngestError(f"bad update {part!r}")
+        lot, number = part[:i], part[i + 1:] if ch == "=" else part[i:]
+        try:
+            value = int(number)
+        except ValueError:
+            raise IngestError(f"bad update {part!r}")
+        if not lot:
+            raise IngestError(f"bad update {part!r}")
+        if ch == "=":
+            if value < 0:
+                raise IngestError(f"bad update {part!r}")
+            updates.append((lot, "set", value))
+        else:
+            updates.append((lot, "delta", value))
+    return updates
+
+
+class LotCoalescer:
+    """Per-lot accumulator: the last absolute count seen, plus the net delta after it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}      # lot -> [occupied_count or None, net delta]
+
+    def add(self, updates):
+        with self._lock:
+            for lot, op, value in updates:
+                entry = self._pending.setdefault(lot, [None, 0])
+                if op == "set":
+                    # An absolute count supersedes everything queued before it
+                    entry[0], entry[1] = value, 0
+                else:
+                    entry[1] += value
+
+    def drain(self):
+        """Return /batchUpdate-style items for everything queued, and clear the queue."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        items = []
+        for lot, (occupied, delta) in pending.items():
+            if occupied is not None:
+                items.append({"lot": lot, "occupied_count": occupied})
+            if delta:
+                items.append({"lot": lot, "delta": delta})
+        return items
+
+
+class IngestGateway:
+    """Authenticates compact sensor messages and applies them to the lots in batches.
+
+    `apply_batch(items)` applies /batchUpdate-style items, `device_key(device_id)`
+    returns the device's signing key (or None for unknown devices),
+    `accept_event(device_id, seq)` is the dedup check and `is_lot(lot)` validates
+    lot ids. `on_reply(result)`, if given, is called with "ok", "dup" or "err"
+    for every message.
+    """
+
+    def __init__(self, apply_batch, device_key, accept_event, is_lot, flush_interval=0.05,
+                 on_reply=None):
+        self.apply_batch = apply_batch
+        self.device_key = device_key
+        self.accept_event = accept_event
+        self.is_lot = is_lot
+        self.flush_interval = flush_interval
+        self.on_reply = on_reply
+        self.coalescer = LotCoalescer()
+
+        self._stop = threading.Event()
+        self._threads = []
+        self._sockets = []
+
+    # -------------------------------
+    # Message handling
+    # -------------------------------
+
+    def handle_message(self, payload):
+        """Check one message and queue its updates. Returns the reply line."""
+        reply = self._handle(payload)
+        if self.on_reply:
+            self.on_reply(reply.split(" ", 1)[0])
+        return reply
+
+    def _handle(self, payload):
+        try:
+            text = payload.decode("ascii").strip()
+            body, _, sig = text.rpartition("|")
+            device_id, seq, updates = body.split("|")
+            key = self.device_key(device_id)
+            if key is None or not hmac.compare_digest(sign_message(key, body), sig):
+                raise IngestError("unauthorized")
+            seq = int(seq)
+            if not 0 <= seq < MAX_SEQ:
+                raise ValueError
+            updates = parse_updates(updates)
+        except IngestError as e:
+            return f"err {e}"
+        except ValueError:   # also covers UnicodeDecodeError and a wrong field count
+            return "err malformed"
+
+        for lot, _, _ in updates:
+            if not self.is_lot(lot):
+                return f"err unknown lot {lot}"
+        if not self.accept_event(device_id, seq):
+            return f"dup {seq}"
+        self.coalescer.add(updates)
+        return f"ok {seq}"
+
+    def flush(self):
+        """Apply everything queued since the last flush. Returns the number of batch items."""
+        items = self.coalescer.drain()
+        if items:
+            self.apply_batch(items)
+        return len(items)
+
+    # -------------------------------
+    # Transports
+    # -------------------------------
+
+    def serve_udp(self, host, port):
+        """Listen for datagrams on host:port in a background thread.
+
+        SO_REUSEPORT lets every gunicorn worker bind the same port; the kernel
+        spreads datagrams across them.
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((host, port))
+        sock.settimeout(0.5)
+        self._sockets.append(sock)
+        self._start_thread(self._udp_loop, sock, name="ingest-udp")
+        return sock.getsockname()
+
+    def _udp_loop(self, sock):
+        while not self._stop.is_set():
+            try:
+                payload, addr = sock.recvfrom(MAX_DATAGRAM)
+            except socket.timeout:
+                continue
+            except OSError:
+                return   # socket closed by stop()
+            try:
+                reply = self.handle_message(payload)
+            except Exception as e:
+                # One bad message must not stop the listener
+                print(f"Error handling ingest datagram from {addr[0]}: {e}")
+                reply = "err internal"
+            try:
+                sock.sendto(reply.encode(), addr)
+            except OSError:
+                pass
+
+    def attach_mqtt(self, client, topic="psupark/ingest/#"):
+        """Consume publishes from an MQTT client (paho-mqtt or anything with the same
+        subscribe / on_message interface). Replies are not published back."""
+        def on_connect(client, userdata, flags, *args):
+            client.subscribe(topic, qos=1)
+
+        def on_message(client, userdata, message):
+            try:
+                reply = self.handle_message(message.payload)
+            except Exception as e:
+                print(f"Error handling MQTT message on {message.topic}: {e}")
+                return
+            if reply.startswith("err"):
+                print(f"Rejected MQTT message on {message.topic}: {reply[4:]}")
+
+        client.on_connect = on_connect
+        client.on_message = on_message
+
+    def connect_mqtt(self, host, port=1883, topic="psupark/ingest/#"):
+        """Connect to an MQTT broker with paho-mqtt and consume `topic`."""
+        if mqtt is None:
+            raise RuntimeError("MQTT ingest needs the paho-mqtt package")
+        if hasattr(mqtt, "CallbackAPIVersion"):   # paho-mqtt 2.x
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        else:
+            client = mqtt.Client()
+        self.attach_mqtt(client, topic)
+        client.connect_async(host, port)
+        client.loop_start()
+        return client
+
+    # -------------------------------
+    # Lifecycle
+    # -------------------------------
+
+    def start(self):
+        """Start the periodic flusher (transports are started separately)."""
+        self._start_thread(self._flush_loop, name="ingest-flush")
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error applying ingested updates: {e}")
+
+    def _start_thread(self, target, *args, name):
+        thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self):
+        """Stop listening and apply anything still queued."""
+        self._stop.set()
+        for sock in self._sockets:
+            sock.close()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self.flush()
+
+
+if __name__ == "__main__":
+    # Standalone gateway process; it shares lot state and storage with the web workers.
+    # It must join the web server's run: with a new run id, importing app would
+    # reload the lot state from disk over the live shared memory.
+    import os
+    import time
+    from config import SHARED_STATE_FILE
+    from shared_state import read_run_id
+    if "PARKING_RUN_ID" not in os.environ:
+        run_id = read_run_id(SHARED_STATE_FILE)
+        if run_id is None:
+            raise SystemExit(f"No running web server found ({SHARED_STATE_FILE}); start it first, "
+                             "or set PARKING_RUN_ID to its run id")
+        os.environ["PARKING_RUN_ID"] = run_id
+    import app
+    if not (app.INGEST_UDP_PORT or app.INGEST_MQTT_HOST):
+        raise SystemExit("Set INGEST_UDP_PORT and/or INGEST_MQTT_HOST to run the ingest gateway")
+    while True:
+        time.sleep(3600)
@@ -0,0 +1,247 @@
+# Append-only event journal for parking lot state
+# Penn State Abington - CMPSC 462 Final Project
+#
+# Every lot change is appended to a journal file instead of rewriting the
+# whole parking_data.json. A background thread group-commits the pending
+# entries every few milliseconds (one write + fsync for many events) and
+# periodically compacts everything into a snapshot, truncating the journal.
+# On startup the latest snapshot is loaded and the journal is replayed on top.
+#
+# Several gunicorn workers may share one journal. Entries carry the shared
+# state version as their seq, commits and snapshots hold an exclusive lock
+# on a sidecar lock file, and replay keeps the highest-seq value per lot, so
+# interleaved appends from different workers restore correctly.
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: single process only
+    fcntl = None
+
+
+class ParkingJournal:
+    """Group-committed event journal with periodic compacted snapshots."""
+
+    def __init__(self, snapshot_path, journal_path, commit_interval=0.05,
+                 snapshot_interval=300.0, snapshot_max_events=10000, on_write=None):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.commit_interval = commit_interval
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_max_events = snapshot_max_events
+        # on_write(kind, seconds, events) is called after each "commit" / "snapshot"
+        self.on_write = on_write
+
+        self._lock = threading.Lock()      # guards pending entries
+        self._io_lock = threading.Lock()   # serializes journal/snapshot writes in this process
+        self._pending = []                 # (seq, encoded line)
+        self._events_since_snapshot = 0
+        self._last_snapshot = time.monotonic()
+        self._journal = None
+        self._lock_file = None
+        self._read_state = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    # -------------------------------
+    # Recovery
+    # -------------------------------
+
+    def load(self, defaults, is_valid):
+        """Restore state from the latest snapshot plus a journal replay.
+
+        `defaults` maps every known lot to its fallback value and
+        `is_valid(lot, value)` rejects out-of-range entries.
+        Returns (seq, state) where seq is the newest change restored.
+        """
+        state = dict(defaults)
+        snapshot_seq = 0
+
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, 'r') as f:
+                    data = json.load(f)
+                # Older snapshots are a flat {lot: available_spaces} mapping
+                lots = data.get("lots", data) if isinstance(data, dict) else {}
+                snapshot_seq = data.get("seq", 0) if "lots" in data else 0
+                for lot, value in lots.items():
+                    if lot in state and is_valid(lot, value):
+                        state[lot] = value
+            except (json.JSONDecodeError, OSError, AttributeError):
+                print("Invalid parking data snapshot. Using default values.")
+
+        replayed = 0
+        seq = snapshot_seq
+        lot_seq = {}
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn line means a worker crashed mid-commit
+                        continue
+                    entry_seq, lot, value = entry["seq"], entry["lot"], entry["available"]
+                    # Workers append independently, so file order is not seq order
+                    if entry_seq <= snapshot_seq or entry_seq < lot_seq.get(lot, 0):
+                        continue
+                    if lot in state and is_valid(lot, value):
+                        state[lot] = value
+                        lot_seq[lot] = entry_seq
+                    seq = max(seq, entry_seq)
+                    replayed += 1
+
+        with self._lock:
+            self._events_since_snapshot = replayed
+
+        print(f"Restored parking data from snapshot (seq {snapshot_seq}) + {replayed} journal events")
+        return seq, state
+
+    # -------------------------------
+    # Recording
+    # -------------------------------
+
+    def record(self, seq, lot, available, op, value):
+        """Queue one lot change for the next group commit."""
+        self.record_many(seq, [(lot, available, op, value)])
+
+    def record_many(self, seq, changes):
+        """Queue several (lot, available, op, value) changes committed at state version `seq`."""
+        ts = round(time.time(), 3)
+        lines = [(seq, json.dumps({
+            "seq": seq,
+            "ts": ts,
+            "lot": lot,
+            "op": op,
+            "value": value,
+            "available": available,
+        }, separators=(',', ':')) + "\n") for lot, available, op, value in changes]
+        with self._lock:
+            self._pending.extend(lines)
+            self._events_since_snapshot += len(lines)
+
+    def commit(self):
+        """Write all pending entries to the journal with a single fsync."""
+        with self._io_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return 0
+            started = time.perf_counter()
+            with self._file_lock():
+                self._open_journal()
+                self._journal.write("".join(line for _, line in pending))
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+            if self.on_write:
+                self.on_write("commit", time.perf_counter() - started, len(pending))
+            return len(pending)
+
+    def snapshot(self):
+        """Compact current state into the snapshot file and truncate the journal."""
+        started = time.perf_counter()
+        with self._io_lock, self._file_lock():
+            # Other workers cannot commit while we hold the file lock, so any
+            # entry they append afterwards is newer than this snapshot
+            seq, state = self._read_state()
+            with self._lock:
+                self._pending = [entry for entry in self._pending if entry[0] > seq]
+                self._events_since_snapshot = len(self._pending)
+            self._last_snapshot = time.monotonic()
+
+            tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({
+                    "seq": seq,
+                    "saved_at": datetime.now().isoformat(),
+                    "lots": state,
+                }, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+
+            self._open_journal()
+            self._journal.truncate(0)
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+        if self.on_write:
+            self.on_write("snapshot", time.perf_counter() - started, 0)
+        print(f"Saved parking data snapshot (seq {seq}): {state}")
+
+    def _snapshot_due(self):
+        # snapshot_interval=None leaves time-based snapshots to an external scheduler
+        return (self._events_since_snapshot >= self.snapshot_max_events or
+                (self._events_since_snapshot and self.snapshot_interval is not None and
+                 time.monotonic() - self._last_snapshot >= self.snapshot_interval))
+
+    def _open_journal(self):
+        if self._journal is None:
+            self._journal = open(self.journal_path, 'a')
+
+    def _file_lock(self):
+        """Exclusive lock on the sidecar lock file, shared by every worker."""
+        if self._lock_file is None:
+            self._lock_file = open(self.journal_path + ".lock", 'a')
+        return _FileLock(self._lock_file)
+
+    # -------------------------------
+    # Background commit thread
+    # -------------------------------
+
+    def start(self, read_state):
+        """Start the background group-commit thread.
+
+        `read_state()` must return a consistent (seq, {lot: available}) view
+        of the current state; it is what snapshots are written from.
+        """
+        self._read_state = read_state
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="parking-journal", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.commit_interval):
+            try:
+                self.commit()
+                if self._snapshot_due():
+                    self.snapshot()
+            except Exception as e:
+                print(f"Error writing parking journal: {e}")
+
+    def close(self):
+        """Stop the commit thread and leave a fresh snapshot behind."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            self.snapshot()
+        except Exception as e:
+            print(f"Error saving parking data snapshot: {e}")
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+class _FileLock:
+    """Context manager holding an exclusive flock on an open file."""
+
+    def __init__(self, f):
+        self._f = f
+
+    def __enter__(self):
+        if fcntl is not None:
+            fcntl.flock(self._f.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._f.fileno(), fcntl.LOCK_UN)
+        return False
@@ -0,0 +1,116 @@
+# Registry of parking lots, capacities and metadata
+# Penn State Abington - CMPSC 462 Final Project
+#
+# Lots are read from a JSON registry file (see lots.json) instead of being
+# hard-coded. Each lot gets a fixed index; capacities are kept in a compact
+# array and names map to indexes through a dict, so lookups are O(1) and
+# campus / zone filters are precomputed lists of indexes. Entries may set
+# their own daily "reset_time" ('HH:MM', campus-local).
+
+import json
+import os
+from array import array
+
+from scheduler import parse_time_of_day
+
+# Used when no registry file is present (the original four student lots)
+DEFAULT_LOTS = [
+    {"lot": "G", "name": "Lot G", "capacity": 169, "campus": "abington", "zone": "student"},
+    {"lot": "H", "name": "Lot H", "capacity": 238, "campus": "abington", "zone": "student"},
+    {"lot": "J", "name": "Lot J", "capacity": 153, "campus": "abington", "zone": "student"},
+    {"lot": "M", "name": "Lot M", "capacity": 167, "campus": "abington", "zone": "student"},
+]
+
+
+class LotRegistry:
+    """Array-backed lot registry with O(1) name-to-index lookup."""
+
+    def __init__(self, lots):
+        self.names = []
+        self.display_names = []
+        self.capacities = array('i')
+        self.campuses = []
+        self.zones = []
+        self.reset_times = []
+        self.index = {}
+        self._by_campus = {}
+        self._by_zone = {}
+
+        for entry in lots:
+            lot = entry.get("lot")
+            capacity = entry.get("capacity")
+            if not lot or not isinstance(lot, str):
+                raise ValueError(f"Lot registry entry without a lot id: {entry}")
+            if lot in self.index:
+                raise ValueError(f"Duplicate lot in registry: {lot}")
+            if not isinstance(capacity, int) or isinstance(capacity, bool) or capacity <= 0:
+                raise ValueError(f"Lot {lot} needs a positive integer capacity")
+            reset_time = entry.get("reset_time")
+            if reset_time is not None:
+                try:
+                    parse_time_of_day(reset_time)
+                except (AttributeError, ValueError):
+                    raise ValueError(f"Lot {lot} has an invalid reset_time (expected 'HH:MM')")
+
+            i = len(self.names)
+            campus = str(entry.get("campus", "")).lower()
+            zone = str(entry.get("zone", "")).lower()
+            self.index[lot] = i
+            self.names.append(lot)
+            self.display_names.append(entry.get("name", f"Lot {lot}"))
+            self.capacities.append(capacity)
+            self.campuses.append(campus)
+            self.zones.append(zone)
+            self.reset_times.append(reset_time)
+            self._by_campus.setdefault(campus, []).append(i)
+            self._by_zone.setdefault(zone, []).append(i)
+
+    @classmethod
+    def from_file(cls, path):
+        """Load the registry from a JSON file, falling back to the default lots."""
+        if not os.path.exists(path):
+            print(f"No lot registry at {path}. Using default lots.")
+            return cls(DEFAULT_LOTS)
+        with open(path, 'r') as f:
+            data = json.load(f)
+        return cls(data["lots"] if isinstance(data, dict) else data)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, lot):
+        return lot in self.index
+
+    def capacity(self, lot):
+        return self.capacities[self.index[lot]]
+
+    def capacity_map(self):
+        """Return {lot: capacity} in registry order."""
+        return dict(zip(self.names, self.capacities))
+
+    def reset_time(self, lot):
+        """Daily reset time ('HH:MM') for a lot, or None to use the default."""
+        return self.reset_times[self.index[lot]]
+
+    def metadata(self, lot):
+        """Return the descriptive fields for one lot."""
+        i = self.index[lot]
+        return {
+            "lot": lot,
+            "name": self.display_names[i],
+            "capacity": self.capacities[i],
+            "campus": self.campuses[i],
+            "zone": self.zones[i],
+        }
+
+    def filter(self, campus=None, zone=None):
+        """Return lot names matching every given filter, in registry order."""
+        selected = None
+        for value, groups in ((campus, self._by_campus), (zone, self._by_zone)):
+            if value is None:
+                continue
+            indexes = groups.get(value.lower(), [])
+            selected = indexes if selected is None else sorted(set(selected) & set(indexes))
+        if selected is None:
+            return list(self.names)
+        return [self.names[i] for i in selected]
@@ -0,0 +1,88 @@
+# Server-Sent Events fan-out of parking lot changes
+# Penn State Abington - CMPSC 462 Final Project
+#
+# Each state change is serialized into an SSE message exactly once, tagged
+# with an id for its state version, and kept in a short backlog. Connected clients
+# block on a shared condition and write out the prebuilt messages, so one
+# change reaches any number of clients without re-encoding per client.
+
+import json
+import threading
+from collections import deque
+
+
+def format_sse(event_id, event, payload):
+    """Encode one SSE message."""
+    data = json.dumps(payload, separators=(',', ':'))
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+
+class LotChangeBroadcaster:
+    """Shares prebuilt change messages with every waiting stream client.
+
+    `event_id(version)` gives the SSE id for a state version.
+    """
+
+    def __init__(self, backlog=1024, event_id=str):
+        self.event_id = event_id
+        self._cond = threading.Condition()
+        # (previous version, version, encoded message); one message may cover
+        # several versions when changes from other workers are coalesced
+        self._messages = deque(maxlen=backlog)
+        self._listeners = []
+        self.version = 0
+
+    def reset(self, version):
+        """Start publishing from `version`, dropping any backlog."""
+        with self._cond:
+            self._messages.clear()
+            self.version = version
+
+    def publish(self, previous_version, version, changed_lots):
+        """Record the lots changed after `previous_version` and wake all stream clients."""
+        message = format_sse(self.event_id(version), "lots", {"version": version, "lots": changed_lots})
+        with self._cond:
+            self._messages.append((previous_version, version, message))
+            self.version = version
+            self._cond.notify_all()
+        for listener in self._listeners:
+            listener()
+
+    def add_listener(self, callback):
+        """Call `callback()` (from the publishing thread) after every publish.
+
+        Lets async servers wake their own waiters instead of blocking a
+        thread in wait_for_changes().
+        """
+        self._listeners.append(callback)
+
+    def wait_for_changes(self, after_version, timeout):
+        """Block until there are changes newer than `after_version`.
+
+        Returns (latest version, encoded messages). The list is empty on
+        timeout, and None if the client has fallen behind the backlog and
+        needs a full snapshot.
+        """
+        with self._cond:
+            if self.version <= after_version:
+                self._cond.wait(timeout)
+            return self._messages_after(after_version)
+
+    def messages_after(self, after_version):
+        """Non-blocking wait_for_changes(): whatever is newer than `after_version` right now."""
+        with self._cond:
+            return self._messages_after(after_version)
+
+    def _messages_after(self, after_version):
+        if self.version <= after_version:
+            return after_version, []
+        if not self._messages or self._messages[0][0] > after_version:
+            return self.version, None
+        # Walk back from the newest message, so the cost is what we send
+        messages = []
+        for _, version, message in reversed(self._messages):
+            if version <= after_version:
+                break
+            messages.append(message)
+        messages.reverse()
+        return self.version, messages
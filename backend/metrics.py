@@ -0,0 +1,214 @@
+# Low-overhead metrics in Prometheus text format
+# Penn State Abington - CMPSC 462 Final Project
+#
+# Every thread records into its own shard (plain dicts reached through a
+# threading.local), so the hot path is a dict update with no lock. A scrape
+# merges the shards. Each gunicorn worker also writes its merged totals to a
+# small JSON file in a shared directory every few seconds; /metrics adds up
+# the files of all live workers, so it shows the whole server whichever
+# worker answers.
+#
+# Labels are passed as tuples of (name, value) pairs, e.g.
+#   metrics.inc("psupark_lot_events_total", (("lot", "G"), ("op", "delta")))
+
+import json
+import os
+import threading
+from bisect import bisect_left
+
+# Seconds; fine at the low end because most requests finish well under 1 ms
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class _Shard:
+    """One thread's counters and histograms."""
+
+    def __init__(self):
+        self.counters = {}      # (name, labels) -> value
+        self.histograms = {}    # (name, labels) -> [count per bucket..., +Inf count, sum]
+
+
+def _snapshot(d):
+    # The owning thread may add a key while we copy; just try again
+    while True:
+        try:
+            return list(d.items())
+        except RuntimeError:
+            continue
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Metrics:
+    """Per-thread sharded counters and latency histograms."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, shared_dir=None):
+        self.buckets = tuple(buckets)
+        self.shared_dir = shared_dir
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self._meta = {}         # name -> (type, help)
+        self._gauges = []       # callables returning [(name, labels, value)]
+
+    # -------------------------------
+    # Registration
+    # -------------------------------
+
+    def describe(self, name, kind, help_text):
+        """Set the TYPE ('counter', 'histogram' or 'gauge') and HELP text for a metric."""
+        self._meta[name] = (kind, help_text)
+
+    def add_gauges(self, collect):
+        """Register `collect()` -> [(name, labels, value)], read fresh at every scrape."""
+        self._gauges.append(collect)
+
+    # -------------------------------
+    # Recording (lock-free per thread)
+    # -------------------------------
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard()
+            with self._shards_lock:
+                self._shards.append(shard)
+            return shard
+
+    def inc(self, name, labels=(), value=1):
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, labels, seconds):
+        histograms = self._shard().histograms
+        key = (name, labels)
+        hist = histograms.get(key)
+        if hist is None:
+            hist = histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        hist[bisect_left(self.buckets, seconds)] += 1
+        hist[-1] += seconds
+
+    # -------------------------------
+    # Collection
+    # -------------------------------
+
+    def collect(self):
+        """Merge all shards into ({(name, labels): value}, {(name, labels): hist})."""
+        counters, histograms = {}, {}
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, value in _snapshot(shard.counters):
+                counters[key] = counters.get(key, 0) + value
+            for key, hist in _snapshot(shard.histograms):
+                total = histograms.get(key)
+                if total is None:
+                    histograms[key] = list(hist)
+                else:
+                    for i, value in enumerate(hist):
+                        total[i] += value
+        return counters, histograms
+
+    def _worker_file(self, pid):
+        return os.path.join(self.shared_dir, f"{pid}.json")
+
+    def publish(self):
+        """Write this worker's totals to the shared directory for the other workers."""
+        if not self.shared_dir:
+            return
+        counters, histograms = self.collect()
+        data = {
+            "buckets": self.buckets,
+            "counters": [[name, labels, value] for (name, labels), value in counters.items()],
+            "histograms": [[name, labels, hist] for (name, labels), hist in histograms.items()],
+        }
+        os.makedirs(self.shared_dir, exist_ok=True)
+        path = self._worker_file(os.getpid())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def _collect_workers(self):
+        """Merge this worker's live totals with the last published totals of the others."""
+        counters, histograms = self.collect()
+        if not self.shared_dir or not os.path.isdir(self.shared_dir):
+            return counters, histograms
+        for entry in os.listdir(self.shared_dir):
+            pid, _, ext = entry.partition(".")
+            if ext != "json" or not pid.isdigit() or int(pid) == os.getpid():
+                continue
+            path = os.path.join(self.shared_dir, entry)
+            if not _pid_alive(int(pid)):
+                # A worker that exited; its totals go with it (Prometheus sees a reset)
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if tuple(data["buckets"]) != self.buckets:
+                continue
+            for name, labels, value in data["counters"]:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, hist in data["histograms"]:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                total = histograms.setdefault(key, [0] * len(hist))
+                for i, value in enumerate(hist):
+                    total[i] += value
+        return counters, histograms
+
+    def render(self):
+        """Return every metric in Prometheus text exposition format."""
+        counters, histograms = self._collect_workers()
+        gauges = [sample for collect in self._gauges for sample in collect()]
+
+        by_name = {}
+        for (name, labels), value in counters.items():
+            by_name.setdefault(name, []).append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), hist in histograms.items():
+            lines = by_name.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), hist):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {hist[-1]:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+        for name, labels, value in gauges:
+            by_name.setdefault(name, []).append(f"{name}{_format_labels(labels)} {value}")
+
+        out = []
+        for name in sorted(by_name):
+            kind, help_text = self._meta.get(name, ("untyped", ""))
+            if help_text:
+                out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(by_name[name])
+        return "\n".join(out) + "\n"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,184 @@
+# In-memory occupancy history with multi-resolution rollups
+# Penn State Abington - CMPSC 462 Final Project
+#
+# Every lot keeps a fixed-size ring buffer of raw (timestamp, occupied)
+# samples plus minute, hour and day rollup rings. Each new sample updates
+# the matching bucket of every rollup in O(1) (min, max, running sum and
+# count), so aggregates never rescan raw events. Memory per lot is fixed by
+# the ring sizes; old buckets are overwritten as time moves on.
+#
+# Buckets follow campus wall-clock time (`tz`, as /forecast and the daily
+# reset do), so a day bucket runs from local midnight to midnight rather than
+# between UTC boundaries. Rollup rings are keyed on local seconds since the
+# epoch; timestamps in and out stay Unix time.
+
+import threading
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+RESOLUTIONS = {"minute": 60, "hour": 3600, "day": 86400}
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_local_seconds(ts, tz=None):
+    """Unix time -> seconds since the epoch on the wall clock of `tz` (None: server local time)."""
+    return (datetime.fromtimestamp(ts, tz).replace(tzinfo=None) - _EPOCH).total_seconds()
+
+
+def from_local_seconds(local, tz=None):
+    """Inverse of to_local_seconds (the first occurrence, for a repeated DST hour)."""
+    naive = _EPOCH + timedelta(seconds=local)
+    return naive.replace(tzinfo=tz).timestamp() if tz is not None else naive.timestamp()
+
+
+class RollupRing:
+    """Fixed-size ring of (min, max, mean) buckets at one resolution, keyed on local seconds."""
+
+    def __init__(self, seconds, size):
+        self.seconds = seconds
+        self.size = size
+        self.keys = array('q', [-1]) * size
+        self.mins = array('i', [0]) * size
+        self.maxs = array('i', [0]) * size
+        self.sums = array('d', [0.0]) * size
+        self.counts = array('i', [0]) * size
+        self.newest = -1
+
+    def add(self, local, value):
+        key = int(local // self.seconds)
+        if key <= self.newest - self.size:
+            return  # older than anything the ring still holds
+        slot = key % self.size
+        if self.keys[slot] != key:
+            self.keys[slot] = key
+            self.mins[slot] = self.maxs[slot] = value
+            self.sums[slot] = value
+            self.counts[slot] = 1
+        else:
+            if value < self.mins[slot]:
+                self.mins[slot] = value
+            if value > self.maxs[slot]:
+                self.maxs[slot] = value
+            self.sums[slot] += value
+            self.counts[slot] += 1
+        if key > self.newest:
+            self.newest = key
+
+    def query(self, start_local, end_local):
+        """Yield (local bucket start, min, max, mean) for buckets overlapping [start_local, end_local)."""
+        first = max(int(start_local // self.seconds), self.newest - self.size + 1)
+        last = min(int((end_local - 1e-9) // self.seconds), self.newest)
+        for key in range(first, last + 1):
+            slot = key % self.size
+            if self.keys[slot] == key:
+                yield (key * self.seconds, self.mins[slot], self.maxs[slot],
+                       self.sums[slot] / self.counts[slot])
+
+
+class _RawView:
+    """Oldest-to-newest sequence view of a ring's timestamps, for bisect."""
+
+    def __init__(self, ring):
+        self._ring = ring
+
+    def __len__(self):
+        return self._ring.count
+
+    def __getitem__(self, i):
+        return self._ring.times[self._ring.physical(i)]
+
+
+class RawRing:
+    """Fixed-size ring buffer of raw (timestamp, occupied) samples."""
+
+    def __init__(self, size):
+        self.size = size
+        self.times = array('d', [0.0]) * size
+        self.values = array('i', [0]) * size
+        self.head = 0      # next slot to write
+        self.count = 0
+
+    def physical(self, i):
+        return (self.head - self.count + i) % self.size
+
+    def add(self, ts, value):
+        # Samples normally arrive in time order; drop stragglers so bisect stays valid
+        if self.count and ts < self.times[(self.head - 1) % self.size]:
+            return
+        self.times[self.head] = ts
+        self.values[self.head] = value
+        self.head = (self.head + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def query(self, start_ts, end_ts):
+        """Yield (ts, occupied) for samples in [start_ts, end_ts)."""
+        view = _RawView(self)
+        for i in range(bisect_left(view, start_ts), self.count):
+            slot = self.physical(i)
+            ts = self.times[slot]
+            if ts >= end_ts:
+                break
+            yield ts, self.values[slot]
+
+
+class LotHistory:
+    """Raw samples plus minute/hour/day rollups for one lot."""
+
+    def __init__(self, raw_size, rollup_sizes):
+        self.raw = RawRing(raw_size)
+        self.rollups = {name: RollupRing(RESOLUTIONS[name], size)
+                        for name, size in rollup_sizes.items()}
+
+    def add(self, ts, occupied, local):
+        self.raw.add(ts, occupied)
+        for ring in self.rollups.values():
+            ring.add(local, occupied)
+
+
+class OccupancyHistory:
+    """Per-lot occupancy history, created lazily the first time a lot is sampled."""
+
+    def __init__(self, raw_size=1024, minutes=1440, hours=840, days=400, tz=None):
+        self.raw_size = raw_size
+        self.tz = tz
+        self.rollup_sizes = {"minute": minutes, "hour": hours, "day": days}
+        self._lots = {}
+        self._lock = threading.Lock()
+
+    def record(self, ts, lot, occupied):
+        """Add one occupancy sample for a lot."""
+        self._record(ts, lot, occupied, to_local_seconds(ts, self.tz))
+
+    def record_many(self, ts, samples):
+        """Add (lot, occupied) samples that share a timestamp."""
+        local = to_local_seconds(ts, self.tz)
+        for lot, occupied in samples:
+            self._record(ts, lot, occupied, local)
+
+    def _record(self, ts, lot, occupied, local):
+        with self._lock:
+            history = self._lots.get(lot)
+            if history is None:
+                history = self._lots[lot] = LotHistory(self.raw_size, self.rollup_sizes)
+            history.add(ts, occupied, local)
+
+    def query(self, lot, start_ts, end_ts, resolution="hour"):
+        """Return points for [start_ts, end_ts) at 'raw', 'minute', 'hour' or 'day' resolution.
+
+        Raw points are {"ts", "occupied"}; rollup points are {"ts", "min", "max", "mean"}.
+        """
+        if resolution != "raw" and resolution not in self.rollup_sizes:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        with self._lock:
+            history = self._lots.get(lot)
+            if history is None:
+                return []
+            if resolution == "raw":
+                return [{"ts": ts, "occupied": value}
+                        for ts, value in history.raw.query(start_ts, end_ts)]
+            points = history.rollups[resolution].query(to_local_seconds(start_ts, self.tz),
+                                                       to_local_seconds(end_ts, self.tz))
+            return [{"ts": int(from_local_seconds(local, self.tz)), "min": lo, "max": hi, "mean": round(mean, 2)}
+                    for local, lo, hi, mean in points]
@@ -0,0 +1,147 @@
+# Timer-heap job scheduler with single-worker leader election
+# Penn State Abington - CMPSC 462 Final Project
+#
+# Jobs sit in a heap ordered by their next due time and the scheduler thread
+# sleeps until the earliest one is due (or a new job is added), instead of
+# waking every minute to compare the clock. A late wake-up still runs the job,
+# so a reset can't be skipped by sleep drift. Jobs marked leader_only run in
+# exactly one process: whichever worker holds an exclusive lock on the
+# scheduler lock file. If that worker dies the lock is released and another
+# worker picks it up on its next due job.
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: single process, always the leader
+    fcntl = None
+
+
+class LeaderLock:
+    """Non-blocking exclusive file lock; the process holding it is the leader."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self.is_leader = False
+
+    def try_acquire(self):
+        """Become the leader if nobody else is; returns whether we lead."""
+        if self.is_leader:
+            return True
+        if fcntl is None:
+            self.is_leader = True
+            return True
+        if self._file is None:
+            self._file = open(self.path, 'a')
+        try:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.write(f"{os.getpid()}\n")
+        self._file.flush()
+        self.is_leader = True
+        print(f"Scheduler leader: pid {os.getpid()}")
+        return True
+
+
+def parse_time_of_day(value):
+    """Parse 'HH:MM' into (hour, minute)."""
+    hour, minute = (int(part) for part in value.split(":"))
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"Invalid time of day: {value}")
+    return hour, minute
+
+
+def next_daily(hour, minute, tz=None):
+    """Return a next_run function for a job due every day at hour:minute in `tz`."""
+    def next_run(after):
+        now = datetime.fromtimestamp(after, tz)
+        due = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if due.timestamp() <= after:
+            # Aware datetimes add days in wall-clock time, so DST shifts are handled
+            due += timedelta(days=1)
+        return due.timestamp()
+    return next_run
+
+
+def next_interval(seconds):
+    """Return a next_run function for a job due every `seconds`."""
+    return lambda after: after + seconds
+
+
+class Job:
+    def __init__(self, name, next_run, func, leader_only):
+        self.name = name
+        self.next_run = next_run
+        self.func = func
+        self.leader_only = leader_only
+
+
+class Scheduler:
+    """Runs jobs from a timer heap on one background thread."""
+
+    def __init__(self, leader_lock=None):
+        self.leader_lock = leader_lock
+        self._heap = []                  # (due timestamp, tiebreak, job)
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stop = False
+
+    def add_job(self, name, next_run, func, leader_only=False):
+        """Schedule func(); next_run(after_ts) gives each following due time."""
+        job = Job(name, next_run, func, leader_only)
+        with self._cond:
+            heapq.heappush(self._heap, (next_run(time.time()), next(self._counter), job))
+            self._cond.notify()
+        return job
+
+    def every(self, name, seconds, func, leader_only=False):
+        return self.add_job(name, next_interval(seconds), func, leader_only)
+
+    def daily(self, name, time_of_day, func, tz=None, leader_only=True):
+        hour, minute = parse_time_of_day(time_of_day)
+        return self.add_job(name, next_daily(hour, minute, tz), func, leader_only)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stop:
+                    now = time.time()
+                    if self._heap and self._heap[0][0] <= now:
+                        break
+                    # Sleep until the next job; cap the wait so wall-clock jumps are noticed
+                    timeout = min(self._heap[0][0] - now, 60.0) if self._heap else None
+                    self._cond.wait(timeout)
+                if self._stop:
+                    return
+                due, _, job = heapq.heappop(self._heap)
+                # Schedule from the due time, not from now, so intervals don't drift
+                heapq.heappush(self._heap, (job.next_run(max(due, time.time() - 1)),
+                                            next(self._counter), job))
+
+            if job.leader_only and self.leader_lock and not self.leader_lock.try_acquire():
+                continue
+            try:
+                job.func()
+            except Exception as e:
+                print(f"Scheduled job {job.name} failed: {e}")
@@ -0,0 +1,239 @@
+# Lot counters shared by every gunicorn worker
+# Penn State Abington - CMPSC 462 Final Project
+#
+# Available-space counters live in a memory-mapped file instead of a
+# per-process dict, so all workers see (and clamp against) the same counts.
+# Updates take a lock stripe for the lots they touch: a threading.Lock for
+# threads in this process plus an fcntl byte-range lock for other processes.
+# Every committed transaction that changes a lot's value bumps a global
+# state version, which is also written next to each lot it changed. Writing
+# a lot's current value again is not a change.
+#
+# File layout (little-endian int64 words):
+#   [magic][run id (32 bytes)][lot count][names hash][version]
+#   then per lot: [available][lot version]
+
+import mmap
+import os
+import threading
+import zlib
+from collections.abc import Mapping
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: single process only, thread locks are enough
+    fcntl = None
+
+MAGIC = int.from_bytes(b"PSUPARK1", "little")
+HEADER_WORDS = 8
+VERSION_WORD = 7
+SLOT_WORDS = 2
+
+
+def read_run_id(path):
+    """Run id of the server that initialized the state file at `path`, or None."""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(40)
+    except OSError:
+        return None
+    if len(header) < 40 or int.from_bytes(header[:8], "little") != MAGIC:
+        return None
+    return header[8:40].rstrip(b"\0").decode() or None
+
+
+class SharedLotState(Mapping):
+    """Read-mostly mapping of lot -> available spaces backed by shared memory."""
+
+    def __init__(self, path, capacities, run_id, stripes=16):
+        self.path = path
+        self.names = list(capacities)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.capacities = [capacities[name] for name in self.names]
+        self.run_id = run_id
+        self.stripes = stripes
+
+        # Byte offsets used for fcntl locks (locks may extend past EOF)
+        self._version_lock_byte = stripes
+        self._init_lock_byte = stripes + 1
+        self._thread_locks = [threading.Lock() for _ in range(stripes + 2)]
+
+        self._names_hash = zlib.crc32("\0".join(self.names).encode())
+        self._size = (HEADER_WORDS + SLOT_WORDS * len(self.names)) * 8
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < self._size:
+            os.ftruncate(self._fd, self._size)
+        self._mm = mmap.mmap(self._fd, self._size)
+        self._words = memoryview(self._mm).cast('q')
+
+    # -------------------------------
+    # Locking
+    # -------------------------------
+
+    def _lock(self, n):
+        self._thread_locks[n].acquire()
+        if fcntl is not None:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, n)
+
+    def _unlock(self, n):
+        if fcntl is not None:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, n)
+        self._thread_locks[n].release()
+
+    def _stripes_for(self, lots):
+        return sorted({self.index[lot] % self.stripes for lot in lots})
+
+    # -------------------------------
+    # Initialization
+    # -------------------------------
+
+    def _header_matches(self):
+        w = self._words
+        return (w[0] == MAGIC and self._mm[8:40] == self._run_bytes() and
+                w[5] == len(self.names) and w[6] == self._names_hash)
+
+    def _run_bytes(self):
+        return self.run_id.encode()[:32].ljust(32, b"\0")
+
+    def initialize(self, loader):
+        """Fill the store once per server run.
+
+        The first worker of a run calls `loader()` -> (version, {lot: available})
+        and writes the result; later workers attach to what is already there.
+        Returns True if this process did the load.
+        """
+        self._lock(self._init_lock_byte)
+        try:
+            if self._header_matches():
+                return False
+            version, values = loader()
+            w = self._words
+            w[0] = 0  # invalidate while rewriting
+            for i, name in enumerate(self.names):
+                base = HEADER_WORDS + i * SLOT_WORDS
+                w[base] = values.get(name, self.capacities[i])
+                w[base + 1] = version
+            w[VERSION_WORD] = version
+            self._mm[8:40] = self._run_bytes()
+            w[5] = len(self.names)
+            w[6] = self._names_hash
+            w[0] = MAGIC
+            self._mm.flush()
+            return True
+        finally:
+            self._unlock(self._init_lock_byte)
+
+    # -------------------------------
+    # Reads (lock-free, aligned 8-byte loads)
+    # -------------------------------
+
+    def __getitem__(self, lot):
+        return self._words[HEADER_WORDS + self.index[lot] * SLOT_WORDS]
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, lot):
+        return lot in self.index
+
+    @property
+    def version(self):
+        """Global state version, bumped by every committed transaction."""
+        return self._words[VERSION_WORD]
+
+    def read_all(self):
+        """Return (version, {lot: available}) as one consistent view."""
+        stripes = list(range(min(self.stripes, len(self.names))))
+        for n in stripes:
+            self._lock(n)
+        try:
+            w = self._words
+            values = {name: w[HEADER_WORDS + i * SLOT_WORDS] for i, name in enumerate(self.names)}
+            return w[VERSION_WORD], values
+        finally:
+            for n in reversed(stripes):
+                self._unlock(n)
+
+    def changed_since(self, version):
+        """List the lots whose last change is newer than `version`."""
+        w = self._words
+        return [name for i, name in enumerate(self.names)
+                if w[HEADER_WORDS + i * SLOT_WORDS + 1] > version]
+
+    # -------------------------------
+    # Writes
+    # -------------------------------
+
+    @contextmanager
+    def transaction(self, lots):
+        """Lock the stripes for `lots` and commit all writes under one new version.
+
+        Only lots whose value actually differs at the end get the new version;
+        if none does, the version does not move.
+        """
+        stripes = self._stripes_for(lots)
+        for n in stripes:
+            self._lock(n)
+        txn = _Transaction(self)
+        try:
+            yield txn
+            txn.finish()
+            if txn.changed:
+                self._lock(self._version_lock_byte)
+                try:
+                    version = self._words[VERSION_WORD] + 1
+                    for i in txn.changed:
+                        self._words[HEADER_WORDS + i * SLOT_WORDS + 1] = version
+                    self._words[VERSION_WORD] = version
+                    txn.version = version
+                finally:
+                    self._unlock(self._version_lock_byte)
+        finally:
+            for n in reversed(stripes):
+                self._unlock(n)
+
+    def close(self):
+        self._words.release()
+        self._mm.close()
+        os.close(self._fd)
+
+
+class _Transaction:
+    """Writes staged while a SharedLotState transaction holds its stripes."""
+
+    def __init__(self, store):
+        self._store = store
+        self._original = {}     # lot index -> value before this transaction
+        self.changed = set()    # lot indexes whose value differs at commit (see finish())
+        self.version = store.version
+
+    def get(self, lot):
+        return self._store[lot]
+
+    def set(self, lot, available):
+        """Write a lot's available spaces, clamped to 0..capacity; returns the stored value.
+
+        Writing the value a lot already has is a no-op.
+        """
+        i = self._store.index[lot]
+        available = max(0, min(available, self._store.capacities[i]))
+        word = HEADER_WORDS + i * SLOT_WORDS
+        current = self._store._words[word]
+        if available != current:
+            self._original.setdefault(i, current)
+            self._store._words[word] = available
+        return available
+
+    def finish(self):
+        """Work out which lots changed overall (a lot set and then set back did not)."""
+        w = self._store._words
+        self.changed = {i for i, value in self._original.items()
+                        if w[HEADER_WORDS + i * SLOT_WORDS] != value}
+
+    def is_changed(self, lot):
+        """After the transaction: did `lot` get a new value?"""
+        return self._store.index[lot] in self.changed
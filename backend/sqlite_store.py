@@ -0,0 +1,214 @@
+# SQLite storage engine for parking lot state and event history
+# Penn State Abington - CMPSC 462 Final Project
+#
+# Drop-in alternative to ParkingJournal (select with STORAGE_BACKEND=sqlite).
+# The database runs in WAL mode, so readers never block the writer. Each
+# worker has one writer connection, owned by its group-commit thread, plus
+# one read connection per thread. Every commit bulk-inserts the pending
+# events into `lot_events` and upserts the newest value per lot into the hot
+# `lot_state` table in a single transaction. sqlite3 caches the prepared
+# statements because the SQL text never changes.
+
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lot_state (
+    lot        TEXT PRIMARY KEY,
+    available  INTEGER NOT NULL,
+    seq        INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lot_events (
+    id        INTEGER PRIMARY KEY,
+    seq       INTEGER NOT NULL,
+    ts        REAL NOT NULL,
+    lot       TEXT NOT NULL,
+    op        TEXT NOT NULL,
+    value     INTEGER NOT NULL,
+    available INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lot_events_lot_ts ON lot_events (lot, ts);
+"""
+
+INSERT_EVENT = ("INSERT INTO lot_events (seq, ts, lot, op, value, available) "
+                "VALUES (?, ?, ?, ?, ?, ?)")
+
+# Workers commit independently, so never let an older seq overwrite a newer one
+UPSERT_STATE = ("INSERT INTO lot_state (lot, available, seq, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(lot) DO UPDATE SET available = excluded.available, "
+                "seq = excluded.seq, updated_at = excluded.updated_at "
+                "WHERE excluded.seq >= lot_state.seq")
+
+SELECT_STATE = "SELECT lot, available, seq FROM lot_state"
+
+SELECT_EVENTS = ("SELECT ts, available FROM lot_events "
+                 "WHERE lot = ? AND ts >= ? AND ts < ? ORDER BY ts LIMIT ?")
+
+PRUNE_EVENTS = "DELETE FROM lot_events WHERE ts < ?"
+
+
+class SQLiteLotStore:
+    """WAL-mode SQLite persistence with group-committed event history."""
+
+    def __init__(self, db_path, commit_interval=0.05, maintenance_interval=300.0,
+                 history_days=90, on_write=None):
+        self.db_path = db_path
+        self.commit_interval = commit_interval
+        self.maintenance_interval = maintenance_interval
+        self.history_days = history_days
+        # on_write(kind, seconds, events) is called after each "commit" / "snapshot"
+        self.on_write = on_write
+
+        self._lock = threading.Lock()       # guards pending events
+        self._write_lock = threading.Lock()  # one writer transaction at a time per process
+        self._pending = []
+        self._writer = None
+        self._local = threading.local()
+        self._last_maintenance = time.monotonic()
+        self._thread = None
+        self._stop = threading.Event()
+
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False,
+                               cached_statements=64)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def _reader(self):
+        """Per-thread read connection (WAL readers see the last commit without locking)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    # -------------------------------
+    # Recovery
+    # -------------------------------
+
+    def load(self, defaults, is_valid):
+        """Read current lot counts from the hot table; returns (seq, state)."""
+        state = dict(defaults)
+        seq = 0
+        for lot, available, lot_seq in self._reader().execute(SELECT_STATE):
+            if lot in state and is_valid(lot, available):
+                state[lot] = available
+            seq = max(seq, lot_seq)
+        print(f"Restored parking data from SQLite {self.db_path} (seq {seq})")
+        return seq, state
+
+    def is_empty(self):
+        """True until the first lot change has been committed."""
+        return self._reader().execute("SELECT 1 FROM lot_state LIMIT 1").fetchone() is None
+
+    def lot_history(self, lot, start_ts, end_ts, limit=10000):
+        """Return [(ts, available)] for one lot between two Unix timestamps."""
+        return self._reader().execute(SELECT_EVENTS, (lot, start_ts, end_ts, limit)).fetchall()
+
+    # -------------------------------
+    # Recording
+    # -------------------------------
+
+    def record(self, seq, lot, available, op, value):
+        """Queue one lot change for the next group commit."""
+        self.record_many(seq, [(lot, available, op, value)])
+
+    def record_many(self, seq, changes):
+        """Queue several (lot, available, op, value) changes committed at state version `seq`."""
+        ts = time.time()
+        rows = [(seq, ts, lot, op, value, available) for lot, available, op, value in changes]
+        with self._lock:
+            self._pending.extend(rows)
+
+    def commit(self):
+        """Bulk-insert pending events and update lot_state in one transaction."""
+        with self._write_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return 0
+            if self._writer is None:
+                self._writer = self._connect()
+            # Only the newest change per lot needs to reach the hot table
+            latest = {}
+            for seq, ts, lot, op, value, available in pending:
+                latest[lot] = (lot, available, seq, ts)
+            started = time.perf_counter()
+            try:
+                with self._writer:
+                    self._writer.executemany(INSERT_EVENT, pending)
+                    self._writer.executemany(UPSERT_STATE, latest.values())
+            except sqlite3.Error:
+                # Keep the events for the next attempt instead of dropping them
+                with self._lock:
+                    self._pending[:0] = pending
+                raise
+            if self.on_write:
+                self.on_write("commit", time.perf_counter() - started, len(pending))
+            return len(pending)
+
+    def snapshot(self):
+        """Commit, prune old history and checkpoint the WAL (the hot table is the snapshot)."""
+        self.commit()
+        started = time.perf_counter()
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect()
+            if self.history_days:
+                with self._writer:
+                    self._writer.execute(PRUNE_EVENTS, (time.time() - self.history_days * 86400,))
+            self._writer.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        self._last_maintenance = time.monotonic()
+        if self.on_write:
+            self.on_write("snapshot", time.perf_counter() - started, 0)
+
+    # -------------------------------
+    # Background commit thread
+    # -------------------------------
+
+    def start(self, read_state=None):
+        """Start the background group-commit thread.
+
+        `read_state` is accepted for interface parity with ParkingJournal;
+        lot_state is always current, so it is not needed here.
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="parking-sqlite", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.commit_interval):
+            try:
+                self.commit()
+                # maintenance_interval=None leaves maintenance to an external scheduler
+                if (self.maintenance_interval is not None and
+                        time.monotonic() - self._last_maintenance >= self.maintenance_interval):
+                    self.snapshot()
+            except sqlite3.Error as e:
+                print(f"Error writing parking database: {e}")
+
+    def close(self):
+        """Stop the commit thread and flush anything still pending."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            self.commit()
+        except sqlite3.Error as e:
+            print(f"Error writing parking database: {e}")
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
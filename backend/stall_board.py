@@ -0,0 +1,54 @@
+# Latest per-stall occupancy reported by lot cameras
+# Penn State Abington - CMPSC 462 Final Project
+#
+# Cameras with a stall map send {stall id: occupied} along with their
+# /setLotOccupancy count. The latest map for each lot is written to a small
+# JSON file in a shared directory (atomic replace), so every gunicorn worker
+# serves the same data. Readers keep the parsed file and only re-read it
+# when its mtime changes.
+
+import json
+import os
+import threading
+import time
+
+
+class StallBoard:
+    """Per-lot stall occupancy shared between workers through `shared_dir`."""
+
+    def __init__(self, shared_dir):
+        self.shared_dir = shared_dir
+        self._cache = {}        # lot -> (mtime_ns, data)
+        self._lock = threading.Lock()
+        os.makedirs(shared_dir, exist_ok=True)
+
+    def _path(self, lot):
+        return os.path.join(self.shared_dir, f"{lot}.json")
+
+    def update(self, lot, stalls):
+        """Replace a lot's stall map with {stall id: occupied}."""
+        data = {"lot": lot, "updated_at": time.time(), "stalls": stalls}
+        path = self._path(lot)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def get(self, lot):
+        """Return {"lot", "updated_at", "stalls"} for a lot, or None if no camera reported one."""
+        path = self._path(lot)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        cached = self._cache.get(lot)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cached[1] if cached else None
+        with self._lock:
+            self._cache[lot] = (mtime, data)
+        return data
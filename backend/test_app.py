@@ -0,0 +1,89 @@
+# Tests for the parking backend's HTTP API
+# Penn State Abington - CMPSC 462 Final Project
+#
+# Run with:  python -m unittest test_app   (or python -m pytest)
+#
+# The app loads its state and starts its background jobs on import, so every
+# file it writes is pointed at a temporary directory first.
+
+import os
+import tempfile
+import unittest
+
+_tmp = tempfile.mkdtemp(prefix="psupark_test_")
+_here = os.path.dirname(os.path.abspath(__file__))
+for name, value in {
+    "PARKING_RUN_ID": "test" + os.urandom(8).hex(),
+    "PARKING_DATA_FILE": "parking_data.json",
+    "JOURNAL_FILE": "parking_journal.log",
+    "SHARED_STATE_FILE": "lots.bin",
+    "DEDUP_FILE": "dedup.bin",
+    "METRICS_DIR": "metrics",
+    "STALLS_DIR": "stalls",
+    "SQLITE_DB_FILE": "parking.db",
+    "FORECAST_FILE": "forecast_profiles.npz",
+    "SCHEDULER_LOCK_FILE": "scheduler.lock",
+    "DEVICE_KEYS_FILE": "device_keys.json",
+}.items():
+    os.environ[name] = value if name == "PARKING_RUN_ID" else os.path.join(_tmp, value)
+os.environ["LOT_REGISTRY_FILE"] = os.path.join(_here, "lots.json")
+os.environ.setdefault("API_KEY", "test-key")
+
+import app as backend  # noqa: E402  (must follow the environment setup)
+
+
+class LotCountTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = backend.app.test_client()
+        self.headers = {"X-API-Key": backend.API_KEY}
+        backend.reset_daily_data()
+
+    def set_occupancy(self, lot, occupied_count):
+        response = self.client.post("/setLotOccupancy", headers=self.headers,
+                                    json={"lot": lot, "occupied_count": occupied_count})
+        self.assertEqual(response.status_code, 200)
+
+    def test_repeated_occupancy_keeps_etag(self):
+        self.set_occupancy("J", 5)
+        first = self.client.get("/getLotCount", headers=self.headers)
+        etag = first.headers["ETag"]
+
+        # Cameras re-post the same count every capture
+        self.set_occupancy("J", 5)
+        self.set_occupancy("J", 5)
+        response = self.client.get("/getLotCount", headers={**self.headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], etag)
+
+    def test_clamped_delta_keeps_etag(self):
+        etag = self.client.get("/getLotCount", headers=self.headers).headers["ETag"]
+        response = self.client.post("/updateLotCount", headers=self.headers, json={"lot": "G", "delta": 1})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get("/getLotCount", headers={**self.headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_changed_occupancy_changes_etag(self):
+        etag = self.client.get("/getLotCount", headers=self.headers).headers["ETag"]
+        self.set_occupancy("J", 7)
+        response = self.client.get("/getLotCount", headers={**self.headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    def test_repeated_occupancy_not_listed_since(self):
+        self.set_occupancy("J", 5)
+        cursor = self.client.get("/getLotCount?since=0", headers=self.headers).get_json()["version"]
+
+        self.set_occupancy("J", 5)
+        body = self.client.get(f"/getLotCount?since={cursor}", headers=self.headers).get_json()
+        self.assertFalse(body["full"])
+        self.assertEqual(body["lots"], [])
+        self.assertEqual(body["version"], cursor)
+
+        self.set_occupancy("J", 6)
+        body = self.client.get(f"/getLotCount?since={cursor}", headers=self.headers).get_json()
+        self.assertEqual([lot["lot"] for lot in body["lots"]], ["J"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+# Tests for the shared duplicate-event index
+# Penn State Abington - CMPSC 462 Final Project
+#
+# Run with:  python -m unittest test_dedup   (or python -m pytest)
+
+import os
+import tempfile
+import unittest
+
+from dedup import SEQ_WINDOW, DedupIndex
+
+
+class DedupIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".dedup")
+        os.close(fd)
+        self.index = DedupIndex(self.path, devices=64, events=256, window=600, stripes=4)
+
+    def tearDown(self):
+        self.index.close()
+        os.remove(self.path)
+
+    def accept_batch(self, device_id, seqs, **kwargs):
+        return [self.index.accept(device_id, seq, now=1000, **kwargs) for seq in seqs]
+
+    def test_retried_batch_larger_than_window_is_all_duplicates(self):
+        seqs = range(1, 101)        # one /batchUpdate of 100 items
+        self.assertTrue(all(self.accept_batch("lane-1", seqs)))
+        self.assertFalse(any(self.accept_batch("lane-1", seqs)))
+
+    def test_out_of_order_within_window_is_accepted_once(self):
+        self.assertTrue(self.index.accept("lane-1", 10, now=1000))
+        self.assertTrue(self.index.accept("lane-1", 8, now=1000))
+        self.assertFalse(self.index.accept("lane-1", 8, now=1000))
+        self.assertTrue(self.index.accept("lane-1", 9, now=1000))
+
+    def test_seq_below_window_is_duplicate(self):
+        self.index.accept("lane-1", 500, now=1000)
+        self.assertFalse(self.index.accept("lane-1", 500 - SEQ_WINDOW, now=1000))
+        self.assertFalse(self.index.accept("lane-1", 0, now=1000))
+
+    def test_new_boot_id_starts_a_new_sequence(self):
+        self.accept_batch("lane-1", range(1, 101), boot_id="boot-a")
+        self.assertTrue(all(self.accept_batch("lane-1", range(1, 101), boot_id="boot-b")))
+        self.assertFalse(any(self.accept_batch("lane-1", range(1, 101), boot_id="boot-a")))
+
+    def test_event_ids_expire_after_window(self):
+        self.assertTrue(self.index.accept("cam-1", event_id="e1", now=1000))
+        self.assertFalse(self.index.accept("cam-1", event_id="e1", now=1300))
+        self.assertTrue(self.index.accept("cam-1", event_id="e1", now=2000))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,76 +1,117 @@
-import cv2
+import os
 import requests
 import time
 from datetime import datetime
+
+import numpy as np
 from ultralytics import YOLO
 
+from frame_grabber import FrameGrabber
+from motion_gate import MotionGate
+from stall_map import StallMap
+
 # Configuration
-BACKEND_URL = "http://localhost:5000/api/parking-lots/C/occupancy"  # Update to your backend endpoint
+BACKEND_URL = os.getenv("PARKING_BACKEND_URL", "https://cs462-parkingapp.onrender.com").rstrip("/") + "/setLotOccupancy"
+API_KEY = os.getenv("PARKING_API_KEY", "123")  # this camera's device key
 CAMERA_INDEX = 0  # Default webcam
 CAPTURE_INTERVAL = 5  # Seconds between captures
 YOLO_MODEL_PATH = "../../yolo11m.pt"  # Medium YOLO model
-PARKING_LOT_ID = "C"
+PARKING_LOT_ID = os.getenv("PARKING_LOT_ID", "H")  # must be a lot in backend/lots.json
+STALL_MAP_FILE = f"stalls_{PARKING_LOT_ID}.json"  # optional; counts cars per stall when present
+MOTION_GATE = True  # skip YOLO when the lot hasn't changed since the last detection
+MOTION_MAX_SKIP_SECONDS = 300  # run YOLO at least this often anyway
+
+# COCO classes: 2 = car, 3 = motorcycle, 5 = bus, 7 = truck
+VEHICLE_CLASSES = [2, 3, 5, 7]
 
 # Initialize YOLO model
 model = YOLO(YOLO_MODEL_PATH)
 
-def detect_cars(frame):
-    """
-    Detect cars in the frame using YOLO
-    Returns the count of detected cars
-    """
-    # Run YOLO inference
-    results = model(frame, verbose=False)
-
-    # Filter for car detections (class 2 in COCO dataset)
-    # COCO classes: 2 = car, 3 = motorcycle, 5 = bus, 7 = truck
-    car_count = 0
-
-    for result in results:
-        boxes = result.boxes
-        for box in boxes:
-            # Get class ID
-            class_id = int(box.cls[0])
-            confidence = float(box.conf[0])
+# Stall polygons for this camera, precomputed once (see stall_map.py)
+stall_map = StallMap.from_file(STALL_MAP_FILE) if os.path.exists(STALL_MAP_FILE) else None
 
-            # Count vehicles (car, motorcycle, bus, truck)
-            if class_id in [2, 3, 5, 7] and confidence > 0.5:
-                car_count += 1
+# Cheap change detection ahead of YOLO (see motion_gate.py); with a stall map
+# it watches each stall, otherwise the whole frame
+motion_gate = None
+if MOTION_GATE:
+    if stall_map is not None:
+        motion_gate = MotionGate(stall_map.boxes, stall_map.image_size,
+                                 max_skip_seconds=MOTION_MAX_SKIP_SECONDS)
+    else:
+        motion_gate = MotionGate(max_skip_seconds=MOTION_MAX_SKIP_SECONDS)
 
-    return car_count
+# Result of the last YOLO run, reused while nothing moves
+last_detection = None
 
-def capture_and_process():
-    """Capture an image from webcam, detect cars, and send count to backend"""
-    # Initialize camera
-    cap = cv2.VideoCapture(CAMERA_INDEX)
+def detect_vehicle_boxes(frame):
+    """
+    Detect vehicles in the frame using YOLO
+    Returns an (N, 4) array of x1, y1, x2, y2 boxes
+    """
+    # Run YOLO inference
+    result = model(frame, verbose=False)[0]
 
-    if not cap.isOpened():
-        print("Error: Could not open camera")
-        return False
+    # Keep confident vehicle detections, all at once
+    classes = result.boxes.cls.cpu().numpy()
+    confidence = result.boxes.conf.cpu().numpy()
+    keep = np.isin(classes, VEHICLE_CLASSES) & (confidence > 0.5)
+    return result.boxes.xyxy.cpu().numpy()[keep]
 
-    # Capture frame
-    ret, frame = cap.read()
-    cap.release()
+def detect_cars(frame):
+    """
+    Detect cars in the frame using YOLO
+    Returns the count of detected cars
+    """
+    return len(detect_vehicle_boxes(frame))
 
-    if not ret:
+def detect_occupancy(frame):
+    """
+    Run YOLO on the frame
+    Returns (occupied count, {stall id: occupied} or None)
+    """
+    boxes = detect_vehicle_boxes(frame)
+
+    # With a stall map, only cars parked in a stall count (not ones driving
+    # through the aisle), and the backend gets which stalls are taken
+    if stall_map is not None:
+        height, width = frame.shape[:2]
+        stalls = stall_map.occupancy(boxes, (width, height))
+        return sum(stalls.values()), stalls
+    return len(boxes), None
+
+def capture_and_process(camera):
+    """Take a fresh frame from the open camera, detect cars, and send count to backend"""
+    global last_detection
+    frame = camera.read()
+
+    if frame is None:
         print("Error: Could not read frame")
         return False
 
-    # Detect cars in the frame
-    car_count = detect_cars(frame)
-    print(f"Detected {car_count} cars in parking lot {PARKING_LOT_ID}")
+    # Detect cars in the frame, unless nothing has changed since the last detection
+    if motion_gate is None or motion_gate.should_run(frame) or last_detection is None:
+        last_detection = detect_occupancy(frame)
+        car_count, stalls = last_detection
+        print(f"Detected {car_count} cars in parking lot {PARKING_LOT_ID}")
+    else:
+        car_count, stalls = last_detection
+        print(f"No change ({motion_gate.changed:.1%} changed); reusing last count of {car_count} cars "
+              f"(YOLO skipped {motion_gate.skips} of {motion_gate.skips + motion_gate.runs} frames)")
 
     # Prepare the data to send to backend
     data = {
-        'parking_lot_id': PARKING_LOT_ID,
-        'occupied_spots': car_count,
+        'lot': PARKING_LOT_ID,
+        'occupied_count': car_count,
         'timestamp': datetime.now().isoformat(),
         'device_id': 'camera_sensor_1'
     }
+    if stalls is not None:
+        data['stalls'] = stalls
 
     try:
-        # Send POST request to backend
-        response = requests.post(BACKEND_URL, json=data, timeout=10)
+        # Send POST request to backend with API key
+        headers = {'X-API-Key': API_KEY}
+        response = requests.post(BACKEND_URL, json=data, headers=headers, timeout=10)
 
         if response.status_code == 200:
             print(f"✓ Successfully updated parking lot {PARKING_LOT_ID} with {car_count} cars at {data['timestamp']}")
@@ -93,12 +134,16 @@ def main():
     print(f"Capture interval: {CAPTURE_INTERVAL} seconds")
     print("Press Ctrl+C to stop\n")
 
+    # The camera stays open between captures (see frame_grabber.py)
+    camera = FrameGrabber(CAMERA_INDEX).start()
     try:
         while True:
-            capture_and_process()
+            capture_and_process(camera)
             time.sleep(CAPTURE_INTERVAL)
     except KeyboardInterrupt:
         print("\nStopping parking lot monitoring...")
+    finally:
+        camera.stop()
 
 if __name__ == "__main__":
     main()
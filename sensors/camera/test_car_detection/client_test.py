@@ -1,24 +1,28 @@
+import os
 import cv2
 import requests
 from datetime import datetime
 from ultralytics import YOLO
 
+from stall_map import StallMap
+
 # Configuration
-BACKEND_URL = "https://cs462-parkingapp.onrender.com/updateLotCount"
-API_KEY = "123"
+BACKEND_URL = "https://cs462-parkingapp.onrender.com/setLotOccupancy"
+API_KEY = os.getenv("PARKING_API_KEY", "123")  # this camera's device key
 YOLO_MODEL_PATH = "../../yolo11m.pt"  # Medium YOLO model
 PARKING_LOT_ID = "H"
 TEST_IMAGE_PATH = "psu_parking_lot.jpeg"  # Test image in the same directory
+STALL_MAP_FILE = f"stalls_{PARKING_LOT_ID}.json"  # optional stall polygons for the test image
 
 # Initialize YOLO model
 print("Loading YOLO model...")
 model = YOLO(YOLO_MODEL_PATH)
 print("Model loaded successfully!")
 
-def detect_cars(frame):
+def detect_vehicle_boxes(frame):
     """
     Detect cars in the frame using YOLO
-    Returns the count of detected cars
+    Returns an (N, 4) array of x1, y1, x2, y2 boxes
     """
     # Run YOLO inference with parameters matching car.py for consistency
     results = model.predict(
@@ -33,14 +37,7 @@ def detect_cars(frame):
         verbose=False
     )
 
-    # Count all detected vehicles
-    car_count = 0
-
-    for result in results:
-        boxes = result.boxes
-        car_count += len(boxes)
-
-    return car_count
+    return results[0].boxes.xyxy.cpu().numpy()
 
 def process_test_image():
     """Load test image, detect cars, and send count to backend"""
@@ -57,9 +54,19 @@ def process_test_image():
 
     # Detect cars in the frame
     print("Running car detection...")
-    car_count = detect_cars(frame)
+    boxes = detect_vehicle_boxes(frame)
+    car_count = len(boxes)
     print(f" Detected {car_count} cars in parking lot {PARKING_LOT_ID}")
 
+    # With a stall map, count only cars parked in a stall
+    stalls = None
+    if os.path.exists(STALL_MAP_FILE):
+        stall_map = StallMap.from_file(STALL_MAP_FILE)
+        height, width = frame.shape[:2]
+        stalls = stall_map.occupancy(boxes, (width, height))
+        car_count = sum(stalls.values())
+        print(f" {car_count} of {len(stall_map)} stalls occupied")
+
     # Get current lot capacity from backend first
     print("\nFetching current parking lot data...")
     try:
@@ -84,24 +91,20 @@ def process_test_image():
     except Exception as e:
         print(f"Warning: Could not fetch current lot data: {e}")
 
-    # Calculate delta based on detected cars
-    # For camera sensor, we're setting absolute occupancy, but backend uses delta
+    # For a camera sensor we set absolute occupancy (/setLotOccupancy)
     # So we send the detected count as the new occupied count
     print(f"\nSending update to backend...")
     print(f"Detected occupied spots: {car_count}")
 
     # Prepare the data to send to backend
-    # Note: Based on the backend code, we need to use delta (-1 for entering, +1 for exiting)
-    # For a camera-based absolute count, we would need a different endpoint
-    # For now, let's just demonstrate the update with the detection result
-
     data = {
         'lot': PARKING_LOT_ID,
-        'delta': -1,  # This is just for demonstration
-        'detected_cars': car_count,  # Adding this for information
+        'occupied_count': car_count,
         'timestamp': datetime.now().isoformat(),
         'device_id': 'camera_sensor_test'
     }
+    if stalls is not None:
+        data['stalls'] = stalls
 
     try:
         # Send POST request to backend with API key
@@ -0,0 +1,109 @@
+"""
+Long-lived camera capture with a background frame-grabber thread
+
+The camera is opened once. A background thread calls grab() in a loop,
+which keeps the driver's buffer drained without decoding anything. When the
+detection loop asks for a frame, the thread decodes the next grabbed frame
+and hands the array over by reference through a single slot. Each read
+therefore returns a frame captured after the call: no reopen, no
+auto-exposure settling, and no stale buffered frames. Only frames that are
+actually used get decoded.
+"""
+
+import threading
+
+import cv2
+
+
+class FrameGrabber:
+    """Keeps a camera open and returns fresh frames on demand.
+
+    Use as a context manager, or call start() / stop():
+
+        with FrameGrabber(0) as camera:
+            frame = camera.read()
+    """
+
+    def __init__(self, source=0, width=None, height=None, reopen_delay=2.0):
+        self.source = source
+        self.width = width
+        self.height = height
+        self.reopen_delay = reopen_delay
+
+        self._cond = threading.Condition()
+        self._wanted = False
+        self._frame = None          # the slot: latest decoded frame (not copied)
+        self._frame_seq = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        # Ask the driver to hold as few frames as it can; the loop drains the rest
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        if self.width:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        if self.height:
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        return cap
+
+    def _run(self):
+        cap = None
+        while not self._stop.is_set():
+            if cap is None:
+                cap = self._open()
+                if cap is None:
+                    print(f"Error: Could not open camera {self.source}; retrying in {self.reopen_delay:.0f}s")
+                    self._stop.wait(self.reopen_delay)
+                    continue
+
+            # grab() waits for the next frame, so this loop runs at the camera's frame rate
+            if not cap.grab():
+                print("Error: Camera stopped delivering frames; reopening")
+                cap.release()
+                cap = None
+                continue
+
+            if self._wanted:
+                ok, frame = cap.retrieve()
+                if ok:
+                    with self._cond:
+                        self._frame = frame
+                        self._frame_seq += 1
+                        self._wanted = False
+                        self._cond.notify_all()
+        if cap is not None:
+            cap.release()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="frame-grabber", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5.0)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def read(self, timeout=5.0):
+        """Return a frame captured after this call, or None if none arrived in time.
+
+        The array is handed over without copying; the grabber never writes
+        into it again.
+        """
+        with self._cond:
+            target = self._frame_seq + 1
+            self._wanted = True
+            if not self._cond.wait_for(lambda: self._frame_seq >= target, timeout):
+                return None
+            return self._frame
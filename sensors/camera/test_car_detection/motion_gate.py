@@ -0,0 +1,114 @@
+"""
+Cheap change detection to decide when a frame needs YOLO
+
+Each frame is converted to grayscale, shrunk to a small thumbnail (160 px
+wide by default) and blurred, which costs well under a millisecond. The
+thumbnail is compared with the one from the last frame that went through
+the model. Pixels whose brightness changed by more than `pixel_threshold`
+(after removing any uniform brightness shift, e.g. a cloud or the camera's
+auto exposure) count as changed.
+
+Without regions, the model runs when at least `min_changed` of the
+thumbnail changed. With regions (e.g. the stall map's stall boxes), the
+changed pixels are summed per region from one integral image, and the model
+runs when any single region changed by `region_min_changed`. A car pulling
+into one stall is then caught even though it is a tiny part of the frame,
+while swaying trees outside the stalls are ignored.
+
+Comparing against the last *inferred* frame, not the previous one, means
+slow changes still add up and trigger the model eventually. The model also
+runs at least every `max_skip_seconds` regardless.
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+THUMB_WIDTH = 160
+PIXEL_THRESHOLD = 25        # grey levels (0-255)
+MIN_CHANGED = 0.002         # fraction of the whole thumbnail
+REGION_MIN_CHANGED = 0.05   # fraction of one region
+MAX_SKIP_SECONDS = 300
+
+
+class MotionGate:
+    """Says whether a frame differs enough from the last inferred one.
+
+    `regions` is an optional (N, 4) array of x1, y1, x2, y2 boxes given in
+    an image of `region_size` (width, height); by default, in frame pixels.
+    """
+
+    def __init__(self, regions=None, region_size=None, thumb_width=THUMB_WIDTH,
+                 pixel_threshold=PIXEL_THRESHOLD, min_changed=MIN_CHANGED,
+                 region_min_changed=REGION_MIN_CHANGED, max_skip_seconds=MAX_SKIP_SECONDS):
+        self.regions = None if regions is None else np.asarray(regions, dtype=np.float32).reshape(-1, 4)
+        self.region_size = region_size
+        self.thumb_width = thumb_width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.region_min_changed = region_min_changed
+        self.max_skip_seconds = max_skip_seconds
+
+        self.changed = 0.0          # fraction changed in the last check (largest region's, with regions)
+        self.runs = 0
+        self.skips = 0
+        self._reference = None
+        self._reference_time = 0.0
+        self._thumb_size = None
+        self._region_cells = None   # regions as integer thumbnail coordinates
+        self._region_areas = None
+
+    def _thumbnail(self, frame):
+        height, width = frame.shape[:2]
+        size = (self.thumb_width, max(1, round(height * self.thumb_width / width)))
+        if size != self._thumb_size:
+            self._thumb_size = size
+            self._reference = None
+            self._prepare_regions(width, height)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        thumb = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(thumb, (5, 5), 0).astype(np.int16)
+
+    def _prepare_regions(self, width, height):
+        if self.regions is None or not len(self.regions):
+            self._region_cells = None
+            return
+        region_w, region_h = self.region_size or (width, height)
+        thumb_w, thumb_h = self._thumb_size
+        scale = np.array([thumb_w / region_w, thumb_h / region_h] * 2, dtype=np.float32)
+        cells = self.regions * scale
+        cells[:, :2] = np.floor(cells[:, :2])
+        cells[:, 2:] = np.ceil(cells[:, 2:])
+        cells = cells.astype(np.int32)
+        cells[:, [0, 2]] = np.clip(cells[:, [0, 2]], 0, thumb_w)
+        cells[:, [1, 3]] = np.clip(cells[:, [1, 3]], 0, thumb_h)
+        self._region_cells = cells
+        self._region_areas = np.maximum((cells[:, 2] - cells[:, 0]) * (cells[:, 3] - cells[:, 1]), 1)
+
+    def _changed_fraction(self, thumb):
+        diff = thumb - self._reference
+        diff -= np.int16(np.median(diff))     # ignore a uniform brightness shift
+        mask = (np.abs(diff) > self.pixel_threshold).astype(np.uint8)
+        if self._region_cells is None:
+            return mask.mean(), self.min_changed
+        table = cv2.integral(mask)
+        x1, y1, x2, y2 = self._region_cells.T
+        inside = table[y2, x2] - table[y1, x2] - table[y2, x1] + table[y1, x1]
+        return (inside / self._region_areas).max(), self.region_min_changed
+
+    def should_run(self, frame, now=None):
+        """True if the model should run on `frame`; the frame then becomes the new reference."""
+        now = time.monotonic() if now is None else now
+        thumb = self._thumbnail(frame)
+        if self._reference is None or now - self._reference_time >= self.max_skip_seconds:
+            self.changed = 1.0
+        else:
+            self.changed, needed = self._changed_fraction(thumb)
+            if self.changed < needed:
+                self.skips += 1
+                return False
+        self._reference = thumb
+        self._reference_time = now
+        self.runs += 1
+        return True
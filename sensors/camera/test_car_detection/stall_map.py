@@ -0,0 +1,134 @@
+"""
+Per-stall occupancy from vehicle detections
+
+A stall map describes one camera's view of a lot (stalls_<lot>.json):
+
+    {"lot": "H", "image_size": [1920, 1080],
+     "stalls": [{"id": "H-001", "polygon": [[x, y], [x, y], [x, y], [x, y]]},
+                {"id": "H-002", "box": [x1, y1, x2, y2]}, ...]}
+
+Everything that depends only on the map is computed once when it loads:
+each stall's bounding box, and its polygon rasterized at reduced
+resolution into a small mask, stored as a summed-area table. Matching a
+frame's detections is then a few NumPy operations over the whole
+boxes x stalls grid:
+
+  - IoU of every detection box with every stall's bounding box
+  - coverage: the fraction of every stall's polygon area inside every
+    detection box, read from the summed-area tables with four lookups each
+
+Each detection is assigned to the stall it overlaps best, if it covers
+enough of that stall. Cars driving through the aisle cover no stall and are
+not counted, and one car is never counted in two stalls.
+"""
+
+import json
+
+import cv2
+import numpy as np
+
+MASK_SCALE = 0.25           # stall masks are rasterized at 1/4 resolution
+MIN_COVERAGE = 0.35         # a detection must cover this much of a stall's area
+MIN_IOU = 0.05
+
+
+class StallMap:
+    """Precomputed stall geometry for one camera."""
+
+    def __init__(self, lot, image_size, stalls, mask_scale=MASK_SCALE):
+        self.lot = lot
+        self.image_size = tuple(image_size)             # (width, height)
+        self.ids = [stall["id"] for stall in stalls]
+        self.mask_scale = mask_scale
+
+        polygons = []
+        for stall in stalls:
+            if "polygon" in stall:
+                polygons.append(np.asarray(stall["polygon"], dtype=np.float32))
+            else:
+                x1, y1, x2, y2 = stall["box"]
+                polygons.append(np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]], dtype=np.float32))
+        self.boxes = np.array([[p[:, 0].min(), p[:, 1].min(), p[:, 0].max(), p[:, 1].max()]
+                               for p in polygons], dtype=np.float32)
+
+        # One summed-area table per stall, covering just its bounding box and
+        # padded to a common size so all stalls can be indexed together
+        origins = np.floor(self.boxes[:, :2] * mask_scale).astype(np.int32)
+        ends = np.ceil(self.boxes[:, 2:] * mask_scale).astype(np.int32) + 1
+        sizes = ends - origins                          # (N, 2) as (w, h)
+        height, width = int(sizes[:, 1].max()), int(sizes[:, 0].max())
+        tables = np.zeros((len(polygons), height + 1, width + 1), dtype=np.int32)
+        for i, polygon in enumerate(polygons):
+            mask = np.zeros((height, width), dtype=np.uint8)
+            points = np.round(polygon * mask_scale - origins[i]).astype(np.int32)
+            cv2.fillPoly(mask, [points], 1)
+            tables[i, 1:, 1:] = mask.cumsum(axis=0).cumsum(axis=1)
+        self._origins = origins
+        self._sizes = sizes
+        self._tables = tables
+        self._areas = np.maximum(tables[:, -1, -1], 1)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, "r") as f:
+            data = json.load(f)
+        return cls(data["lot"], data["image_size"], data["stalls"])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def scale_boxes(self, boxes, frame_size):
+        """Convert boxes from a frame of `frame_size` (width, height) to map coordinates."""
+        sx = self.image_size[0] / frame_size[0]
+        sy = self.image_size[1] / frame_size[1]
+        return np.asarray(boxes, dtype=np.float32) * np.array([sx, sy, sx, sy], dtype=np.float32)
+
+    def iou(self, boxes):
+        """(B, N) IoU of each detection box with each stall's bounding box."""
+        b = boxes[:, None, :]
+        s = self.boxes[None, :, :]
+        w = np.clip(np.minimum(b[..., 2], s[..., 2]) - np.maximum(b[..., 0], s[..., 0]), 0, None)
+        h = np.clip(np.minimum(b[..., 3], s[..., 3]) - np.maximum(b[..., 1], s[..., 1]), 0, None)
+        inter = w * h
+        area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+        area_s = (s[..., 2] - s[..., 0]) * (s[..., 3] - s[..., 1])
+        return inter / np.maximum(area_b + area_s - inter, 1e-6)
+
+    def coverage(self, boxes):
+        """(B, N) fraction of each stall's polygon area inside each detection box."""
+        scaled = boxes * self.mask_scale
+        ox, oy = self._origins[:, 0], self._origins[:, 1]
+        w, h = self._sizes[:, 0], self._sizes[:, 1]
+        # Box edges in each stall's local mask coordinates, clipped to the mask
+        x1 = np.clip(np.floor(scaled[:, None, 0]).astype(np.int32) - ox, 0, w)
+        y1 = np.clip(np.floor(scaled[:, None, 1]).astype(np.int32) - oy, 0, h)
+        x2 = np.clip(np.ceil(scaled[:, None, 2]).astype(np.int32) - ox, 0, w)
+        y2 = np.clip(np.ceil(scaled[:, None, 3]).astype(np.int32) - oy, 0, h)
+        t = self._tables
+        n = np.arange(len(self.ids))[None, :]
+        inside = t[n, y2, x2] - t[n, y1, x2] - t[n, y2, x1] + t[n, y1, x1]
+        return inside / self._areas
+
+    def occupied(self, boxes, frame_size=None, min_coverage=MIN_COVERAGE, min_iou=MIN_IOU):
+        """Boolean array, one per stall: is a detection assigned to it?
+
+        `boxes` is (B, 4) x1, y1, x2, y2; pass `frame_size` (width, height)
+        if the frame is not the map's image size.
+        """
+        occupied = np.zeros(len(self.ids), dtype=bool)
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        if not len(boxes) or not len(self.ids):
+            return occupied
+        if frame_size is not None and tuple(frame_size) != self.image_size:
+            boxes = self.scale_boxes(boxes, frame_size)
+        iou = self.iou(boxes)
+        eligible = (self.coverage(boxes) >= min_coverage) & (iou >= min_iou)
+        score = np.where(eligible, iou, -1.0)
+        best = score.argmax(axis=1)
+        matched = score[np.arange(len(boxes)), best] > 0
+        occupied[best[matched]] = True
+        return occupied
+
+    def occupancy(self, boxes, frame_size=None):
+        """{stall id: occupied} for a frame's detection boxes."""
+        return dict(zip(self.ids, self.occupied(boxes, frame_size).tolist()))
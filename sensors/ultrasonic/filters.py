@@ -0,0 +1,95 @@
+# Streaming filters for ultrasonic distance samples
+# Penn State Abington - CMPSC 462 Final Project
+#
+# Every stage keeps a fixed amount of state and does a fixed amount of work
+# per sample, so the monitor can run indefinitely at any sample rate:
+#
+#   RollingMedian     median of the last `window` readings (ring buffer plus
+#                     a sorted copy kept up to date with bisect)
+#   Ewma              optional exponential smoothing after the median
+#   EmptyLaneTracker  slowly follows the empty-lane distance while the lane
+#                     is clear (temperature changes the speed of sound, and
+#                     so the reading, by ~0.2% per degree C)
+
+from bisect import bisect_left, insort
+
+
+class RollingMedian:
+    """Median of the most recent `window` samples."""
+
+    def __init__(self, window):
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        self.window = window
+        self._ring = [None] * window
+        self._pos = 0
+        self._sorted = []
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def update(self, value):
+        """Add a sample, dropping the oldest once full, and return the median."""
+        old = self._ring[self._pos]
+        if old is not None:
+            del self._sorted[bisect_left(self._sorted, old)]
+        self._ring[self._pos] = value
+        self._pos = (self._pos + 1) % self.window
+        insort(self._sorted, value)
+        return self.median()
+
+    def median(self):
+        s = self._sorted
+        n = len(s)
+        if not n:
+            return None
+        mid = n // 2
+        return s[mid] if n % 2 else (s[mid - 1] + s[mid]) / 2.0
+
+
+class Ewma:
+    """Exponentially weighted moving average; alpha=1 passes samples through."""
+
+    def __init__(self, alpha):
+        if not 0.0 < alpha <= 1.0:
+            raise ValueError("alpha must be in (0, 1]")
+        self.alpha = alpha
+        self.value = None
+
+    def update(self, value):
+        if self.value is None:
+            self.value = value
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+
+class DistanceFilter:
+    """Rolling median, then optional EWMA smoothing (ewma_alpha=None turns it off)."""
+
+    def __init__(self, window, ewma_alpha=None):
+        self.median = RollingMedian(window)
+        self.ewma = Ewma(ewma_alpha) if ewma_alpha else None
+
+    def update(self, cm):
+        value = self.median.update(cm)
+        return self.ewma.update(value) if self.ewma else value
+
+
+class EmptyLaneTracker:
+    """Running estimate of the empty-lane distance.
+
+    Only readings within `tolerance` cm of the current estimate are used,
+    so cars (and timeouts) never pull it; those readings move it with a
+    slow EWMA of weight `alpha`.
+    """
+
+    def __init__(self, empty_cm, tolerance, alpha=0.005):
+        self.empty_cm = empty_cm
+        self.tolerance = tolerance
+        self.alpha = alpha
+
+    def update(self, cm):
+        if abs(cm - self.empty_cm) <= self.tolerance:
+            self.empty_cm += self.alpha * (cm - self.empty_cm)
+        return self.empty_cm
@@ -0,0 +1,175 @@
+# Small GPIO abstraction for the ultrasonic sensors
+# Penn State Abington - CMPSC 462 Final Project
+#
+# The ranging code only needs two things from the hardware: send a short
+# trigger pulse, and get a callback with a timestamp on every edge of the
+# echo pin (setup_sensor(trig, echo, on_edge) and trigger(trig)). Three
+# backends provide them:
+#
+#   PigpioGPIO     pigpio daemon; edge times come from its DMA sampler (~1 us)
+#   RPiGPIO        RPi.GPIO; edge times are taken in its callback thread
+#   SimulatedGPIO  no hardware; echo edges are generated from a distance
+#                  function, so the monitor runs on any Linux box
+#
+# Edge callbacks are called as callback(level, timestamp_ns), where level is
+# 1 for a rising edge and 0 for a falling one. Timestamps are monotonic
+# nanoseconds; only differences between them mean anything.
+
+import heapq
+import threading
+import time
+
+try:
+    import pigpio
+except ImportError:  # optional; RPi.GPIO or the simulator are used instead
+    pigpio = None
+
+try:
+    import RPi.GPIO as RPi_GPIO
+except (ImportError, RuntimeError):  # RuntimeError when not on a Pi
+    RPi_GPIO = None
+
+SPEED_OF_SOUND_CM_S = 34300.0
+TRIGGER_PULSE_S = 0.00001           # 10 us, per the HC-SR04 datasheet
+
+
+class PigpioGPIO:
+    """pigpio backend: hardware-timed trigger pulses and DMA-sampled edge ticks."""
+
+    def __init__(self, host="localhost"):
+        self.pi = pigpio.pi(host)
+        if not self.pi.connected:
+            raise RuntimeError("Cannot connect to pigpiod (start it with 'sudo pigpiod')")
+        self._callbacks = []
+
+    def setup_sensor(self, trig, echo, callback):
+        self.pi.set_mode(trig, pigpio.OUTPUT)
+        self.pi.write(trig, 0)
+        self.pi.set_mode(echo, pigpio.INPUT)
+
+        # Ticks are microseconds that wrap every 2^32; unwrap them so the
+        # timestamps keep increasing like the other backends'
+        state = {"last": None, "base": 0}
+
+        def on_edge(gpio, level, tick):
+            if level > 1:
+                return   # watchdog timeout, not an edge
+            if state["last"] is not None and tick < state["last"]:
+                state["base"] += 1 << 32
+            state["last"] = tick
+            callback(level, (state["base"] + tick) * 1000)
+        self._callbacks.append(self.pi.callback(echo, pigpio.EITHER_EDGE, on_edge))
+
+    def trigger(self, pin):
+        self.pi.gpio_trigger(pin, int(TRIGGER_PULSE_S * 1e6), 1)
+
+    def close(self):
+        for cb in self._callbacks:
+            cb.cancel()
+        self.pi.stop()
+
+
+class RPiGPIO:
+    """RPi.GPIO backend: edges are timestamped in RPi.GPIO's callback thread."""
+
+    def __init__(self):
+        RPi_GPIO.setmode(RPi_GPIO.BCM)
+
+    def setup_sensor(self, trig, echo, callback):
+        RPi_GPIO.setup(trig, RPi_GPIO.OUT, initial=RPi_GPIO.LOW)
+        RPi_GPIO.setup(echo, RPi_GPIO.IN)
+
+        def on_edge(channel):
+            now = time.monotonic_ns()
+            callback(RPi_GPIO.input(channel), now)
+        RPi_GPIO.add_event_detect(echo, RPi_GPIO.BOTH, callback=on_edge)
+
+    def trigger(self, pin):
+        RPi_GPIO.output(pin, True)
+        time.sleep(TRIGGER_PULSE_S)
+        RPi_GPIO.output(pin, False)
+
+    def close(self):
+        RPi_GPIO.cleanup()
+
+
+class SimulatedGPIO:
+    """Generates HC-SR04-style echo pulses from `distance(trig_pin, t)` -> cm or None.
+
+    None means nothing in range, which the real sensor reports as a ~38 ms
+    pulse. Echoes are delivered from one background thread, like RPi.GPIO's
+    callback thread.
+    """
+
+    ECHO_DELAY_S = 0.0005           # burst of 8 cycles at 40 kHz before the echo pin rises
+    NO_ECHO_PULSE_S = 0.038
+
+    def __init__(self, distance):
+        self.distance = distance
+        self._echo_pins = {}                    # trig pin -> echo pin
+        self._watchers = {}                     # echo pin -> callback
+        self._events = []                       # heap of (due_ns, seq, echo pin, level)
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="sim-gpio", daemon=True)
+        self._thread.start()
+
+    def setup_sensor(self, trig, echo, callback):
+        self._echo_pins[trig] = echo
+        self._watchers[echo] = callback
+
+    def trigger(self, pin):
+        now = time.monotonic_ns()
+        cm = self.distance(pin, now / 1e9)
+        width = self.NO_ECHO_PULSE_S if cm is None else 2.0 * cm / SPEED_OF_SOUND_CM_S
+        rise = now + int((TRIGGER_PULSE_S + self.ECHO_DELAY_S) * 1e9)
+        echo = self._echo_pins[pin]
+        with self._cond:
+            for due, level in ((rise, 1), (rise + int(width * 1e9), 0)):
+                self._seq += 1
+                heapq.heappush(self._events, (due, self._seq, echo, level))
+            self._cond.notify()
+
+    def _run(self):
+        with self._cond:
+            while not self._closed:
+                if not self._events:
+                    self._cond.wait()
+                    continue
+                delay = (self._events[0][0] - time.monotonic_ns()) / 1e9
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                due, _, pin, level = heapq.heappop(self._events)
+                callback = self._watchers.get(pin)
+                if callback:
+                    # Report the scheduled time, as a hardware timestamp would
+                    self._cond.release()
+                    try:
+                        callback(level, due)
+                    finally:
+                        self._cond.acquire()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=1.0)
+
+
+def open_gpio(simulate=None):
+    """Best available backend: pigpio, then RPi.GPIO.
+
+    Pass a distance function as `simulate` to get a SimulatedGPIO instead.
+    """
+    if simulate is not None:
+        return SimulatedGPIO(simulate)
+    if pigpio is not None:
+        try:
+            return PigpioGPIO()
+        except RuntimeError as e:
+            print(f"{e}; falling back to RPi.GPIO")
+    if RPi_GPIO is not None:
+        return RPiGPIO()
+    raise RuntimeError("No GPIO library available; install pigpio or RPi.GPIO, or run with --simulate")
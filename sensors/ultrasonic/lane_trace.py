@@ -0,0 +1,170 @@
+# Recorded ultrasonic traces: compact binary format, replay and scoring
+# Penn State Abington - CMPSC 462 Final Project
+#
+# A trace file is a header followed by fixed-size little-endian records, so
+# it can be memory-mapped and decoded with struct.iter_unpack without
+# parsing:
+#
+#   header   "USTR", version (u16), lane count (u16), start time (f64, epoch s),
+#            then one 16-byte zero-padded name per lane
+#   record   time since start (u32, ms), lane index (u16), raw distance (f32, cm)
+#
+# Ground-truth IN/OUT labels go in a JSON sidecar, <trace>.labels.json:
+#   [{"t": 12.4, "lane": "in-1", "event": "IN"}, ...]
+#
+# replay() runs the same calibration, filter and zone/latch logic as the live
+# monitor (lanes.LaneCounter) over a trace, as fast as the CPU allows.
+
+import json
+import mmap
+import os
+import struct
+import time
+
+from filters import RollingMedian
+from lanes import LaneCounter
+
+MAGIC = b"USTR"
+VERSION = 1
+HEADER = struct.Struct("<4sHHd")
+NAME_BYTES = 16
+RECORD = struct.Struct("<IHf")
+FLUSH_RECORDS = 256
+
+
+def labels_path(path):
+    return f"{path}.labels.json"
+
+
+class TraceWriter:
+    """Appends raw readings (and optional labels) while the monitor runs."""
+
+    def __init__(self, path, lane_names):
+        self.path = path
+        self.lane_names = list(lane_names)
+        self.start = time.monotonic()
+        self.labels = []
+        self._buffer = bytearray()
+        self._count = 0
+        self._file = open(path, "wb")
+        self._file.write(HEADER.pack(MAGIC, VERSION, len(self.lane_names), time.time()))
+        for name in self.lane_names:
+            self._file.write(name.encode()[:NAME_BYTES].ljust(NAME_BYTES, b"\0"))
+
+    def _elapsed_ms(self):
+        return int((time.monotonic() - self.start) * 1000)
+
+    def write(self, lane_index, cm):
+        self._buffer += RECORD.pack(self._elapsed_ms(), lane_index, cm)
+        self._count += 1
+        if self._count % FLUSH_RECORDS == 0:
+            self.flush()
+
+    def label(self, lane_name, event):
+        """Mark a real IN/OUT at the current time (ground truth for sweeps)."""
+        self.labels.append({"t": self._elapsed_ms() / 1000.0, "lane": lane_name, "event": event})
+
+    def flush(self):
+        self._file.write(self._buffer)
+        self._file.flush()
+        self._buffer.clear()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+        if self.labels:
+            with open(labels_path(self.path), "w") as f:
+                json.dump(self.labels, f, indent=1)
+
+
+class Trace:
+    """A memory-mapped trace file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, lanes, self.start_time = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} ultrasonic trace")
+        self.lane_names = [self._mmap[HEADER.size + i * NAME_BYTES:HEADER.size + (i + 1) * NAME_BYTES]
+                           .rstrip(b"\0").decode() for i in range(lanes)]
+        self._data_offset = HEADER.size + lanes * NAME_BYTES
+        # Ignore a torn last record from a power cut
+        self.record_count = (len(self._mmap) - self._data_offset) // RECORD.size
+
+    def __len__(self):
+        return self.record_count
+
+    def records(self):
+        """Iterate (ms, lane index, cm) straight from the mapping."""
+        end = self._data_offset + self.record_count * RECORD.size
+        return RECORD.iter_unpack(memoryview(self._mmap)[self._data_offset:end])
+
+    def lanes(self):
+        """{lane name: ([ms...], [cm...])}, split once so replays can reuse it."""
+        split = {name: ([], []) for name in self.lane_names}
+        columns = [split[name] for name in self.lane_names]
+        for ms, lane, cm in self.records():
+            times, values = columns[lane]
+            times.append(ms)
+            values.append(cm)
+        return split
+
+    def labels(self):
+        path = labels_path(self.path)
+        if not os.path.exists(path):
+            return []
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def close(self):
+        self._mmap.close()
+
+
+def replay_lane(times, values, tuning, calibration_seconds=3.0):
+    """Run one lane's samples through calibration and a LaneCounter.
+
+    Returns [(seconds, 'IN' | 'OUT')].
+    """
+    calibration_ms = calibration_seconds * 1000
+    n = 0
+    while n < len(times) and times[n] - times[0] < calibration_ms:
+        n += 1
+    samples = RollingMedian(max(1, n))
+    for cm in values[:n]:
+        samples.update(cm)
+    lane = LaneCounter("replay", tuning, samples.median() if len(samples) else 300.0)
+    update = lane.update
+    events = []
+    for ms, cm in zip(times[n:], values[n:]):
+        event = update(cm)
+        if event:
+            events.append((ms / 1000.0, event))
+    return events
+
+
+def replay(trace_lanes, tuning, calibration_seconds=3.0):
+    """Replay every lane of `Trace.lanes()`; returns {lane name: [(seconds, event)]}."""
+    return {name: replay_lane(times, values, tuning, calibration_seconds)
+            for name, (times, values) in trace_lanes.items()}
+
+
+def score_events(events, labels, tolerance=2.0):
+    """Match detected events to labels of the same lane and kind within `tolerance`
+    seconds. Returns (true positives, false positives, false negatives)."""
+    tp = fp = 0
+    remaining = {}
+    for label in labels:
+        remaining.setdefault((label["lane"], label["event"]), []).append(label["t"])
+    for lane, detected in events.items():
+        for t, event in detected:
+            candidates = remaining.get((lane, event), [])
+            best = min(candidates, key=lambda lt: abs(lt - t), default=None)
+            if best is not None and abs(best - t) <= tolerance:
+                candidates.remove(best)
+                tp += 1
+            else:
+                fp += 1
+    fn = sum(len(times) for times in remaining.values())
+    return tp, fp, fn
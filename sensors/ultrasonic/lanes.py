@@ -0,0 +1,174 @@
+# Lane counting state machines and a multi-lane ultrasonic controller
+# Penn State Abington - CMPSC 462 Final Project
+#
+# LaneCounter is the zone + latch logic from the original single-lane
+# monitor, with its own filter, empty-lane estimate and counters, so any
+# number of lanes can run side by side (or be replayed from a trace).
+#
+# MultiLaneController drives many TRIG/ECHO pairs from one thread. Sensors
+# are listed in physical order and split into `groups` ping groups
+# (lane i is in group i % groups), so neighbouring sensors never ping at the
+# same time and cannot hear each other's echoes. Each time slot pings every
+# sensor of one group at once, waits for their echoes together, then leaves
+# the rest of the slot for stray echoes to die down. A lane is sampled once
+# per cycle of `groups` slots however many lanes there are, so total samples
+# per second grow with the lane count.
+
+import threading
+import time
+
+from filters import DistanceFilter, EmptyLaneTracker, RollingMedian
+from ranging import EchoRanger
+
+
+class LaneTuning:
+    """Thresholds for one lane (see monitor.py for what each one means)."""
+
+    def __init__(self, near_max_cm, far_band_cm, empty_tolerance_cm,
+                 enter_confirm_samples, clear_confirm_samples,
+                 median_count=3, ewma_alpha=None, empty_track_alpha=0.005):
+        self.near_max_cm = near_max_cm
+        self.far_band_cm = far_band_cm
+        self.empty_tolerance_cm = empty_tolerance_cm
+        self.enter_confirm_samples = enter_confirm_samples
+        self.clear_confirm_samples = clear_confirm_samples
+        self.median_count = median_count
+        self.ewma_alpha = ewma_alpha
+        self.empty_track_alpha = empty_track_alpha
+
+
+def classify_zone(d, empty_cm, tuning):
+    """Return 'NEAR', 'FAR', or 'CLEAR'."""
+    if d < tuning.near_max_cm:
+        return "NEAR"
+    # FAR zone is just short of the empty distance, at the far edge of the lane;
+    # the empty distance itself (within empty_tolerance_cm) is the clear lane
+    if empty_cm - tuning.far_band_cm <= d < empty_cm - tuning.empty_tolerance_cm:
+        return "FAR"
+    return "CLEAR"
+
+
+class LaneCounter:
+    """One lane's filter and zone/latch state machine. NEAR => IN, FAR => OUT."""
+
+    def __init__(self, name, tuning, empty_cm, lot=None):
+        self.name = name
+        self.lot = lot
+        self.tuning = tuning
+        self.filter = DistanceFilter(tuning.median_count, tuning.ewma_alpha)
+        self.empty_lane = EmptyLaneTracker(empty_cm, tuning.empty_tolerance_cm,
+                                           tuning.empty_track_alpha)
+        self.in_count = 0
+        self.out_count = 0
+        self.distance = None
+        self.zone = "CLEAR"
+        self.consecutive_in_zone = 0
+        self.consecutive_clear = tuning.clear_confirm_samples  # start 'cleared'
+        self.latched = False                                  # prevents double counts until we clear
+
+    @property
+    def empty_cm(self):
+        return self.empty_lane.empty_cm
+
+    def update(self, raw_cm):
+        """Feed one raw reading; returns 'IN', 'OUT' or None."""
+        tuning = self.tuning
+        d = self.distance = self.filter.update(raw_cm)
+        z = self.zone = classify_zone(d, self.empty_lane.empty_cm, tuning)
+
+        if z == "CLEAR":
+            self.empty_lane.update(d)
+            self.consecutive_clear += 1
+            self.consecutive_in_zone = 0
+            # Once we've been CLEAR long enough, release the latch
+            if self.consecutive_clear >= tuning.clear_confirm_samples:
+                self.latched = False
+            return None
+
+        self.consecutive_clear = 0
+        self.consecutive_in_zone += 1
+        # Count only on first confirmed entry into a zone after being CLEAR
+        if not self.latched and self.consecutive_in_zone >= tuning.enter_confirm_samples:
+            self.latched = True
+            if z == "NEAR":
+                self.in_count += 1
+                return "IN"
+            self.out_count += 1
+            return "OUT"
+        return None
+
+
+class MultiLaneController:
+    """Samples many lanes from one thread on a crosstalk-free ping schedule.
+
+    `sensors` is a list of (name, trig, echo, lot) in physical order.
+    `on_event(lane, event)` is called for every IN/OUT, and
+    `on_reading(lane index, cm)` for every raw reading (e.g. a TraceWriter).
+    """
+
+    def __init__(self, gpio, sensors, tuning, slot_seconds, groups=2,
+                 echo_timeout=0.03, on_event=None, on_reading=None):
+        self.gpio = gpio
+        self.tuning = tuning
+        self.slot_seconds = max(slot_seconds, echo_timeout)
+        self.on_event = on_event
+        self.on_reading = on_reading
+        self.rangers = []
+        self.lanes = []
+        for name, trig, echo, lot in sensors:
+            self.rangers.append(EchoRanger(gpio, trig, echo, timeout=echo_timeout))
+            self.lanes.append(LaneCounter(name, tuning, empty_cm=None, lot=lot))
+        groups = max(1, min(groups, len(self.lanes)))
+        self.groups = [list(range(g, len(self.lanes), groups)) for g in range(groups)]
+        self.samples = 0
+        self._stop = threading.Event()
+
+    @property
+    def cycle_seconds(self):
+        """Time between two readings of the same lane."""
+        return self.slot_seconds * len(self.groups)
+
+    def _slots(self):
+        """Yield each group's readings as [(lane index, cm)], one slot at a time."""
+        next_slot = time.monotonic()
+        while not self._stop.is_set():
+            for group in self.groups:
+                for i in group:
+                    self.rangers[i].ping()
+                readings = [(i, self.rangers[i].result()) for i in group]
+                if self.on_reading:
+                    for i, cm in readings:
+                        self.on_reading(i, cm)
+                yield readings
+                next_slot += self.slot_seconds
+                delay = next_slot - time.monotonic()
+                if delay > 0:
+                    self._stop.wait(delay)
+                else:
+                    next_slot = time.monotonic()   # fell behind; don't try to catch up
+
+    def calibrate(self, seconds):
+        """Learn every lane's empty distance at once (keep the lanes clear)."""
+        cycles = max(1, int(seconds / self.cycle_seconds))
+        medians = [RollingMedian(cycles) for _ in self.lanes]
+        deadline = time.monotonic() + seconds
+        for readings in self._slots():
+            for i, cm in readings:
+                medians[i].update(cm)
+            if time.monotonic() >= deadline:
+                break
+        for lane, samples in zip(self.lanes, medians):
+            lane.empty_lane.empty_cm = samples.median() if len(samples) else 300.0
+
+    def run(self):
+        """Sample all lanes until stop() is called."""
+        for readings in self._slots():
+            for i, cm in readings:
+                lane = self.lanes[i]
+                event = lane.update(cm)
+                if event and self.on_event:
+                    self.on_event(lane, event)
+            self.samples += len(readings)
+
+    def stop(self):
+        self._stop.set()
@@ -1,132 +1,175 @@
-# Single ultrasonic lane monitor (no state machine):
-# NEAR => car entering (IN), FAR (near empty distance) => car exiting (OUT)
+# Ultrasonic lane monitor, one sensor per lane:
+# NEAR => car entering (IN), FAR (just short of empty distance) => car exiting (OUT)
 # Author: you+me :)
-
-import RPi.GPIO as GPIO
+#
+# Readings are edge-timed (ranging.py) through gpio_hal.py, which uses pigpio or
+# RPi.GPIO on a Pi. Run with --simulate to try it on any machine. Any number of
+# lanes run from this one process (see lanes.py and LANES_FILE).
+
+import argparse
+import json
+import os
+import random
+import threading
 import time
-from statistics import median
+
+from gpio_hal import open_gpio
+from lane_trace import TraceWriter
+from lanes import LaneTuning, MultiLaneController
+from lanes import classify_zone as classify_lane_zone
+from ranging import ECHO_TIMEOUT_S
+from uploader import LaneUploader
 
 # ---------------- Pins ----------------
-TRIG, ECHO = 23, 24
+TRIG, ECHO = 23, 24              # single lane, when there is no LANES_FILE
+
+# Several lanes: a JSON list in physical order (neighbours never ping together), e.g.
+#   [{"name": "in-1", "trig": 23, "echo": 24, "lot": "H"},
+#    {"name": "out-1", "trig": 17, "echo": 27, "lot": "H"}]
+LANES_FILE = os.getenv("ULTRASONIC_LANES_FILE", "lanes.json")
+PING_GROUPS = 2                  # sensors i and i+1 are always in different groups
 
 # ---------------- Tuning ----------------
-SAMPLE_INTERVAL = 0.04           # seconds between reads
-MEDIAN_COUNT = 3                 # median-of-N for stability
+SAMPLE_INTERVAL = 0.04           # seconds between reads of a lane (longer if the echoes need it)
+MEDIAN_COUNT = 3                 # rolling median over the last N reads, for stability
+EWMA_ALPHA = None                # extra smoothing after the median (e.g. 0.5); None = off
 CALIBRATION_SECONDS = 3.0        # time to learn empty-lane distance
 
 # NEAR zone: very close (e.g., car hugging right-hand side when entering)
 NEAR_MAX_CM = 100.0              # anything closer than this = NEAR (tweak to your curb offset)
 
-# FAR zone: cluster around the empty-lane distance across to the opposite edge
-FAR_BAND_CM = 60.0               # +/- band around empty distance for FAR zone (tweak)
+# FAR zone: cluster just short of the empty-lane distance (car near the opposite edge)
+FAR_BAND_CM = 60.0               # band below the empty distance for FAR zone (tweak)
+
+# Empty lane: readings this close to the empty distance are the lane itself (CLEAR)
+EMPTY_TOLERANCE_CM = 15.0
+EMPTY_TRACK_ALPHA = 0.005        # how fast the empty distance follows drift while CLEAR
 
 # Debounce/hysteresis
 ENTER_CONFIRM_SAMPLES = 3        # require N consecutive samples inside a zone to count
 CLEAR_CONFIRM_SAMPLES = 5        # require N consecutive "clear" samples to reset counting latch
-MAX_DISTANCE_CM = 10000.0        # sentinel for timeouts/out-of-range
-
-# ---------------- GPIO setup ----------------
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(TRIG, GPIO.OUT, initial=GPIO.LOW)
-GPIO.setup(ECHO, GPIO.IN)
-
-def distance_cm(timeout=0.03):
-    # 10us pulse
-    GPIO.output(TRIG, False)
-    time.sleep(0.000002)
-    GPIO.output(TRIG, True)
-    time.sleep(0.000010)
-    GPIO.output(TRIG, False)
-
-    # wait for echo start
-    t0 = time.time()
-    while GPIO.input(ECHO) == 0:
-        if time.time() - t0 > timeout:
-            return MAX_DISTANCE_CM
-    pulse_start = time.time()
-
-    # wait for echo end
-    while GPIO.input(ECHO) == 1:
-        if time.time() - pulse_start > timeout:
-            return MAX_DISTANCE_CM
-    pulse_end = time.time()
-
-    dur = pulse_end - pulse_start
-    return (dur * 343.0 * 100.0) / 2.0  # m/s -> cm (round trip /2)
-
-def median_cm(n=MEDIAN_COUNT):
-    return median(distance_cm() for _ in range(n))
-
-def calibrate_empty():
-    print(f"Calibrating for {CALIBRATION_SECONDS:.1f}s… keep the lane clear.")
-    t_end = time.time() + CALIBRATION_SECONDS
-    samples = []
-    while time.time() < t_end:
-        samples.append(median_cm())
-        time.sleep(SAMPLE_INTERVAL)
-    empty = median(samples) if samples else 300.0
-    print(f"Empty-lane distance ≈ {empty:.0f} cm")
-    return empty
+
+# ---------------- Reporting ----------------
+BACKEND_URL = os.getenv("PARKING_BACKEND_URL", "https://cs462-parkingapp.onrender.com")
+API_KEY = os.getenv("PARKING_API_KEY", "123")          # this sensor's device key
+PARKING_LOT_ID = os.getenv("PARKING_LOT_ID", "H")
+DEVICE_ID = os.getenv("PARKING_DEVICE_ID", "ultrasonic-h1")
+REPORT_INTERVAL = 2.0            # seconds; IN/OUT events are sent as one net delta
+# Unsent deltas, kept across outages and restarts; next to this script so the
+# spool and its saved seq are found whatever directory the monitor starts from
+SPOOL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ultrasonic_spool.jsonl")
+
+# ---------------- Simulation ----------------
+SIM_EMPTY_CM = 300.0             # simulated lane width
+SIM_CAR_EVERY_S = 8.0            # a car passes this often...
+SIM_CAR_SECONDS = 1.0            # ...and blocks the beam this long, alternating IN and OUT
+
+def simulated_lane(trig, t):
+    """Distance seen by a simulated sensor: an empty lane with a car now and then."""
+    cycle, phase = divmod(t + trig * 1.3, SIM_CAR_EVERY_S)   # lanes out of step
+    if phase < SIM_CAR_SECONDS:
+        # Entering cars hug the sensor side, exiting cars pass near the far edge
+        d = 60.0 if int(cycle) % 2 == 0 else SIM_EMPTY_CM - 40.0
+    else:
+        d = SIM_EMPTY_CM
+    return d + random.gauss(0.0, 2.0)
+
+# ---------------- Lanes ----------------
+TUNING = LaneTuning(NEAR_MAX_CM, FAR_BAND_CM, EMPTY_TOLERANCE_CM,
+                    ENTER_CONFIRM_SAMPLES, CLEAR_CONFIRM_SAMPLES,
+                    MEDIAN_COUNT, EWMA_ALPHA, EMPTY_TRACK_ALPHA)
 
 def classify_zone(d, empty_cm):
     """Return 'NEAR', 'FAR', or 'CLEAR'."""
-    if d < NEAR_MAX_CM:
-        return "NEAR"
-    # FAR zone is near the empty distance across to the far edge of the lane
-    if abs(d - empty_cm) <= FAR_BAND_CM:
-        return "FAR"
-    return "CLEAR"
+    return classify_lane_zone(d, empty_cm, TUNING)
+
+def load_lanes():
+    """[(name, trig, echo, lot)] from LANES_FILE, or the single TRIG/ECHO lane."""
+    if not os.path.exists(LANES_FILE):
+        return [("lane", TRIG, ECHO, PARKING_LOT_ID)]
+    with open(LANES_FILE, "r") as f:
+        lanes = json.load(f)
+    return [(lane["name"], lane["trig"], lane["echo"], lane.get("lot", PARKING_LOT_ID))
+            for lane in lanes]
+
+def read_labels(recorder, default_lane):
+    """Label a recording from the keyboard: 'in [lane]' / 'out [lane]' per line."""
+    while True:
+        try:
+            line = input()
+        except EOFError:
+            return   # no keyboard (nohup, systemd, < /dev/null); record without labels
+        words = line.split()
+        if words and words[0].upper() in ("IN", "OUT"):
+            lane = words[1] if len(words) > 1 else default_lane
+            recorder.label(lane, words[0].upper())
+            print(f"Labeled {words[0].upper()} on {lane}")
 
 def main():
-    empty_cm = calibrate_empty()
-    in_count = 0
-    out_count = 0
-
-    zone = "CLEAR"
-    consecutive_in_zone = 0
-    consecutive_clear = CLEAR_CONFIRM_SAMPLES  # start 'cleared'
-    latched = False                            # prevents double counts until we clear
+    parser = argparse.ArgumentParser(description="Ultrasonic lane monitor")
+    parser.add_argument("--simulate", action="store_true",
+                        help="use a simulated sensor instead of the GPIO pins")
+    parser.add_argument("--no-report", action="store_true",
+                        help="only print counts; do not send them to the backend")
+    parser.add_argument("--record", metavar="PATH",
+                        help="save raw readings to a trace file for replay and sweep.py; "
+                             "type 'in [lane]' or 'out [lane]' + Enter as cars pass to label it")
+    args = parser.parse_args()
+
+    uploader = None
+    if not args.no_report:
+        uploader = LaneUploader(BACKEND_URL, API_KEY, PARKING_LOT_ID, DEVICE_ID, SPOOL_FILE,
+                                interval=REPORT_INTERVAL)
+        uploader.start()
+
+    def on_event(lane, event):
+        if uploader:
+            # IN takes a space, OUT frees one
+            uploader.record(-1 if event == "IN" else +1, lane.lot)
+
+    sensors = load_lanes()
+    gpio = open_gpio(simulated_lane if args.simulate else None)
+    recorder = TraceWriter(args.record, [name for name, _, _, _ in sensors]) if args.record else None
+    groups = min(PING_GROUPS, len(sensors))
+    controller = MultiLaneController(gpio, sensors, TUNING, SAMPLE_INTERVAL / groups,
+                                     groups=groups, echo_timeout=ECHO_TIMEOUT_S, on_event=on_event,
+                                     on_reading=recorder.write if recorder else None)
+
+    print(f"Calibrating {len(sensors)} lane(s) for {CALIBRATION_SECONDS:.1f}s… keep the lanes clear.")
+    controller.calibrate(CALIBRATION_SECONDS)
+    for lane in controller.lanes:
+        print(f"{lane.name}: empty-lane distance ≈ {lane.empty_cm:.0f} cm")
 
     print("Monitoring… (NEAR=IN, FAR=OUT)")
-    print(f"NEAR< {NEAR_MAX_CM:.0f} cm | FAR≈ {empty_cm:.0f}±{FAR_BAND_CM:.0f} cm")
-    last_log = time.time()
+    print(f"NEAR< {NEAR_MAX_CM:.0f} cm | FAR up to {FAR_BAND_CM:.0f} cm short of empty | "
+          f"each lane every {controller.cycle_seconds * 1000:.0f} ms")
+    sampler = threading.Thread(target=controller.run, name="lanes", daemon=True)
+    sampler.start()
+    if recorder:
+        threading.Thread(target=read_labels, args=(recorder, sensors[0][0]), daemon=True).start()
 
     try:
+        # Light logging every ~0.5s
         while True:
-            d = median_cm()
-            z = classify_zone(d, empty_cm)
-
-            if z == "CLEAR":
-                consecutive_clear += 1
-                consecutive_in_zone = 0
-                # Once we've been CLEAR long enough, release the latch
-                if consecutive_clear >= CLEAR_CONFIRM_SAMPLES:
-                    latched = False
-            else:
-                consecutive_clear = 0
-                consecutive_in_zone += 1
-
-                # Count only on first confirmed entry into a zone after being CLEAR
-                if not latched and consecutive_in_zone >= ENTER_CONFIRM_SAMPLES:
-                    if z == "NEAR":
-                        in_count += 1
-                        latched = True
-                    elif z == "FAR":
-                        out_count += 1
-                        latched = True
-
-            # Light logging every ~0.5s
-            now = time.time()
-            if now - last_log > 0.5:
-                last_log = now
-                print(f"d={d:5.0f}cm  zone={z:<5}  IN={in_count}  OUT={out_count}  latched={int(latched)}")
-
-            time.sleep(SAMPLE_INTERVAL)
+            time.sleep(0.5)
+            for lane in controller.lanes:
+                if lane.distance is None:
+                    continue
+                print(f"{lane.name:<8} d={lane.distance:5.0f}cm  zone={lane.zone:<5}  "
+                      f"IN={lane.in_count}  OUT={lane.out_count}  "
+                      f"latched={int(lane.latched)}  empty={lane.empty_cm:.0f}cm")
 
     except KeyboardInterrupt:
         pass
     finally:
-        GPIO.cleanup()
+        controller.stop()
+        sampler.join(timeout=1.0)
+        if uploader:
+            uploader.stop()
+        if recorder:
+            recorder.close()
+            print(f"Saved {args.record}")
+        gpio.close()
 
 if __name__ == "__main__":
     main()
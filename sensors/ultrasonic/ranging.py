@@ -0,0 +1,63 @@
+# Edge-timed ultrasonic ranging (HC-SR04 style sensors)
+# Penn State Abington - CMPSC 462 Final Project
+#
+# Instead of spinning on the echo pin, a reading sends the trigger pulse and
+# sleeps on an Event. The GPIO backend (see gpio_hal.py) calls back on both
+# echo edges with a monotonic timestamp. The rising edge records the start,
+# and the falling edge computes the distance and wakes the waiter. The CPU is
+# idle while the sound travels, and the pulse width comes from edge
+# timestamps rather than from when a polling loop happened to notice the pin.
+
+import threading
+
+from gpio_hal import SPEED_OF_SOUND_CM_S
+
+MAX_DISTANCE_CM = 10000.0           # sentinel for timeouts/out-of-range
+ECHO_TIMEOUT_S = 0.03               # longest echo we wait for (~5 m round trip)
+
+
+class EchoRanger:
+    """One TRIG/ECHO sensor pair, read through edge callbacks."""
+
+    def __init__(self, gpio, trig, echo, timeout=ECHO_TIMEOUT_S):
+        self.gpio = gpio
+        self.trig = trig
+        self.echo = echo
+        self.timeout = timeout
+        self._done = threading.Event()
+        self._rise_ns = None
+        self._distance = MAX_DISTANCE_CM
+        self._pinging = False
+        gpio.setup_sensor(trig, echo, self._on_edge)
+
+    def _on_edge(self, level, timestamp_ns):
+        if not self._pinging:
+            return   # a late edge from a ping we already gave up on
+        if level:
+            self._rise_ns = timestamp_ns
+        elif self._rise_ns is not None:
+            seconds = (timestamp_ns - self._rise_ns) / 1e9
+            self._distance = (seconds * SPEED_OF_SOUND_CM_S / 2.0
+                              if seconds <= self.timeout else MAX_DISTANCE_CM)
+            self._pinging = False
+            self._done.set()
+
+    def ping(self):
+        """Send a trigger pulse without waiting; collect the result with result()."""
+        self._done.clear()
+        self._rise_ns = None
+        self._distance = MAX_DISTANCE_CM
+        self._pinging = True
+        self.gpio.trigger(self.trig)
+
+    def result(self):
+        """Distance in cm for the last ping, or MAX_DISTANCE_CM if no echo came back."""
+        # Allow for the trigger burst before the echo pin rises
+        if not self._done.wait(self.timeout + 0.005):
+            self._pinging = False
+        return self._distance
+
+    def distance_cm(self):
+        """Take one reading (blocks for at most about `timeout`)."""
+        self.ping()
+        return self.result()
@@ -0,0 +1,98 @@
+# Parallel threshold sweep over recorded ultrasonic traces
+# Penn State Abington - CMPSC 462 Final Project
+#
+# Replays labeled traces (see lane_trace.py) under every combination of
+# NEAR_MAX_CM, FAR_BAND_CM, ENTER_CONFIRM_SAMPLES and CLEAR_CONFIRM_SAMPLES,
+# in a process pool, and prints the combinations that best match the labels:
+#
+#   python sweep.py lot-h-morning.ustr lot-h-evening.ustr \
+#       --near 60:140:10 --far 20:100:10 --enter 1:6 --clear 2:10
+#
+# Each worker maps and splits the traces once (pool initializer); tasks then
+# only carry the four thresholds and return counts, so thousands of
+# combinations cost little more than the replays themselves.
+
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import monitor
+from lanes import LaneTuning
+from lane_trace import Trace, replay, score_events
+
+_traces = None                      # [(lanes, labels)] in each worker
+
+
+def parse_range(text, cast=float):
+    """'60:140:10' -> 60, 70, ... 140 (inclusive); '3' or '3,5,8' -> those values."""
+    if ":" in text:
+        parts = [cast(p) for p in text.split(":")]
+        start, stop = parts[0], parts[1]
+        step = parts[2] if len(parts) > 2 else cast(1)
+        values = []
+        while start <= stop + 1e-9:
+            values.append(start)
+            start += step
+        return values
+    return [cast(p) for p in text.split(",")]
+
+
+def _load(paths):
+    global _traces
+    _traces = []
+    for path in paths:
+        trace = Trace(path)
+        _traces.append((trace.lanes(), trace.labels()))
+
+
+def evaluate(params):
+    """Score one (near, far, enter, clear) combination over all traces."""
+    near, far, enter, clear = params
+    tuning = LaneTuning(near, far, monitor.EMPTY_TOLERANCE_CM, enter, clear,
+                        monitor.MEDIAN_COUNT, monitor.EWMA_ALPHA, monitor.EMPTY_TRACK_ALPHA)
+    tp = fp = fn = 0
+    for lanes, labels in _traces:
+        a, b, c = score_events(replay(lanes, tuning, monitor.CALIBRATION_SECONDS), labels)
+        tp, fp, fn = tp + a, fp + b, fn + c
+    f1 = 2 * tp / (2 * tp + fp + fn) if tp else 0.0
+    return f1, tp, fp, fn, params
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep lane thresholds over labeled traces")
+    parser.add_argument("traces", nargs="+", help="trace files (each with a .labels.json sidecar)")
+    parser.add_argument("--near", default="60:140:10", help="NEAR_MAX_CM values")
+    parser.add_argument("--far", default="20:100:10", help="FAR_BAND_CM values")
+    parser.add_argument("--enter", default="1:6", help="ENTER_CONFIRM_SAMPLES values")
+    parser.add_argument("--clear", default="2:10", help="CLEAR_CONFIRM_SAMPLES values")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    _load(args.traces)
+    if not any(labels for _, labels in _traces):
+        raise SystemExit("No labels found; record with --record and mark cars, "
+                         "or write <trace>.labels.json by hand")
+
+    grid = list(itertools.product(parse_range(args.near), parse_range(args.far),
+                                  parse_range(args.enter, int), parse_range(args.clear, int)))
+    samples = sum(len(times) for lanes, _ in _traces for times, _ in lanes.values())
+    print(f"{len(grid)} combinations x {samples} samples on {args.workers} workers")
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(args.workers, initializer=_load, initargs=(args.traces,)) as pool:
+        results = list(pool.map(evaluate, grid, chunksize=max(1, len(grid) // (args.workers * 8))))
+    elapsed = time.perf_counter() - started
+    print(f"Done in {elapsed:.1f}s ({len(grid) * samples / elapsed / 1e6:.1f}M samples/s)\n")
+
+    # Best F1 first; fewer false counts break ties
+    results.sort(key=lambda r: (-r[0], r[2] + r[3]))
+    print("   F1    TP   FP   FN   NEAR_MAX_CM  FAR_BAND_CM  ENTER  CLEAR")
+    for f1, tp, fp, fn, (near, far, enter, clear) in results[:args.top]:
+        print(f"{f1:6.3f} {tp:5d} {fp:4d} {fn:4d}   {near:11.0f}  {far:11.0f}  {enter:5d}  {clear:5d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# Batching, offline-buffered reporting of lane counts to the backend
+# Penn State Abington - CMPSC 462 Final Project
+#
+# The sampling loop only calls record(+1/-1), which adds to an in-memory net
+# delta per lot under a lock and returns. A background thread wakes every
+# `interval` seconds, turns each lot's net delta into one event (device_id + seq),
+# appends it to a spool file, and sends everything spooled to /batchUpdate
+# over one keep-alive requests.Session. The spool is trimmed only after the
+# server acknowledges, so events survive outages and restarts. The seq lets
+# the server drop any event it already applied when a response was lost.
+# The seq is saved with a random boot_id. If that file is lost, a new boot_id
+# starts a fresh sequence on the server, instead of low seqs being taken as
+# already applied and dropped.
+# Failed sends back off exponentially (with jitter) up to `max_backoff`.
+
+import json
+import os
+import random
+import threading
+import time
+import uuid
+
+import requests
+
+# Items per request. The server remembers each device's last 64 seqs, so a
+# batch retried after a lost response must fit in that window to be
+# recognized as already applied.
+MAX_BATCH = 64
+
+
+class Spool:
+    """Append-only JSON-lines queue on disk, plus the device's boot_id and next seq.
+
+    `<path>.seq` holds "<boot_id> <last seq>".
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.seq_path = f"{path}.seq"
+        self.items = []
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        self.items.append(json.loads(line))
+                    except ValueError:
+                        pass   # torn last line from a power cut
+        self.boot_id, saved_seq = self._saved_seq()
+        if self.boot_id is None:
+            # No saved sequence: the server may remember seqs we no longer know, so start a new one
+            self.boot_id = uuid.uuid4().hex[:16]
+            saved_seq = 0
+        self.next_seq = 1 + max([saved_seq] + [item["seq"] for item in self.items
+                                               if item.get("boot_id") == self.boot_id])
+
+    def _saved_seq(self):
+        """(boot_id, last seq) from the .seq file, or (None, 0) if it is missing or unreadable."""
+        try:
+            with open(self.seq_path, "r") as f:
+                boot_id, seq = f.read().split()
+            return boot_id, int(seq)
+        except (OSError, ValueError):
+            return None, 0
+
+    def append(self, item):
+        """Give `item` the next seq and spool it. If this raises, the item was not spooled."""
+        item["boot_id"] = self.boot_id
+        item["seq"] = self.next_seq
+        # The seq must never go backwards (the server would drop new events as
+        # duplicates), so it is reserved first, replaced atomically and synced
+        self._write_atomic(self.seq_path, f"{self.boot_id} {item['seq']}")
+        self.next_seq += 1
+        with open(self.path, "a") as f:
+            f.write(json.dumps(item, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.items.append(item)
+
+    @staticmethod
+    def _write_atomic(path, text):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def drop(self, count):
+        """Forget the oldest `count` items (they were acknowledged)."""
+        self.items = self.items[count:]
+        self._write_atomic(self.path, "".join(json.dumps(item, separators=(",", ":")) + "\n"
+                                              for item in self.items))
+
+
+class LaneUploader:
+    """Coalesces IN/OUT events into net deltas per lot and reports them.
+
+    `lot` is the lot for record() calls that do not name one.
+    """
+
+    def __init__(self, backend_url, api_key, lot, device_id, spool_path,
+                 interval=2.0, timeout=5.0, max_backoff=60.0):
+        self.url = backend_url.rstrip("/") + "/batchUpdate"
+        self.lot = lot
+        self.device_id = device_id
+        self.interval = interval
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.spool = Spool(spool_path)
+
+        self.session = requests.Session()
+        self.session.headers.update({"X-API-Key": api_key})
+
+        self._lock = threading.Lock()
+        self._pending = {}      # lot -> net delta
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record(self, delta, lot=None):
+        """Add to a lot's available-space change; never blocks on the network."""
+        lot = lot or self.lot
+        with self._lock:
+            self._pending[lot] = self._pending.get(lot, 0) + delta
+
+    def record_many(self, deltas):
+        """record() several {lot: delta} at once."""
+        with self._lock:
+            for lot, delta in deltas.items():
+                self._pending[lot] = self._pending.get(lot, 0) + delta
+
+    # -------------------------------
+    # Background sending
+    # -------------------------------
+
+    def flush(self):
+        """Spool the pending net deltas and try to send the spool. Returns True if it is empty."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        try:
+            for lot in list(pending):
+                if pending[lot]:
+                    self.spool.append({"lot": lot, "delta": pending[lot], "ts": time.time()})
+                del pending[lot]
+        finally:
+            if pending:
+                # Could not spool (e.g. disk full); keep the rest for the next flush
+                self.record_many(pending)
+        if not self.spool.items or time.monotonic() < self._retry_at:
+            return not self.spool.items
+        while self.spool.items:
+            batch = self.spool.items[:MAX_BATCH]
+            if not self._send(batch):
+                return False
+            self.spool.drop(len(batch))
+        self._backoff = 0.0
+        return True
+
+    def _send(self, batch):
+        updates = [{"lot": item.get("lot", self.lot), "delta": item["delta"],
+                    "device_id": self.device_id, "seq": item["seq"],
+                    **({"boot_id": item["boot_id"]} if "boot_id" in item else {})}
+                   for item in batch]
+        try:
+            response = self.session.post(self.url, json={"updates": updates}, timeout=self.timeout)
+        except requests.RequestException as e:
+            self._fail(type(e).__name__)
+            return False
+        if response.status_code == 200:
+            for result in response.json().get("results", []):
+                if not result.get("ok"):
+                    print(f"Backend rejected update {updates[result['index']]}: {result.get('error')}")
+            return True
+        if response.status_code == 400:
+            # The request itself is bad; retrying will not help
+            print(f"Backend rejected batch ({response.text.strip()}); dropping {len(batch)} update(s)")
+            return True
+        self._fail(f"HTTP {response.status_code}", response.headers.get("Retry-After"))
+        return False
+
+    def _fail(self, reason, retry_after=None):
+        self._backoff = min(self.max_backoff, max(self.interval, self._backoff * 2))
+        wait = self._backoff * random.uniform(0.5, 1.0)
+        if retry_after and retry_after.isdigit():
+            wait = max(wait, float(retry_after))
+        self._retry_at = time.monotonic() + wait
+        print(f"Report failed ({reason}); {len(self.spool.items)} update(s) spooled, retrying in {wait:.0f}s")
+
+    def _safe_flush(self):
+        """flush(), but an unexpected error (bad response, spool write failure)
+        backs off like a failed send instead of ending the sender."""
+        try:
+            return self.flush()
+        except Exception as e:
+            self._fail(f"{type(e).__name__}: {e}")
+            return False
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._safe_flush()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="lane-uploader", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the sender and make one last attempt; unsent updates stay spooled."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.timeout + 1.0)
+        self._retry_at = 0.0
+        self._safe_flush()
+        self.session.close()